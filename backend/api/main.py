@@ -3,20 +3,22 @@ OpenRAG API Gateway
 Main entry point for all user requests
 """
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, constr
+from typing import List, Optional, Union
 import httpx
 import os
+import asyncio
 import psycopg2
 import psycopg2.extras
 from loguru import logger
 import uuid
 from datetime import datetime, timedelta
 from prometheus_fastapi_instrumentator import Instrumentator
+from prometheus_client import Counter
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
@@ -34,6 +36,15 @@ DATABASE_URL = os.getenv(
     f"password={os.getenv('POSTGRES_PASSWORD','openrag123')}"
 )
 
+# How often a waiting query handler checks whether its client is still connected
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+
+QUERY_CANCELLATIONS = Counter(
+    "openrag_gateway_query_cancellations_total",
+    "Queries abandoned because the client disconnected",
+    ["endpoint"]
+)
+
 JWT_SECRET  = os.getenv("JWT_SECRET_KEY", "openrag-change-me-in-production-please")
 JWT_ALG     = "HS256"
 JWT_EXPIRE  = int(os.getenv("JWT_EXPIRE_MINUTES", "1440"))  # 24 hours
@@ -233,15 +244,100 @@ class QueryRequest(BaseModel):
     """Search / question request"""
     query: str = Field(..., description="User question or search query")
     collection_id: Optional[str] = Field(None, description="Collection ID to search in")
+    collection_ids: Optional[Union[List[str], str]] = Field(
+        None,
+        description='Search several collections (list), all of them ("*") or the closest ones ("auto"); overrides collection_id'
+    )
+    route_collections: Optional[int] = Field(
+        None, ge=1, le=20, description='Collections searched when routing ("auto"); default: server setting'
+    )
+    fusion: str = Field(
+        "rrf",
+        pattern="^(rrf|score)$",
+        description='How hits of several collections are merged: "rrf" (reciprocal rank fusion) or "score"'
+    )
+    hybrid: Optional[bool] = Field(
+        None, description="Also run a full-text search (exact identifiers, codes) fused with the vector search (default: server setting)"
+    )
+    vector_weight: Optional[float] = Field(None, ge=0, description="Weight of the vector ranking in hybrid search")
+    lexical_weight: Optional[float] = Field(None, ge=0, description="Weight of the full-text ranking in hybrid search")
+    coarse_documents: Optional[int] = Field(
+        None, ge=0, description="Search only the chunks of the N closest documents (0: all chunks; default: server setting)"
+    )
+    diversity: Optional[str] = Field(
+        None,
+        pattern="^(none|mmr|group)$",
+        description='Avoid near-identical hits: "mmr" (maximal marginal relevance) or "group" (at most max_per_document hits per document)'
+    )
+    mmr_lambda: Optional[float] = Field(None, ge=0, le=1, description="MMR trade-off: 1 ranks by relevance only, lower values favour diversity")
+    max_per_document: Optional[int] = Field(None, ge=1, le=20, description='Hits per document in "group" mode')
+    hnsw_ef: Optional[int] = Field(
+        None, ge=1, le=4096, description="HNSW search breadth: higher is slower with better recall (default: collection profile)"
+    )
+    exact: Optional[bool] = Field(None, description="Exact brute-force search, e.g. to measure the recall of the index")
+    context_expansion: Optional[str] = Field(
+        None,
+        pattern="^(none|parent|neighbors)$",
+        description='Widen matched chunks to their "parent" window or their "neighbors" before answering (default: server setting)'
+    )
+    context_neighbors: Optional[int] = Field(
+        None, ge=0, le=10, description='Chunks added on each side of a match in "neighbors" mode'
+    )
     max_results: int = Field(5, description="Maximum number of results to return", ge=1, le=20)
     use_llm: bool = Field(True, description="Whether to generate an LLM answer")
-    metadata_filter: Optional[dict] = Field(None, description="Metadata filters")
+    metadata_filter: Optional[dict] = Field(
+        None,
+        description='Metadata filters, e.g. {"source_file": "a.pdf", "year": {"gte": 2020}, "language": ["fr", "en"]}'
+    )
+    use_cache: bool = Field(True, description="Serve repeated questions from the response cache")
+    priority: str = Field(
+        "interactive",
+        pattern="^(interactive|batch)$",
+        description='LLM scheduling class: "interactive" or "batch" (served after interactive requests)'
+    )
+    deadline_seconds: Optional[float] = Field(
+        None, description="Fail with 503 instead of waiting longer than this for the answer", gt=0
+    )
+    compress_contexts: Optional[bool] = Field(
+        None, description="Keep only the context sentences closest to the question (default: server setting)"
+    )
+    answer_mode: str = Field(
+        "llm",
+        pattern="^(llm|extractive|auto)$",
+        description='"llm", "extractive" (best matching sentences, no LLM, sub-second) or "auto" (LLM only when extraction is unsure)'
+    )
+
+class BatchQueryRequest(BaseModel):
+    """Many questions answered with the same options"""
+    queries: List[constr(strip_whitespace=True, min_length=1)] = Field(
+        ..., min_length=1, max_length=1000, description="Questions (non-empty), answered in any order"
+    )
+    collection_id: Optional[str] = Field(None, description="Collection ID to search in")
+    max_results: int = Field(5, description="Maximum number of results per query", ge=1, le=20)
+    use_llm: bool = Field(True, description="Whether to generate LLM answers")
+    metadata_filter: Optional[dict] = Field(None, description="Metadata filters applied to every query")
+    answer_mode: str = Field("llm", pattern="^(llm|extractive|auto)$")
+    hybrid: Optional[bool] = Field(None, description="Fuse full-text and vector search (default: server setting)")
+    vector_weight: Optional[float] = Field(None, ge=0)
+    lexical_weight: Optional[float] = Field(None, ge=0)
+    coarse_documents: Optional[int] = Field(None, ge=0)
+    diversity: Optional[str] = Field(None, pattern="^(none|mmr|group)$")
+    mmr_lambda: Optional[float] = Field(None, ge=0, le=1)
+    max_per_document: Optional[int] = Field(None, ge=1, le=20)
+    hnsw_ef: Optional[int] = Field(None, ge=1, le=4096)
+    exact: Optional[bool] = None
+    context_expansion: Optional[str] = Field(None, pattern="^(none|parent|neighbors)$")
+    context_neighbors: Optional[int] = Field(None, ge=0, le=10)
+    llm_concurrency: Optional[int] = Field(
+        None, ge=1, le=32, description="LLM answers generated at the same time for this batch"
+    )
 
 class QueryResponse(BaseModel):
     """Query response"""
     query_id: str
     answer: Optional[str] = None
     sources: List[dict] = []
+    highlights: Optional[List[dict]] = None
     execution_time_ms: int
     timestamp: str
 
@@ -259,6 +355,38 @@ class HealthResponse(BaseModel):
     timestamp: str
     services: dict
 
+class BulkDeleteRequest(BaseModel):
+    """Filters selecting the documents to delete (at least one is required)"""
+    collection_id: Optional[str] = Field(None, description="Only documents of this collection")
+    status: Optional[str] = Field(None, description="Only documents with this processing status")
+    uploaded_before: Optional[datetime] = Field(None, description="Only documents uploaded before this time")
+    uploaded_after: Optional[datetime] = Field(None, description="Only documents uploaded after this time")
+
+class PayloadIndexRequest(BaseModel):
+    """Payload field to index for fast filtered search"""
+    field: str = Field(..., min_length=1, description='Field name, e.g. "metadata.year" ("year" is looked up under metadata)')
+    type: str = Field("keyword", pattern="^(keyword|integer|float|bool|geo|text)$", description="Qdrant payload index type")
+
+class IndexProfileRequest(BaseModel):
+    """Quantization / storage / HNSW settings of a collection (unset settings take their defaults)"""
+    quantization: Optional[str] = Field(None, pattern="^(none|scalar|product|binary)$")
+    quantile: Optional[float] = Field(None, ge=0.5, le=1, description="Scalar quantization: share of values kept in the int8 range")
+    compression: Optional[str] = Field(None, pattern="^x(4|8|16|32|64)$", description="Product quantization ratio")
+    always_ram: Optional[bool] = Field(None, description="Keep the quantized vectors in RAM")
+    rescore: Optional[bool] = Field(None, description="Re-rank quantized candidates with the original vectors")
+    oversampling: Optional[float] = Field(None, ge=1, description="Quantized candidates fetched per requested hit before rescoring")
+    on_disk: Optional[bool] = Field(None, description="Memory-map the original vectors from disk")
+    on_disk_payload: Optional[bool] = None
+    hnsw_m: Optional[int] = Field(None, ge=0)
+    hnsw_ef_construct: Optional[int] = Field(None, ge=4)
+    hnsw_ef: Optional[int] = Field(None, ge=4, description="Default search breadth")
+
+class MigrationRequest(BaseModel):
+    """Re-embedding of a collection into a shadow version"""
+    vector_size: Optional[int] = Field(None, ge=1, description="Expected dimension of the target embedding model")
+    embedding_service_url: Optional[str] = Field(None, description="Embedding service to re-embed with (default: the configured one)")
+    auto_swap: bool = Field(True, description="Swap the alias as soon as the shadow is validated (else promote it explicitly)")
+
 # ============================================
 # Routes
 # ============================================
@@ -295,39 +423,21 @@ async def health_check():
     )
 
 @app.post("/query", response_model=QueryResponse, tags=["RAG"])
-async def process_query(request: QueryRequest):
+async def process_query(request: QueryRequest, http_request: Request):
     """
     Process a user query through the RAG pipeline.
 
     1. Search for relevant document chunks
     2. Generate an LLM answer (if enabled)
     3. Return the answer and its sources
+
+    If the client disconnects, the orchestrator call is dropped so generation is cancelled upstream.
     """
     query_id = str(uuid.uuid4())
     start_time = datetime.utcnow()
     
     try:
-        # Increased timeout to allow for LLM generation (can take 30-120s)
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(
-                f"{ORCHESTRATOR_URL}/process-query",
-                json={
-                    "query_id": query_id,
-                    "query": request.query,
-                    "collection_id": request.collection_id,
-                    "max_results": request.max_results,
-                    "use_llm": request.use_llm,
-                    "metadata_filter": request.metadata_filter
-                }
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Orchestrator error: {response.text}"
-                )
-            
-            result = response.json()
+        result = await _until_disconnected(http_request, _post_query(query_id, request))
             
         execution_time = int((datetime.utcnow() - start_time).total_seconds() * 1000)
         
@@ -335,16 +445,181 @@ async def process_query(request: QueryRequest):
             query_id=query_id,
             answer=result.get("answer"),
             sources=result.get("sources", []),
+            highlights=result.get("highlights"),
             execution_time_ms=execution_time,
             timestamp=datetime.utcnow().isoformat()
         )
         
+    except ClientDisconnected:
+        logger.info(f"Client disconnected, query cancelled: {query_id}")
+        return Response(status_code=499)
+    except HTTPException:
+        raise
     except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="Query timeout")
     except Exception as e:
         logger.error(f"Query processing error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _post_query(query_id: str, request: QueryRequest) -> dict:
+    """Run a query on the orchestrator"""
+    # Increased timeout to allow for LLM generation (can take 30-120s)
+    async with httpx.AsyncClient(timeout=300.0) as client:
+        response = await client.post(
+            f"{ORCHESTRATOR_URL}/process-query",
+            json=_orchestrator_query(query_id, request)
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Orchestrator error: {response.text}"
+            )
+        
+        return response.json()
+
+class ClientDisconnected(Exception):
+    """The HTTP client went away before the response was ready"""
+
+async def _until_disconnected(http_request: Request, coro):
+    """
+    Await coro while watching the client connection; on disconnect, cancel it
+    (closing the orchestrator connection, which cancels the work there) and raise ClientDisconnected.
+    """
+    task = asyncio.create_task(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                task.cancel()
+                QUERY_CANCELLATIONS.labels(endpoint="query").inc()
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+
+@app.post("/query/stream", tags=["RAG"])
+async def process_query_stream(request: QueryRequest):
+    """
+    Same as /query, streamed as server-sent events: a "sources" event as soon as
+    retrieval is done, then "token" events as the answer is generated, then "done".
+    The query ID is returned in the X-Query-Id header.
+    """
+    query_id = str(uuid.uuid4())
+    return await _relay_stream(
+        "/query/stream",
+        _orchestrator_query(query_id, request),
+        media_type="text/event-stream",
+        endpoint="query-stream",
+        headers={"X-Query-Id": query_id}
+    )
+
+@app.post("/query/batch", tags=["RAG"])
+async def process_query_batch(request: BatchQueryRequest):
+    """
+    Run many queries with shared work: one embedding call, one vector search request and
+    one database round trip for the whole batch; LLM answers are generated at batch
+    priority, at most llm_concurrency at a time.
+
+    Results are streamed as newline-delimited JSON in completion order, one line per
+    query: {"index", "query_id", "answer", "sources", "highlights", "metadata"}, or
+    {"index", "query_id", "error", "status"} for queries that failed.
+    """
+    payload = {
+        "queries": [{"query_id": str(uuid.uuid4()), "query": query} for query in request.queries],
+        "collection_id": request.collection_id,
+        "max_results": request.max_results,
+        "use_llm": request.use_llm,
+        "metadata_filter": request.metadata_filter,
+        "answer_mode": request.answer_mode,
+        "hybrid": request.hybrid,
+        "vector_weight": request.vector_weight,
+        "lexical_weight": request.lexical_weight,
+        "coarse_documents": request.coarse_documents,
+        "diversity": request.diversity,
+        "mmr_lambda": request.mmr_lambda,
+        "max_per_document": request.max_per_document,
+        "hnsw_ef": request.hnsw_ef,
+        "exact": request.exact,
+        "context_expansion": request.context_expansion,
+        "context_neighbors": request.context_neighbors,
+        "llm_concurrency": request.llm_concurrency
+    }
+    return await _relay_stream("/query/batch", payload, media_type="application/x-ndjson", endpoint="query-batch")
+
+async def _relay_stream(path: str, payload: dict, media_type: str, endpoint: str, headers: Optional[dict] = None):
+    """Proxy a streaming orchestrator endpoint; a client disconnect closes the upstream stream"""
+    client = httpx.AsyncClient(timeout=httpx.Timeout(300.0, connect=10.0))
+    try:
+        upstream = await client.send(
+            client.build_request("POST", f"{ORCHESTRATOR_URL}{path}", json=payload),
+            stream=True
+        )
+    except httpx.TimeoutException:
+        await client.aclose()
+        raise HTTPException(status_code=504, detail="Query timeout")
+    except Exception as e:
+        await client.aclose()
+        logger.error(f"Query stream error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if upstream.status_code != 200:
+        detail = (await upstream.aread()).decode()
+        await upstream.aclose()
+        await client.aclose()
+        raise HTTPException(status_code=upstream.status_code, detail=f"Orchestrator error: {detail}")
+
+    async def relay():
+        try:
+            async for chunk in upstream.aiter_raw():
+                yield chunk
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client went away: closing the upstream stream cancels generation in the orchestrator
+            QUERY_CANCELLATIONS.labels(endpoint=endpoint).inc()
+            logger.info(f"Client disconnected, {endpoint} cancelled")
+            raise
+        finally:
+            await upstream.aclose()
+            await client.aclose()
+
+    return StreamingResponse(
+        relay(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **(headers or {})}
+    )
+
+def _orchestrator_query(query_id: str, request: QueryRequest) -> dict:
+    """Request body for the orchestrator query endpoints"""
+    return {
+        "query_id": query_id,
+        "query": request.query,
+        "collection_id": request.collection_id,
+        "collection_ids": request.collection_ids,
+        "route_collections": request.route_collections,
+        "fusion": request.fusion,
+        "max_results": request.max_results,
+        "use_llm": request.use_llm,
+        "metadata_filter": request.metadata_filter,
+        "use_cache": request.use_cache,
+        "priority": request.priority,
+        "deadline_seconds": request.deadline_seconds,
+        "compress_contexts": request.compress_contexts,
+        "answer_mode": request.answer_mode,
+        "hybrid": request.hybrid,
+        "vector_weight": request.vector_weight,
+        "lexical_weight": request.lexical_weight,
+        "coarse_documents": request.coarse_documents,
+        "diversity": request.diversity,
+        "mmr_lambda": request.mmr_lambda,
+        "max_per_document": request.max_per_document,
+        "hnsw_ef": request.hnsw_ef,
+        "exact": request.exact,
+        "context_expansion": request.context_expansion,
+        "context_neighbors": request.context_neighbors
+    }
+
 @app.post("/documents/upload", response_model=DocumentUploadResponse, tags=["Documents"])
 async def upload_document(
     file: UploadFile = File(...),
@@ -440,6 +715,19 @@ async def delete_document(document_id: str):
         logger.error(f"Delete document error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/documents/bulk-delete", tags=["Documents"])
+async def bulk_delete_documents(body: BulkDeleteRequest, _=Depends(require_admin)):
+    """
+    Delete all documents matching collection_id / status / uploaded_before / uploaded_after
+    in a background job. Admin only. Poll /jobs/{job_id} for progress.
+    """
+    return await _forward_admin("POST", "/documents/bulk-delete", json=body.model_dump(mode="json", exclude_none=True))
+
+@app.get("/jobs/{job_id}", tags=["Admin"])
+async def get_job(job_id: str, _=Depends(require_admin)):
+    """Status and progress of a background job. Admin only."""
+    return await _forward_admin("GET", f"/jobs/{job_id}")
+
 @app.get("/collections", tags=["Collections"])
 async def list_collections():
     """List all collections with Qdrant vector counts."""
@@ -448,10 +736,18 @@ async def list_collections():
             # Get collections from orchestrator (Postgres)
             pg_resp = await client.get(f"{ORCHESTRATOR_URL}/collections")
             pg_cols = pg_resp.json().get("collections", []) if pg_resp.status_code == 200 else []
+            # Logical document collections: no versions, document indexes or internal collections
+            document_collections = set(pg_resp.json().get("vector_collections", [])) if pg_resp.status_code == 200 else set()
 
             # Get Qdrant collection list + stats in parallel
             qdrant_resp = await client.get(f"{QDRANT_URL}/collections")
-            qdrant_names = {c["name"] for c in qdrant_resp.json().get("result", {}).get("collections", [])} if qdrant_resp.status_code == 200 else set()
+            physical_names = [c["name"] for c in qdrant_resp.json().get("result", {}).get("collections", [])] if qdrant_resp.status_code == 200 else []
+
+            # Collections are served through aliases; report them under their alias name
+            alias_resp = await client.get(f"{QDRANT_URL}/aliases")
+            alias_of = {a["collection_name"]: a["alias_name"] for a in alias_resp.json().get("result", {}).get("aliases", [])} if alias_resp.status_code == 200 else {}
+            physical_of = {alias_of.get(n, n): n for n in physical_names}
+            qdrant_names = set(physical_of) & document_collections
 
             enriched = []
             for col in pg_cols:
@@ -459,7 +755,7 @@ async def list_collections():
                 qdrant_info = {}
                 if name in qdrant_names:
                     try:
-                        qr = await client.get(f"{QDRANT_URL}/collections/{name}")
+                        qr = await client.get(f"{QDRANT_URL}/collections/{physical_of[name]}")
                         r = qr.json().get("result", {})
                         qdrant_info = {
                             "vectors_count": r.get("points_count", 0),
@@ -476,7 +772,7 @@ async def list_collections():
             pg_names = {c.get("name") for c in pg_cols}
             for qname in qdrant_names - pg_names:
                 try:
-                    qr = await client.get(f"{QDRANT_URL}/collections/{qname}")
+                    qr = await client.get(f"{QDRANT_URL}/collections/{physical_of[qname]}")
                     r = qr.json().get("result", {})
                     enriched.append({
                         "name": qname,
@@ -497,6 +793,102 @@ async def list_collections():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/collections/{collection_name}/payload-indexes", tags=["Collections"])
+async def list_payload_indexes(collection_name: str, _=Depends(require_admin)):
+    """Indexed payload fields of a collection. Admin only."""
+    return await _forward_admin("GET", f"/collections/{collection_name}/payload-indexes")
+
+@app.post("/collections/{collection_name}/payload-indexes", tags=["Collections"])
+async def create_payload_index(collection_name: str, body: PayloadIndexRequest, _=Depends(require_admin)):
+    """Index an extra payload field (e.g. {"field": "metadata.year", "type": "integer"}). Admin only."""
+    return await _forward_admin("POST", f"/collections/{collection_name}/payload-indexes", json=body.model_dump())
+
+@app.post("/collections/{collection_name}/bulk-load", tags=["Collections"])
+async def begin_bulk_load(collection_name: str, _=Depends(require_admin)):
+    """Defer index building of a collection during a large ingest. Admin only."""
+    return await _forward_admin("POST", f"/collections/{collection_name}/bulk-load")
+
+@app.post("/collections/{collection_name}/bulk-load/finish", tags=["Collections"])
+async def finish_bulk_load(
+    collection_name: str,
+    indexing_threshold: Optional[int] = Query(
+        None, ge=0, description="Qdrant indexing_threshold (KB) to restore (default: the one recorded at bulk-load start)"
+    ),
+    _=Depends(require_admin)
+):
+    """Rebuild the index after a bulk load; returns a job ID to follow with /jobs/{job_id}. Admin only."""
+    return await _forward_admin(
+        "POST", f"/collections/{collection_name}/bulk-load/finish",
+        params={"indexing_threshold": indexing_threshold} if indexing_threshold is not None else None
+    )
+
+@app.get("/collections/{collection_name}/index-profile", tags=["Collections"])
+async def get_index_profile(collection_name: str, _=Depends(require_admin)):
+    """Quantization / HNSW profile of a collection, its live settings and estimated RAM. Admin only."""
+    return await _forward_admin("GET", f"/collections/{collection_name}/index-profile")
+
+@app.put("/collections/{collection_name}/index-profile", tags=["Collections"])
+async def set_index_profile(collection_name: str, body: IndexProfileRequest, _=Depends(require_admin)):
+    """Set and apply a collection's index profile (e.g. {"quantization": "scalar", "on_disk": true}). Admin only."""
+    return await _forward_admin(
+        "PUT", f"/collections/{collection_name}/index-profile", json=body.model_dump(exclude_none=True)
+    )
+
+@app.post("/collections/{collection_name}/migrations", tags=["Collections"])
+async def start_collection_migration(collection_name: str, body: MigrationRequest, _=Depends(require_admin)):
+    """Rebuild a collection into a shadow collection and swap it in with no downtime. Admin only."""
+    return await _forward_admin("POST", f"/collections/{collection_name}/migrations", json=body.model_dump(exclude_none=True))
+
+@app.get("/collections/{collection_name}/migration", tags=["Collections"])
+async def get_collection_migration(collection_name: str, _=Depends(require_admin)):
+    """Migration progress and collection versions. Admin only."""
+    return await _forward_admin("GET", f"/collections/{collection_name}/migration")
+
+@app.post("/collections/{collection_name}/migration/promote", tags=["Collections"])
+async def promote_collection_migration(collection_name: str, _=Depends(require_admin)):
+    """Swap in a validated shadow collection. Admin only."""
+    return await _forward_admin("POST", f"/collections/{collection_name}/migration/promote")
+
+@app.post("/collections/{collection_name}/document-index", tags=["Collections"])
+async def rebuild_document_index(collection_name: str, _=Depends(require_admin)):
+    """Recompute the per-document vectors used by coarse-to-fine search. Admin only."""
+    return await _forward_admin("POST", f"/collections/{collection_name}/document-index")
+
+@app.get("/collections/{collection_name}/document-index", tags=["Collections"])
+async def get_document_index(collection_name: str, _=Depends(require_admin)):
+    """Progress of the latest document index rebuild. Admin only."""
+    return await _forward_admin("GET", f"/collections/{collection_name}/document-index")
+
+@app.get("/routing/centroids", tags=["Collections"])
+async def get_collection_centroids(_=Depends(require_admin)):
+    """Collections known to the query router with their chunk counts. Admin only."""
+    return await _forward_admin("GET", "/routing/centroids")
+
+@app.post("/routing/rebuild", tags=["Collections"])
+async def rebuild_collection_centroids(_=Depends(require_admin)):
+    """Recompute the collection centroids used to route queries. Admin only."""
+    return await _forward_admin("POST", "/routing/rebuild")
+
+@app.post("/collections/{collection_name}/rollback", tags=["Collections"])
+async def rollback_collection(collection_name: str, _=Depends(require_admin)):
+    """Serve the previous collection version again. Admin only."""
+    return await _forward_admin("POST", f"/collections/{collection_name}/rollback")
+
+async def _forward_admin(method: str, path: str, json: Optional[dict] = None, params: Optional[dict] = None):
+    """Forward an admin call to the orchestrator and relay its errors"""
+    try:
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            response = await client.request(method, f"{ORCHESTRATOR_URL}{path}", json=json, params=params)
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code, detail=response.json().get("detail", response.text))
+        return response.json()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Admin call error ({path}): {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/stats", tags=["Admin"])
 async def get_stats(db=Depends(get_db)):
     """Aggregate system statistics from Postgres + Qdrant + Prometheus."""
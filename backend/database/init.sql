@@ -30,6 +30,8 @@ CREATE TABLE IF NOT EXISTS document_chunks (
     token_count INTEGER,
     vector_id VARCHAR(255), -- ID in Qdrant
     metadata JSONB,
+    -- Full-text index of content for lexical (hybrid) retrieval, maintained by PostgreSQL
+    content_tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -78,7 +80,11 @@ CREATE TABLE IF NOT EXISTS document_collections (
 -- Indexes for performance
 CREATE INDEX idx_documents_status ON documents(status);
 CREATE INDEX idx_documents_upload_date ON documents(upload_date);
+CREATE INDEX IF NOT EXISTS idx_documents_collection ON documents((metadata->>'collection'));
 CREATE INDEX idx_document_chunks_document_id ON document_chunks(document_id);
+CREATE INDEX IF NOT EXISTS idx_document_chunks_document_chunk ON document_chunks(document_id, chunk_index);
+CREATE INDEX IF NOT EXISTS idx_document_chunks_vector_id ON document_chunks(vector_id);
+CREATE INDEX IF NOT EXISTS idx_document_chunks_content_tsv ON document_chunks USING GIN (content_tsv);
 CREATE INDEX idx_queries_created_at ON queries(created_at);
 CREATE INDEX idx_queries_user_id ON queries(user_id);
 CREATE INDEX idx_processing_jobs_status ON processing_jobs(status);
@@ -0,0 +1,5 @@
+-- OpenRAG schema migration 001
+-- Index used by the batched chunk lookup on the query path (vector_id = ANY($1))
+-- init.sql already includes it for new installations; apply with `make migrate`.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_document_chunks_vector_id ON document_chunks(vector_id);
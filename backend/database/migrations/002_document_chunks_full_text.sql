@@ -0,0 +1,9 @@
+-- OpenRAG schema migration 002
+-- Full-text column and GIN index used by hybrid (lexical + vector) retrieval
+-- init.sql already includes them for new installations; apply with `make migrate`.
+-- Adding the generated column rewrites document_chunks once (the table is locked meanwhile).
+
+ALTER TABLE document_chunks
+    ADD COLUMN IF NOT EXISTS content_tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_document_chunks_content_tsv ON document_chunks USING GIN (content_tsv);
@@ -0,0 +1,5 @@
+-- OpenRAG schema migration 003
+-- Index used to fetch windows of consecutive chunks (parent windows, chunk_index ± n) in one range query
+-- init.sql already includes it for new installations; apply with `make migrate`.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_document_chunks_document_chunk ON document_chunks(document_id, chunk_index);
@@ -0,0 +1,5 @@
+-- OpenRAG schema migration 004
+-- Index on the collection a document was indexed into, used to restrict full-text search to one collection
+-- init.sql already includes it for new installations; apply with `make migrate`.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_documents_collection ON documents((metadata->>'collection'));
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark coarse-to-fine retrieval against flat search: latency and recall
+
+Every question is searched twice through /process-query (no LLM, caches bypassed): once over
+all chunks and once over the chunks of the top --documents documents only. Recall@k is the
+share of the flat search's chunks the coarse search also returns; when a question lists the
+expected document IDs, document recall is reported for both searches as well. Latency is the
+vector search time reported by the orchestrator (metadata.retrieval) and the end-to-end time.
+
+Usage (inside the orchestrator container, which reaches the other services):
+    docker exec openrag-orchestrator python benchmark_coarse_search.py questions.json --documents 20
+    docker exec openrag-orchestrator python benchmark_coarse_search.py questions.txt --collection docs -k 10 -o report.json
+
+questions.json: [{"question": "...", "document_ids": ["...", "..."]}, ...]; questions.txt: one question per line
+The collection needs a document index: built at ingest, or with POST /collections/<name>/document-index.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+from statistics import mean, median
+
+import httpx
+
+
+def load_questions(path: str):
+    text = Path(path).read_text(encoding="utf-8")
+    if path.endswith(".json"):
+        return [
+            item if isinstance(item, dict) else {"question": item}
+            for item in json.loads(text)
+        ]
+    return [{"question": line.strip()} for line in text.splitlines() if line.strip()]
+
+
+async def search(client: httpx.AsyncClient, args, question: str, documents: int):
+    started = time.perf_counter()
+    response = await client.post(f"{args.orchestrator}/process-query", json={
+        "query_id": str(uuid.uuid4()),
+        "query": question,
+        "collection_id": args.collection,
+        "max_results": args.k,
+        "use_llm": False,
+        "use_cache": False,
+        "coarse_documents": documents
+    })
+    response.raise_for_status()
+    result = response.json()
+    retrieval = next(iter((result.get("metadata", {}).get("retrieval") or {}).values()), {})
+    return {
+        "seconds": time.perf_counter() - started,
+        "search_ms": (retrieval.get("vector") or {}).get("ms"),
+        "fallback": (retrieval.get("coarse") or {}).get("fallback", False),
+        "chunks": [(source["document_id"], source["chunk_index"]) for source in result.get("sources", [])]
+    }
+
+
+def document_recall(chunks, expected):
+    if not expected:
+        return None
+    found = {document_id for document_id, _ in chunks}
+    return sum(1 for document_id in expected if document_id in found) / len(expected)
+
+
+async def run(args) -> int:
+    questions = load_questions(args.questions)
+    rows = []
+
+    async with httpx.AsyncClient(timeout=120.0) as client:
+        for idx, item in enumerate(questions, 1):
+            flat = await search(client, args, item["question"], 0)
+            coarse = await search(client, args, item["question"], args.documents)
+
+            overlap = len(set(flat["chunks"]) & set(coarse["chunks"]))
+            row = {
+                "question": item["question"],
+                "flat": flat,
+                "coarse": coarse,
+                "recall_at_k": overlap / len(flat["chunks"]) if flat["chunks"] else None,
+                "document_recall_flat": document_recall(flat["chunks"], item.get("document_ids")),
+                "document_recall_coarse": document_recall(coarse["chunks"], item.get("document_ids"))
+            }
+            rows.append(row)
+            print(
+                f"[{idx}/{len(questions)}] search {flat['search_ms']} ms -> {coarse['search_ms']} ms, "
+                f"recall@{args.k} {row['recall_at_k']}" + (" (flat fallback)" if coarse["fallback"] else "")
+            )
+
+    def values(key, variant=None):
+        found = [row[variant][key] if variant else row[key] for row in rows]
+        return [value for value in found if value is not None]
+
+    def summarize(function, found):
+        return function(found) if found else None
+
+    summary = {
+        "questions": len(rows),
+        "documents": args.documents,
+        "k": args.k,
+        "coarse_fallbacks": sum(1 for row in rows if row["coarse"]["fallback"]),
+        "median_search_ms_flat": summarize(median, values("search_ms", "flat")),
+        "median_search_ms_coarse": summarize(median, values("search_ms", "coarse")),
+        "median_seconds_flat": summarize(median, values("seconds", "flat")),
+        "median_seconds_coarse": summarize(median, values("seconds", "coarse")),
+        "mean_recall_at_k": summarize(mean, values("recall_at_k")),
+        "mean_document_recall_flat": summarize(mean, values("document_recall_flat")),
+        "mean_document_recall_coarse": summarize(mean, values("document_recall_coarse"))
+    }
+
+    print("\n📊 Summary")
+    for key, value in summary.items():
+        print(f"  {key}: {value:.3f}" if isinstance(value, float) else f"  {key}: {value}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"summary": summary, "rows": rows}, indent=2), encoding="utf-8")
+        print(f"\n📝 Report written to {args.output}")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark coarse-to-fine retrieval against flat search")
+    parser.add_argument("questions", help="JSON list of {question, document_ids} or a text file with one question per line")
+    parser.add_argument("--collection", default=None, help="Collection to query (default collection if omitted)")
+    parser.add_argument("--documents", type=int, default=20, help="Documents selected by the coarse search")
+    parser.add_argument("-k", type=int, default=10, help="Chunks retrieved per question (max_results)")
+    parser.add_argument("--orchestrator", default="http://localhost:8001", help="Orchestrator URL")
+    parser.add_argument("-o", "--output", default=None, help="Write the per-question report to this JSON file")
+    return asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
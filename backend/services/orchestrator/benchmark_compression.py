@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark extractive context compression: prompt size and latency versus answer quality
+
+Every question is answered twice through /process-query (caches bypassed), once with the
+full packed contexts and once compressed. Quality is measured as the cosine similarity of
+the two answers' embeddings and, when a question lists expected keywords, as the share of
+keywords each answer contains.
+
+Usage (inside the orchestrator container, which reaches the other services):
+    docker exec openrag-orchestrator python benchmark_compression.py questions.json
+    docker exec openrag-orchestrator python benchmark_compression.py questions.txt --collection docs -o report.json
+
+questions.json: [{"question": "...", "keywords": ["...", "..."]}, ...]; questions.txt: one question per line
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+from statistics import mean, median
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from services.document_processor import DocumentProcessor
+
+
+def load_questions(path: str):
+    text = Path(path).read_text(encoding="utf-8")
+    if path.endswith(".json"):
+        return [
+            item if isinstance(item, dict) else {"question": item}
+            for item in json.loads(text)
+        ]
+    return [{"question": line.strip()} for line in text.splitlines() if line.strip()]
+
+
+async def ask(client: httpx.AsyncClient, url: str, question: str, collection: str, compress: bool):
+    started = time.perf_counter()
+    response = await client.post(f"{url}/process-query", json={
+        "query_id": str(uuid.uuid4()),
+        "query": question,
+        "collection_id": collection,
+        "use_cache": False,
+        "compress_contexts": compress
+    })
+    response.raise_for_status()
+    result = response.json()
+    metadata = result.get("metadata", {})
+    compression = metadata.get("context_compression") or {}
+    packing = metadata.get("context_packing") or {}
+    return {
+        "answer": result.get("answer") or "",
+        "seconds": time.perf_counter() - started,
+        "context_tokens": compression.get("compressed_tokens", packing.get("tokens"))
+    }
+
+
+def keyword_recall(answer: str, keywords):
+    if not keywords:
+        return None
+    answer = answer.lower()
+    return sum(1 for keyword in keywords if keyword.lower() in answer) / len(keywords)
+
+
+async def run(args) -> int:
+    questions = load_questions(args.questions)
+    processor = DocumentProcessor()
+    rows = []
+
+    async with httpx.AsyncClient(timeout=600.0) as client:
+        for idx, item in enumerate(questions, 1):
+            full = await ask(client, args.orchestrator, item["question"], args.collection, False)
+            compressed = await ask(client, args.orchestrator, item["question"], args.collection, True)
+
+            similarity = None
+            if full["answer"] and compressed["answer"]:
+                vectors = np.asarray(await processor.generate_embeddings([full["answer"], compressed["answer"]]))
+                similarity = float(vectors[0] @ vectors[1] / (np.linalg.norm(vectors[0]) * np.linalg.norm(vectors[1])))
+
+            row = {
+                "question": item["question"],
+                "full": full,
+                "compressed": compressed,
+                "answer_similarity": similarity,
+                "keyword_recall_full": keyword_recall(full["answer"], item.get("keywords")),
+                "keyword_recall_compressed": keyword_recall(compressed["answer"], item.get("keywords"))
+            }
+            rows.append(row)
+            print(
+                f"[{idx}/{len(questions)}] tokens {full['context_tokens']} -> {compressed['context_tokens']}, "
+                f"{full['seconds']:.1f}s -> {compressed['seconds']:.1f}s, similarity {similarity}"
+            )
+
+    def values(key, variant=None):
+        found = [row[variant][key] if variant else row[key] for row in rows]
+        return [value for value in found if value is not None]
+
+    ratios = [
+        row["compressed"]["context_tokens"] / row["full"]["context_tokens"]
+        for row in rows
+        if row["full"]["context_tokens"] and row["compressed"]["context_tokens"] is not None
+    ]
+    summary = {
+        "questions": len(rows),
+        "median_context_tokens_full": median(values("context_tokens", "full")) if values("context_tokens", "full") else None,
+        "median_context_tokens_compressed": median(values("context_tokens", "compressed")) if values("context_tokens", "compressed") else None,
+        "mean_compression_ratio": mean(ratios) if ratios else None,
+        "median_seconds_full": median(values("seconds", "full")) if rows else None,
+        "median_seconds_compressed": median(values("seconds", "compressed")) if rows else None,
+        "mean_answer_similarity": mean(values("answer_similarity")) if values("answer_similarity") else None,
+        "mean_keyword_recall_full": mean(values("keyword_recall_full")) if values("keyword_recall_full") else None,
+        "mean_keyword_recall_compressed": mean(values("keyword_recall_compressed")) if values("keyword_recall_compressed") else None
+    }
+
+    print("\n📊 Summary")
+    for key, value in summary.items():
+        print(f"  {key}: {value:.3f}" if isinstance(value, float) else f"  {key}: {value}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"summary": summary, "rows": rows}, indent=2), encoding="utf-8")
+        print(f"\n📝 Report written to {args.output}")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark extractive context compression")
+    parser.add_argument("questions", help="JSON list of {question, keywords} or a text file with one question per line")
+    parser.add_argument("--collection", default=None, help="Collection to query (default collection if omitted)")
+    parser.add_argument("--orchestrator", default="http://localhost:8001", help="Orchestrator URL")
+    parser.add_argument("-o", "--output", default=None, help="Write the per-question report to this JSON file")
+    return asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Measure the recall and latency of a collection's index profile against exact search
+
+Every question is searched through /process-query (no LLM, caches bypassed): once with an
+exact (brute-force, unquantized) search, which gives the true top k, then once per --ef value
+with the collection's index profile (HNSW graph, quantization with rescoring). Recall@k is the
+share of the exact top k each indexed search returns. Latency is the vector search time
+reported by the orchestrator (metadata.retrieval). The collection's estimated vector RAM is
+printed alongside, to compare profiles (PUT /collections/<name>/index-profile).
+
+Usage (inside the orchestrator container, which reaches the other services):
+    docker exec openrag-orchestrator python benchmark_index_recall.py questions.txt --collection docs
+    docker exec openrag-orchestrator python benchmark_index_recall.py questions.json --ef 64 128 256 -k 10 -o report.json
+
+questions.json: ["...", ...] or [{"question": "..."}, ...]; questions.txt: one question per line
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import uuid
+from pathlib import Path
+from statistics import mean, median
+
+import httpx
+
+
+def load_questions(path: str):
+    text = Path(path).read_text(encoding="utf-8")
+    if path.endswith(".json"):
+        return [item["question"] if isinstance(item, dict) else item for item in json.loads(text)]
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+async def search(client: httpx.AsyncClient, args, question: str, **options):
+    response = await client.post(f"{args.orchestrator}/process-query", json={
+        "query_id": str(uuid.uuid4()),
+        "query": question,
+        "collection_id": args.collection,
+        "max_results": args.k,
+        "use_llm": False,
+        "use_cache": False,
+        "context_expansion": "none",
+        **options
+    })
+    response.raise_for_status()
+    result = response.json()
+    retrieval = next(iter((result.get("metadata", {}).get("retrieval") or {}).values()), {})
+    return {
+        "search_ms": (retrieval.get("vector") or {}).get("ms"),
+        "chunks": [(source["document_id"], source["chunk_index"]) for source in result.get("sources", [])]
+    }
+
+
+async def run(args) -> int:
+    questions = load_questions(args.questions)
+    variants = {f"ef={ef}" if ef else "profile": {"hnsw_ef": ef} if ef else {} for ef in args.ef or [None]}
+    rows = []
+
+    async with httpx.AsyncClient(timeout=120.0) as client:
+        profile = (await client.get(
+            f"{args.orchestrator}/collections/{args.collection or 'documents_embeddings'}/index-profile"
+        )).json()
+        for idx, question in enumerate(questions, 1):
+            exact = await search(client, args, question, exact=True)
+            row = {"question": question, "exact": exact, "variants": {}}
+            for name, options in variants.items():
+                found = await search(client, args, question, **options)
+                found["recall_at_k"] = (
+                    len(set(found["chunks"]) & set(exact["chunks"])) / len(exact["chunks"])
+                    if exact["chunks"] else None
+                )
+                row["variants"][name] = found
+            rows.append(row)
+            print(f"[{idx}/{len(questions)}] " + ", ".join(
+                f"{name}: recall@{args.k} {found['recall_at_k']}, {found['search_ms']} ms"
+                for name, found in row["variants"].items()
+            ))
+
+    def summarize(function, found):
+        found = [value for value in found if value is not None]
+        return function(found) if found else None
+
+    summary = {
+        "questions": len(rows),
+        "k": args.k,
+        "profile": profile.get("profile"),
+        "estimated_ram_bytes": (profile.get("live") or {}).get("estimated_ram_bytes"),
+        "estimated_ram_bytes_unquantized": (profile.get("live") or {}).get("estimated_ram_bytes_unquantized"),
+        "median_search_ms_exact": summarize(median, [row["exact"]["search_ms"] for row in rows]),
+        "variants": {
+            name: {
+                "mean_recall_at_k": summarize(mean, [row["variants"][name]["recall_at_k"] for row in rows]),
+                "median_search_ms": summarize(median, [row["variants"][name]["search_ms"] for row in rows])
+            }
+            for name in variants
+        }
+    }
+
+    print("\n📊 Summary")
+    print(json.dumps(summary, indent=2))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"summary": summary, "rows": rows}, indent=2), encoding="utf-8")
+        print(f"\n📝 Report written to {args.output}")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure index recall and latency against exact search")
+    parser.add_argument("questions", help="JSON list of questions or a text file with one question per line")
+    parser.add_argument("--collection", default=None, help="Collection to query (default collection if omitted)")
+    parser.add_argument("--ef", type=int, nargs="*", default=None, help="Search ef values to compare (default: the profile's)")
+    parser.add_argument("-k", type=int, default=10, help="Chunks retrieved per question (max_results)")
+    parser.add_argument("--orchestrator", default="http://localhost:8001", help="Orchestrator URL")
+    parser.add_argument("-o", "--output", default=None, help="Write the per-question report to this JSON file")
+    return asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,17 +2,36 @@
 PostgreSQL Database Service
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import asyncpg
 import os
 from loguru import logger
 import json
 from datetime import datetime
+from decimal import Decimal
 
 
 class DatabaseService:
     """Handles PostgreSQL database operations"""
     
+    # Collection a document was indexed into: recorded at ingest, else its first collection mapping
+    COLLECTION_NAME_SQL = """
+        COALESCE(
+            d.metadata->>'collection',
+            (SELECT c.name FROM document_collections dc
+             JOIN collections c ON dc.collection_id = c.id
+             WHERE dc.document_id = d.id
+             ORDER BY c.name LIMIT 1)
+        )
+    """
+    
+    # Text search configuration of document_chunks.content_tsv (must match init.sql):
+    # no stemming and no stop words, so identifiers and codes match verbatim in any language
+    LEXICAL_TS_CONFIG = "simple"
+    
+    # Chunk columns returned by the lookups (content_tsv is only used inside queries)
+    CHUNK_COLUMNS = "dc.id, dc.document_id, dc.chunk_index, dc.content, dc.token_count, dc.vector_id, dc.metadata, dc.created_at"
+    
     def __init__(self):
         self.host = os.getenv("POSTGRES_HOST", "postgres")
         self.port = int(os.getenv("POSTGRES_PORT", "5432"))
@@ -59,10 +78,11 @@ class DatabaseService:
         async with pool.acquire() as conn:
             await conn.execute(
                 """
-                INSERT INTO documents (id, filename, original_filename, file_type, file_size, minio_object_key, status)
-                VALUES ($1, $2, $3, $4, $5, $6, $7)
+                INSERT INTO documents (id, filename, original_filename, file_type, file_size, minio_object_key, status, metadata)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
                 """,
-                document_id, filename, filename, file_type, file_size, minio_object_key, "uploaded"
+                document_id, filename, filename, file_type, file_size, minio_object_key, "uploaded",
+                json.dumps({"collection": collection_id})
             )
             
             # Add to collection
@@ -125,6 +145,108 @@ class DatabaseService:
             rows = await conn.fetch(query, *params)
             return [dict(row) for row in rows]
     
+    @staticmethod
+    def _document_conditions(
+        collection_id: Optional[str] = None,
+        status: Optional[str] = None,
+        uploaded_before: Optional[datetime] = None,
+        uploaded_after: Optional[datetime] = None,
+        params: Optional[list] = None
+    ):
+        """Build WHERE conditions on documents d; returns (conditions, params)"""
+        params = params if params is not None else []
+        conditions = []
+        
+        if collection_id:
+            params.append(collection_id)
+            conditions.append(
+                f"(d.metadata->>'collection' = ${len(params)} OR EXISTS ("
+                f"SELECT 1 FROM document_collections dc JOIN collections c ON dc.collection_id = c.id "
+                f"WHERE dc.document_id = d.id AND c.name = ${len(params)}))"
+            )
+        
+        if status:
+            params.append(status)
+            conditions.append(f"d.status = ${len(params)}")
+        
+        if uploaded_before:
+            params.append(uploaded_before)
+            conditions.append(f"d.upload_date < ${len(params)}")
+        
+        if uploaded_after:
+            params.append(uploaded_after)
+            conditions.append(f"d.upload_date >= ${len(params)}")
+        
+        return conditions, params
+    
+    async def list_documents_after(
+        self,
+        after_id: Optional[str] = None,
+        collection_id: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: int = 100,
+        uploaded_before: Optional[datetime] = None,
+        uploaded_after: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Keyset-paginated document listing ordered by id.
+        Each row carries the name of the collection the document was indexed into.
+        """
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            query = f"""
+                SELECT d.*, {self.COLLECTION_NAME_SQL} AS collection_name
+                FROM documents d
+            """
+            params = []
+            conditions = []
+            
+            if after_id:
+                params.append(str(after_id))
+                conditions.append(f"d.id > ${len(params)}::uuid")
+            
+            more, params = self._document_conditions(
+                collection_id, status, uploaded_before, uploaded_after, params
+            )
+            conditions.extend(more)
+            
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            
+            query += f" ORDER BY d.id LIMIT ${len(params) + 1}"
+            params.append(limit)
+            
+            rows = await conn.fetch(query, *params)
+            return [dict(row) for row in rows]
+    
+    async def count_documents(
+        self,
+        collection_id: Optional[str] = None,
+        status: Optional[str] = None,
+        uploaded_before: Optional[datetime] = None,
+        uploaded_after: Optional[datetime] = None
+    ) -> int:
+        """Count documents matching the given filters"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            query = "SELECT COUNT(*) FROM documents d"
+            conditions, params = self._document_conditions(
+                collection_id, status, uploaded_before, uploaded_after
+            )
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            
+            return await conn.fetchval(query, *params)
+    
+    async def get_document_collection(self, document_id: str) -> Optional[str]:
+        """Name of the collection a document was indexed into"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            return await conn.fetchval(
+                f"SELECT {self.COLLECTION_NAME_SQL} FROM documents d WHERE d.id = $1",
+                document_id
+            )
+    
     async def update_document_status(self, document_id: str, status: str):
         """Update the processing status of a document"""
         pool = await self._get_pool()
@@ -145,6 +267,23 @@ class DatabaseService:
         async with pool.acquire() as conn:
             await conn.execute("DELETE FROM documents WHERE id = $1", document_id)
     
+    async def delete_documents(self, document_ids: List[str]):
+        """
+        Delete a batch of documents in one transaction.
+        Chunks are removed explicitly first so the cascade stays bounded to the batch.
+        """
+        if not document_ids:
+            return
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    "DELETE FROM document_chunks WHERE document_id = ANY($1::uuid[])", document_ids
+                )
+                await conn.execute(
+                    "DELETE FROM documents WHERE id = ANY($1::uuid[])", document_ids
+                )
+    
     # ============================================
     # Chunks
     # ============================================
@@ -168,12 +307,44 @@ class DatabaseService:
                 document_id, chunk_index, content, vector_id, json.dumps(metadata)
             )
     
+    async def create_chunks(self, document_id: str, chunks: List[Dict[str, Any]]):
+        """
+        Insert many chunk records in one round trip.
+        Each chunk is a dict with chunk_index, content, vector_id and metadata.
+        """
+        if not chunks:
+            return
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            await conn.executemany(
+                """
+                INSERT INTO document_chunks (document_id, chunk_index, content, vector_id, metadata)
+                VALUES ($1, $2, $3, $4, $5)
+                """,
+                [
+                    (
+                        document_id,
+                        chunk["chunk_index"],
+                        chunk["content"],
+                        chunk["vector_id"],
+                        json.dumps(chunk.get("metadata", {}))
+                    )
+                    for chunk in chunks
+                ]
+            )
+    
+    async def delete_document_chunks(self, document_id: str):
+        """Delete every chunk record of a document"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute("DELETE FROM document_chunks WHERE document_id = $1", document_id)
+    
     async def get_chunk_by_vector_id(self, vector_id: str) -> Optional[Dict[str, Any]]:
         """Retrieve a chunk by its vector ID"""
         pool = await self._get_pool()
         async with pool.acquire() as conn:
             row = await conn.fetchrow(
-                "SELECT * FROM document_chunks WHERE vector_id = $1", vector_id
+                f"SELECT {self.CHUNK_COLUMNS} FROM document_chunks dc WHERE dc.vector_id = $1", vector_id
             )
             if row:
                 result = dict(row)
@@ -182,15 +353,200 @@ class DatabaseService:
                 return result
             return None
     
+    async def get_chunks_by_vector_ids(self, vector_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Retrieve many chunks with their document's filename in a single statement.
+        Returns a dict keyed by vector_id; unknown IDs are absent.
+        """
+        if not vector_ids:
+            return {}
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                f"""
+                SELECT {self.CHUNK_COLUMNS}, d.filename
+                FROM document_chunks dc
+                JOIN documents d ON d.id = dc.document_id
+                WHERE dc.vector_id = ANY($1::text[])
+                """,
+                vector_ids
+            )
+            return {row["vector_id"]: self._chunk_row(row) for row in rows}
+    
     async def get_document_chunks(self, document_id: str) -> List[Dict[str, Any]]:
         """Retrieve all chunks for a given document"""
         pool = await self._get_pool()
         async with pool.acquire() as conn:
             rows = await conn.fetch(
-                "SELECT * FROM document_chunks WHERE document_id = $1 ORDER BY chunk_index",
+                f"SELECT {self.CHUNK_COLUMNS} FROM document_chunks dc WHERE dc.document_id = $1 ORDER BY dc.chunk_index",
                 document_id
             )
-            return [dict(row) for row in rows]
+            return [self._chunk_row(row) for row in rows]
+    
+    async def get_chunk_windows(self, windows: List[Tuple[str, int, int]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Retrieve ranges of consecutive chunks, given as (document_id, first chunk_index,
+        last chunk_index), in a single statement. Returns the chunks of each document in
+        chunk_index order, keyed by document_id.
+        """
+        if not windows:
+            return {}
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                f"""
+                SELECT DISTINCT {self.CHUNK_COLUMNS}, d.filename
+                FROM unnest($1::uuid[], $2::int[], $3::int[]) AS w(document_id, first_index, last_index)
+                JOIN document_chunks dc
+                  ON dc.document_id = w.document_id
+                 AND dc.chunk_index BETWEEN w.first_index AND w.last_index
+                JOIN documents d ON d.id = dc.document_id
+                ORDER BY dc.document_id, dc.chunk_index
+                """,
+                [document_id for document_id, _, _ in windows],
+                [first for _, first, _ in windows],
+                [last for _, _, last in windows]
+            )
+            chunks: Dict[str, List[Dict[str, Any]]] = {}
+            for row in rows:
+                chunks.setdefault(str(row["document_id"]), []).append(self._chunk_row(row))
+            return chunks
+    
+    async def search_chunks_lexical(
+        self,
+        query: str,
+        collection_name: Optional[str] = None,
+        limit: int = 10,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Full-text search of chunk contents through the GIN index on content_tsv.
+        Any term of the query may match; hits are ranked with ts_rank_cd and returned in the
+        vector search format: {"id": vector_id, "score": rank, "payload": {...}}.
+        collection_name is the vector collection the chunks were indexed into.
+        Raises ValueError on unsupported metadata_filter values.
+        """
+        params = [query]
+        conditions = ["dc.content_tsv @@ q.query", "dc.vector_id IS NOT NULL"]
+        collection_documents = ""
+        if collection_name:
+            # Documents of the collection resolved once, through the index on metadata->>'collection'
+            # (documents indexed before it was recorded fall back to their collection mapping)
+            params.append(collection_name)
+            collection_documents = f"""
+                WITH collection_documents AS MATERIALIZED (
+                    SELECT d.id FROM documents d WHERE d.metadata->>'collection' = ${len(params)}
+                    UNION ALL
+                    SELECT d.id FROM documents d
+                    WHERE d.metadata->>'collection' IS NULL
+                      AND COALESCE({self.COLLECTION_NAME_SQL}, 'documents_embeddings') = ${len(params)}
+                )
+            """
+            conditions.append("dc.document_id IN (SELECT id FROM collection_documents)")
+        conditions.extend(self._chunk_filter_conditions(metadata_filter, params))
+        params.append(limit)
+        
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                f"""
+                {collection_documents}
+                SELECT dc.vector_id, dc.document_id, dc.chunk_index, dc.content, dc.metadata, d.filename,
+                       ts_rank_cd(dc.content_tsv, q.query, 1) AS rank
+                FROM document_chunks dc
+                JOIN documents d ON d.id = dc.document_id
+                CROSS JOIN (
+                    -- OR of the query's lexemes (plainto_tsquery alone would require all of them);
+                    -- its text form quotes and escapes each lexeme, and the cast does not re-stem them
+                    SELECT replace(plainto_tsquery('{self.LEXICAL_TS_CONFIG}', $1)::text, ' & ', ' | ')::tsquery AS query
+                ) q
+                WHERE {" AND ".join(conditions)}
+                ORDER BY rank DESC
+                LIMIT ${len(params)}
+                """,
+                *params
+            )
+        
+        hits = []
+        for row in rows:
+            chunk = self._chunk_row(row)
+            hits.append({
+                "id": chunk["vector_id"],
+                "score": float(chunk["rank"]),
+                "payload": {
+                    "document_id": str(chunk["document_id"]),
+                    "chunk_index": chunk["chunk_index"],
+                    "content": chunk["content"],
+                    "filename": chunk["filename"],
+                    "metadata": chunk.get("metadata") or {}
+                }
+            })
+        return hits
+    
+    @staticmethod
+    def _chunk_filter_conditions(metadata_filter: Optional[Dict[str, Any]], params: list) -> List[str]:
+        """
+        SQL conditions on chunks dc (joined to documents d) equivalent to a vector search
+        metadata_filter (see vector_store.build_filter). Appends the values to params.
+        """
+        conditions = []
+        for key, value in (metadata_filter or {}).items():
+            path = key.split(".")
+            if path[0] in ("document_id", "chunk_index", "content") and len(path) == 1:
+                text = f"dc.{key}::text"
+                number = "dc.chunk_index::numeric" if key == "chunk_index" else "NULL::numeric"
+            elif path[0] == "filename" and len(path) == 1:
+                text, number = "d.filename", "NULL::numeric"
+            else:
+                if path[0] == "metadata":
+                    path = path[1:]
+                params.append(path)
+                field = f"${len(params)}::text[]"
+                text = f"(dc.metadata #>> {field})"
+                number = (
+                    f"(CASE WHEN jsonb_typeof(dc.metadata #> {field}) = 'number' "
+                    f"THEN (dc.metadata #>> {field})::numeric END)"
+                )
+            
+            def as_text(item):
+                return item if isinstance(item, str) else json.dumps(item)
+            
+            def match_any(values, negate=False):
+                params.append([as_text(item) for item in values])
+                return f"{text} {'<> ALL' if negate else '= ANY'}(${len(params)}::text[])"
+            
+            def compare(operator, bound):
+                params.append(Decimal(str(bound)))
+                return f"{number} {operator} ${len(params)}::numeric"
+            
+            if isinstance(value, dict):
+                unknown = set(value) - {"gt", "gte", "lt", "lte", "any", "except"}
+                if unknown:
+                    raise ValueError(f"Unsupported filter operators for {key}: {sorted(unknown)}")
+                if "any" in value:
+                    conditions.append(match_any(value["any"]))
+                if "except" in value:
+                    conditions.append(f"({text} IS NULL OR {match_any(value['except'], negate=True)})")
+                operators = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+                conditions.extend(compare(operators[op], value[op]) for op in operators if op in value)
+            elif isinstance(value, list):
+                conditions.append(match_any(value))
+            elif isinstance(value, (str, int, bool)):
+                params.append(as_text(value))
+                conditions.append(f"{text} = ${len(params)}")
+            elif isinstance(value, float):
+                conditions.append(compare("=", value))
+            else:
+                raise ValueError(f"Unsupported filter value for {key}: {value!r}")
+        return conditions
+    
+    @staticmethod
+    def _chunk_row(row) -> Dict[str, Any]:
+        """Convert a chunk row to a dict with decoded metadata"""
+        result = dict(row)
+        if isinstance(result.get("metadata"), str):
+            result["metadata"] = json.loads(result["metadata"])
+        return result
     
     # ============================================
     # Queries
@@ -220,20 +576,94 @@ class DatabaseService:
     # Processing Jobs
     # ============================================
     
-    async def create_processing_job(self, job_type: str, document_id: str) -> str:
+    async def create_processing_job(
+        self,
+        job_type: str,
+        document_id: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> str:
         """Create a processing job record"""
         pool = await self._get_pool()
         async with pool.acquire() as conn:
             row = await conn.fetchrow(
                 """
-                INSERT INTO processing_jobs (job_type, document_id, status)
-                VALUES ($1, $2, 'pending')
+                INSERT INTO processing_jobs (job_type, document_id, status, metadata)
+                VALUES ($1, $2, 'pending', $3)
                 RETURNING id
                 """,
-                job_type, document_id
+                job_type, document_id, json.dumps(metadata or {})
             )
             return str(row["id"])
     
+    async def get_processing_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Retrieve a processing job by ID"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow(
+                "SELECT * FROM processing_jobs WHERE id = $1", job_id
+            )
+            if not row:
+                return None
+            result = dict(row)
+            if isinstance(result.get("metadata"), str):
+                result["metadata"] = json.loads(result["metadata"])
+            return result
+    
+    async def list_processing_jobs(
+        self,
+        job_type: str,
+        statuses: Optional[List[str]] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Latest processing jobs of a type (optionally in given statuses), newest first"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT * FROM processing_jobs
+                WHERE job_type = $1 AND ($2::text[] IS NULL OR status = ANY($2::text[]))
+                ORDER BY created_at DESC
+                LIMIT $3
+                """,
+                job_type, statuses, limit
+            )
+            jobs = []
+            for row in rows:
+                job = dict(row)
+                if isinstance(job.get("metadata"), str):
+                    job["metadata"] = json.loads(job["metadata"])
+                jobs.append(job)
+            return jobs
+    
+    async def update_processing_job(
+        self,
+        job_id: str,
+        status: Optional[str] = None,
+        progress: Optional[int] = None,
+        error_message: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Update a processing job. Only the given fields change; metadata is merged.
+        started_at / completed_at are stamped on the first transition to running / a final state.
+        """
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE processing_jobs
+                SET status = COALESCE($2::text, status),
+                    progress = COALESCE($3, progress),
+                    error_message = COALESCE($4, error_message),
+                    metadata = COALESCE(metadata, '{}'::jsonb) || COALESCE($5::jsonb, '{}'::jsonb),
+                    started_at = CASE WHEN $2::text = 'running' THEN COALESCE(started_at, CURRENT_TIMESTAMP) ELSE started_at END,
+                    completed_at = CASE WHEN $2::text IN ('completed', 'failed') THEN CURRENT_TIMESTAMP ELSE completed_at END
+                WHERE id = $1::uuid
+                """,
+                job_id, status, progress, error_message,
+                json.dumps(metadata) if metadata is not None else None
+            )
+    
     # ============================================
     # Collections
     # ============================================
@@ -244,3 +674,64 @@ class DatabaseService:
         async with pool.acquire() as conn:
             rows = await conn.fetch("SELECT * FROM collections ORDER BY name")
             return [dict(row) for row in rows]
+    
+    async def list_index_profiles(self) -> Dict[str, Dict[str, Any]]:
+        """Qdrant index profiles stored in collections.metadata, by collection name"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT name, metadata->'index_profile' AS profile FROM collections WHERE metadata ? 'index_profile'"
+            )
+            return {
+                row["name"]: json.loads(row["profile"]) if isinstance(row["profile"], str) else row["profile"]
+                for row in rows
+            }
+    
+    async def list_bulk_loads(self) -> Dict[str, Optional[int]]:
+        """Collections in bulk-load mode with the indexing threshold to restore, from collections.metadata"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT name, (metadata->'bulk_load'->>'indexing_threshold')::int AS threshold
+                FROM collections WHERE metadata ? 'bulk_load'
+                """
+            )
+            return {row["name"]: row["threshold"] for row in rows}
+    
+    async def set_bulk_load(self, collection_name: str, indexing_threshold: Optional[int]):
+        """Record that a collection is in bulk-load mode and the threshold to restore, creating the row if needed"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO collections (name, metadata)
+                VALUES ($1, jsonb_build_object('bulk_load', jsonb_build_object('indexing_threshold', $2::int)))
+                ON CONFLICT (name) DO UPDATE
+                SET metadata = COALESCE(collections.metadata, '{}'::jsonb) || EXCLUDED.metadata
+                """,
+                collection_name, indexing_threshold
+            )
+    
+    async def clear_bulk_load(self, collection_name: str):
+        """Forget the bulk-load mode of a collection once its indexing is restored"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                "UPDATE collections SET metadata = metadata - 'bulk_load' WHERE name = $1",
+                collection_name
+            )
+    
+    async def set_index_profile(self, collection_name: str, profile: Dict[str, Any]):
+        """Store the index profile of a collection in its metadata, creating the collection row if needed"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO collections (name, metadata)
+                VALUES ($1, jsonb_build_object('index_profile', $2::jsonb))
+                ON CONFLICT (name) DO UPDATE
+                SET metadata = COALESCE(collections.metadata, '{}'::jsonb) || EXCLUDED.metadata
+                """,
+                collection_name, json.dumps(profile)
+            )
@@ -3,21 +3,37 @@ OpenRAG Orchestrator
 Coordinates the full RAG pipeline workflow
 """
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Union
 import os
-import uuid
+import json
+import time
 from datetime import datetime
 from loguru import logger
 import asyncio
 from prometheus_fastapi_instrumentator import Instrumentator
+from prometheus_client import Counter
 
 from services.document_processor import DocumentProcessor
-from services.vector_store import VectorStoreService
-from services.llm_service import LLMService
+from services.vector_store import VectorStoreService, build_filter
+from services.llm_pool import LLMBackendPool
+from services.llm_scheduler import LLMScheduler, SchedulerOverloaded, PRIORITIES
 from services.storage import MinIOStorage
+from services.indexer import DocumentIndexer
+from services.query_cache import QueryCache
+from services.semantic_cache import SemanticCache
+from services.context_packer import ContextPacker, covered_sources
+from services.context_expander import ContextExpander, CONTEXT_EXPANSION_MODES
+from services.fusion import fuse, FUSION_METHODS
+from services.hybrid_search import HybridRetriever
+from services.diversity import DIVERSITY_MODES
+from services.index_profiles import normalize_profile
+from services.document_index import DocumentIndex
+from services.collection_router import CollectionRouter
+from services.context_compressor import ContextCompressor
+from services.extractive_answer import ExtractiveAnswerer, ANSWER_MODES
 from database.db import DatabaseService
 
 # Configuration
@@ -35,7 +51,43 @@ db_service = DatabaseService()
 storage = MinIOStorage()
 vector_store = VectorStoreService()
 document_processor = DocumentProcessor()
-llm_service = LLMService()
+llm_pool = LLMBackendPool()
+llm_scheduler = LLMScheduler(llm_pool)
+document_index = DocumentIndex(vector_store, document_processor)
+collection_router = CollectionRouter(vector_store)
+indexer = DocumentIndexer(db_service, document_processor, vector_store, document_index, collection_router)
+query_cache = QueryCache()
+semantic_cache = SemanticCache(vector_store, query_cache)
+context_packer = ContextPacker()
+context_expander = ContextExpander(db_service)
+context_compressor = ContextCompressor(document_processor)
+extractive_answerer = ExtractiveAnswerer()
+hybrid_retriever = HybridRetriever(vector_store, db_service, document_index)
+
+# Where query contexts are read from: "payload" serves them from the Qdrant hits, "database" from PostgreSQL
+QUERY_CONTEXT_SOURCE = os.getenv("QUERY_CONTEXT_SOURCE", "payload")
+
+# How often a waiting request handler checks whether its client is still connected
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+
+QUERY_CANCELLATIONS = Counter(
+    "openrag_query_cancellations_total",
+    "Queries abandoned because the client disconnected",
+    ["endpoint"]
+)
+
+# LLM answers generated at the same time by one /query/batch request
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+
+# Strong references to fire-and-forget tasks so they are not garbage-collected mid-flight
+background_tasks = set()
+
+def run_in_background(coro) -> asyncio.Task:
+    """Schedule a coroutine without awaiting it"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
 
 # ============================================
 # Models
@@ -45,19 +97,176 @@ class ProcessQueryRequest(BaseModel):
     query_id: str
     query: str
     collection_id: Optional[str] = None
+    collection_ids: Optional[Union[List[str], str]] = None  # several collections, "*" for all or "auto" (routed); overrides collection_id
+    route_collections: Optional[int] = None  # collections searched by routed queries; defaults to COLLECTION_ROUTING_TOP_N
+    fusion: str = "rrf"  # how hits of several collections are merged: "rrf" or "score"
+    hybrid: Optional[bool] = None  # add full-text search to the vector search; defaults to HYBRID_SEARCH_ENABLED
+    vector_weight: Optional[float] = None  # hybrid fusion weights; default HYBRID_VECTOR_WEIGHT / HYBRID_LEXICAL_WEIGHT
+    lexical_weight: Optional[float] = None
+    coarse_documents: Optional[int] = None  # search only the chunks of the N closest documents; defaults to COARSE_SEARCH_DOCUMENTS (0: all)
+    diversity: Optional[str] = None  # "mmr", "group" (per-document cap) or "none"; defaults to DIVERSITY_MODE
+    mmr_lambda: Optional[float] = None  # relevance vs. novelty in MMR (1: relevance only); defaults to MMR_LAMBDA
+    max_per_document: Optional[int] = None  # hits per document in "group" mode; defaults to MAX_HITS_PER_DOCUMENT
+    hnsw_ef: Optional[int] = None  # search ef (recall vs. latency); defaults to the collection's index profile
+    exact: Optional[bool] = None  # exact (brute-force) search, e.g. to measure the recall of the index
     max_results: int = 15
     use_llm: bool = True
     metadata_filter: Optional[Dict[str, Any]] = None
+    context_source: Optional[str] = None  # "payload" (Qdrant only) or "database"; defaults to QUERY_CONTEXT_SOURCE
+    context_expansion: Optional[str] = None  # widen hits to their "parent" window, their "neighbors" or "none"; defaults to CONTEXT_EXPANSION
+    context_neighbors: Optional[int] = None  # chunks on each side in "neighbors" mode; defaults to CONTEXT_EXPANSION_NEIGHBORS
+    use_cache: bool = True  # set to false to bypass the response cache
+    priority: str = "interactive"  # "interactive" or "batch"; batch waits behind interactive LLM requests
+    deadline_seconds: Optional[float] = None  # give up (503) if no answer by then; defaults to LLM_DEADLINE_SECONDS
+    compress_contexts: Optional[bool] = None  # extractive sentence compression; defaults to CONTEXT_COMPRESSION_ENABLED
+    answer_mode: str = "llm"  # "llm", "extractive" (best sentences, no LLM) or "auto" (LLM only if extraction is unsure)
 
 class ProcessQueryResponse(BaseModel):
     answer: Optional[str] = None
     sources: List[Dict[str, Any]] = []
     metadata: Dict[str, Any] = {}
+    highlights: Optional[List[Dict[str, Any]]] = None  # extractive answers: passages with the matching spans
+
+class BatchQueryItem(BaseModel):
+    query_id: str
+    query: str
+
+class BatchQueryRequest(BaseModel):
+    queries: List[BatchQueryItem]
+    collection_id: Optional[str] = None
+    max_results: int = 15
+    use_llm: bool = True
+    metadata_filter: Optional[Dict[str, Any]] = None
+    context_source: Optional[str] = None
+    context_expansion: Optional[str] = None
+    context_neighbors: Optional[int] = None
+    compress_contexts: Optional[bool] = None
+    answer_mode: str = "llm"
+    hybrid: Optional[bool] = None
+    vector_weight: Optional[float] = None
+    lexical_weight: Optional[float] = None
+    coarse_documents: Optional[int] = None
+    diversity: Optional[str] = None
+    mmr_lambda: Optional[float] = None
+    max_per_document: Optional[int] = None
+    hnsw_ef: Optional[int] = None
+    exact: Optional[bool] = None
+    llm_concurrency: Optional[int] = None  # defaults to BATCH_LLM_CONCURRENCY
+
+class BulkDeleteRequest(BaseModel):
+    collection_id: Optional[str] = None
+    status: Optional[str] = None
+    uploaded_before: Optional[datetime] = None
+    uploaded_after: Optional[datetime] = None
+
+class PayloadIndexRequest(BaseModel):
+    field: str
+    type: str = "keyword"  # keyword, integer, float, bool, geo, text
+
+class IndexProfileRequest(BaseModel):
+    quantization: Optional[str] = None  # "none", "scalar" (int8), "product" or "binary"
+    quantile: Optional[float] = None
+    compression: Optional[str] = None  # product quantization: x4 ... x64
+    always_ram: Optional[bool] = None
+    rescore: Optional[bool] = None
+    oversampling: Optional[float] = None
+    on_disk: Optional[bool] = None
+    on_disk_payload: Optional[bool] = None
+    hnsw_m: Optional[int] = None
+    hnsw_ef_construct: Optional[int] = None
+    hnsw_ef: Optional[int] = None
+
+class MigrationRequest(BaseModel):
+    vector_size: Optional[int] = None
+    embedding_service_url: Optional[str] = None
+    auto_swap: bool = True
 
 # ============================================
 # Routes
 # ============================================
 
+@app.on_event("startup")
+async def load_index_profiles():
+    """Index profiles stored in collections.metadata, used for new collection versions and searches"""
+    try:
+        profiles = await db_service.list_index_profiles()
+        vector_store.index_profiles.update(
+            {name: normalize_profile(profile) for name, profile in profiles.items()}
+        )
+        logger.info(f"Index profiles loaded for {len(profiles)} collections")
+    except Exception as e:
+        logger.error(f"Index profiles not loaded, using the default: {e}")
+
+@app.on_event("startup")
+async def load_bulk_loads():
+    """Collections left in bulk-load mode, so that finishing them restores their recorded threshold"""
+    try:
+        vector_store.bulk_loads.update(await db_service.list_bulk_loads())
+    except Exception as e:
+        logger.error(f"Bulk loads not loaded: {e}")
+
+@app.on_event("startup")
+async def check_vector_dimensions():
+    """
+    Refuse to start when QDRANT_VECTOR_SIZE contradicts the embedding model (/model/info),
+    and report the collections whose vectors have another dimension (their writes are refused)
+    """
+    try:
+        mismatches = await asyncio.to_thread(vector_store.dimension_mismatches)
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.warning(f"Vector dimensions not checked at startup, checked on first write: {e}")
+        return
+    dimension = vector_store.embedding_dimension()
+    for collection_name, size in mismatches.items():
+        logger.error(
+            f"Collection {collection_name} holds {size}-d vectors but the embedding model produces "
+            f"{dimension}-d ones; migrate it (POST /collections/{collection_name}/migrations)"
+        )
+
+@app.on_event("startup")
+async def recover_migrations():
+    """
+    Reload the latest migration of each collection from processing_jobs. Migrations cut short by
+    a restart are marked failed and their half-built shadow collection is dropped (unless it
+    was already swapped in, in which case the migration completed).
+    """
+    try:
+        jobs = await db_service.list_processing_jobs("collection_migration")
+        for job in jobs:
+            status = job.get("metadata") or {}
+            collection_name = status.get("collection")
+            if not collection_name or collection_name in vector_store.migrations:
+                continue
+            status["job_id"] = str(job["id"])
+            if job["status"] in ("pending", "running"):
+                await close_interrupted_migration(collection_name, status)
+            status.pop("progress", None)
+            vector_store.migrations[collection_name] = status
+    except Exception as e:
+        logger.error(f"Migrations not recovered: {e}")
+
+async def close_interrupted_migration(collection_name: str, status: Dict[str, Any]):
+    """Settle a migration job whose process died: completed if its shadow is live, else failed and dropped"""
+    live = await asyncio.to_thread(vector_store.resolve_collection, collection_name)
+    if live == status["shadow"]:
+        status["status"] = "completed"
+    else:
+        status.update(status="failed", error="Interrupted by an orchestrator restart")
+        try:
+            await asyncio.to_thread(vector_store.drop_version, collection_name, status["shadow"])
+        except ValueError:
+            pass  # the shadow was never created
+    status["finished_at"] = datetime.utcnow().isoformat()
+    await db_service.update_processing_job(
+        status["job_id"],
+        status="failed" if status["status"] == "failed" else "completed",
+        error_message=status["error"],
+        metadata=status
+    )
+    logger.warning(f"Migration of {collection_name} was interrupted by a restart: marked {status['status']}")
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -91,97 +300,747 @@ async def health_check():
         health_status["dependencies"]["minio"] = f"unhealthy: {str(e)}"
         health_status["status"] = "degraded"
     
+    health_status["llm_scheduler"] = llm_scheduler.stats()
+    health_status["llm_backends"] = llm_pool.stats()
+    
     return health_status
 
 @app.post("/process-query", response_model=ProcessQueryResponse)
-async def process_query(request: ProcessQueryRequest):
+async def process_query(request: ProcessQueryRequest, http_request: Request):
     """
     Process a user query through the RAG workflow:
     1. Generate query embedding
     2. Search the vector store
     3. Retrieve source documents
     4. Generate an LLM answer
+    
+    If the caller disconnects, the pipeline (and any in-flight LLM call) is cancelled.
     """
     try:
-        logger.info(f"Processing query: {request.query_id}")
+        return await run_until_disconnected(http_request, answer_query(request), "process-query")
+    except ClientDisconnected:
+        logger.info(f"Client disconnected, query cancelled: {request.query_id}")
+        return Response(status_code=499)
+
+async def answer_query(request: ProcessQueryRequest) -> ProcessQueryResponse:
+    """Non-streaming RAG pipeline"""
+    try:
+        prepared = await retrieve_for_query(request)
+        if prepared["response"] is not None:
+            return prepared["response"]
+        return await answer_prepared(request, prepared)
+        
+    except SchedulerOverloaded as e:
+        logger.warning(f"Query {request.query_id} shed ({e.reason}): {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing query: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def answer_prepared(request: ProcessQueryRequest, prepared: Dict[str, Any]) -> ProcessQueryResponse:
+    """Generation step for a retrieved query (unless an extractive answer is served)"""
+    # 3. Generate LLM response
+    answer = None
+    if answers_query(request) and prepared["contexts"]:
+        extractive = await prepare_answer(request, prepared)
+        if extractive is not None:
+            return finalize_query(request, prepared, extractive["answer"], extractive)
         
-        # 1. Recherche vectorielle
-        logger.info("Step 1: Vector search")
-        search_results = await vector_store.search(
+        logger.info("Step 3: Generating LLM response")
+        answer = await llm_scheduler.generate_answer(
             query=request.query,
-            collection_name=request.collection_id or "documents_embeddings",
-            limit=request.max_results or 5,  # default 5 results
-            score_threshold=0.0  # Pas de seuil - pour debug
+            contexts=format_contexts(prepared["contexts"]),
+            priority=request.priority,
+            deadline_seconds=request.deadline_seconds
         )
+    
+    return finalize_query(request, prepared, answer)
+
+@app.post("/query/batch")
+async def process_query_batch(batch: BatchQueryRequest):
+    """
+    Answer many queries with shared work, streamed back as newline-delimited JSON
+    in completion order:
+    1. all queries embedded with one /embed/batch call
+    2. one Qdrant search_batch request
+    3. chunks of every hit fetched in one PostgreSQL round trip
+    4. answers generated at "batch" priority, at most llm_concurrency at a time
+    
+    Caches are bypassed. Each line is {"index", "query_id", "answer", "sources", "highlights",
+    "metadata"}, or {"index", "query_id", "error", "status"} for a failed query.
+    """
+    if not batch.queries:
+        raise HTTPException(status_code=400, detail="No queries")
+    empty = [idx for idx, item in enumerate(batch.queries) if not item.query.strip()]
+    if empty:
+        # The embedding service drops empty texts, which would misalign the whole batch
+        raise HTTPException(status_code=400, detail=f"Empty queries at indexes {empty[:10]}")
+    
+    requests = [
+        ProcessQueryRequest(
+            query_id=item.query_id,
+            query=item.query,
+            collection_id=batch.collection_id,
+            max_results=batch.max_results,
+            use_llm=batch.use_llm,
+            metadata_filter=batch.metadata_filter,
+            context_source=batch.context_source,
+            context_expansion=batch.context_expansion,
+            context_neighbors=batch.context_neighbors,
+            use_cache=False,
+            priority="batch",
+            compress_contexts=batch.compress_contexts,
+            answer_mode=batch.answer_mode,
+            hybrid=batch.hybrid,
+            vector_weight=batch.vector_weight,
+            lexical_weight=batch.lexical_weight,
+            coarse_documents=batch.coarse_documents,
+            diversity=batch.diversity,
+            mmr_lambda=batch.mmr_lambda,
+            max_per_document=batch.max_per_document,
+            hnsw_ef=batch.hnsw_ef,
+            exact=batch.exact
+        )
+        for item in batch.queries
+    ]
+    validate_query(requests[0])  # options are shared by the whole batch
+    
+    try:
+        logger.info(f"Processing batch of {len(requests)} queries")
+        query_vectors = await vector_store.embed_queries([request.query for request in requests])
+        shared = new_prepared(requests[0])
+        results_per_query, retrieval = await hybrid_retriever.search_batch(
+            queries=[request.query for request in requests],
+            collection_name=shared["collection_name"],
+            query_vectors=query_vectors,
+            limit=batch.max_results or 5,
+            metadata_filter=batch.metadata_filter,
+            hybrid=shared["hybrid"],
+            weights=shared["weights"],
+            coarse_documents=shared["coarse_documents"],
+            diversity=shared["diversity"],
+            search_options=shared["search_options"]
+        )
+        logger.info(f"Batch retrieval: {retrieval}")
+        built = await build_contexts_batch(results_per_query, batch.context_source, shared["expansion"])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing query batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    prepared_per_query = []
+    for request, query_vector, search_results, (contexts, sources, expansion) in zip(
+        requests, query_vectors, results_per_query, built
+    ):
+        prepared = new_prepared(request)
+        prepared["query_vector"] = query_vector
+        prepared["search_results"] = search_results
+        prepared["expanded"] = expansion
+        if search_results:
+            set_contexts(request, prepared, contexts, sources)
+        else:
+            prepared["response"] = no_results_response(request)
+        prepared_per_query.append(prepared)
+    
+    semaphore = asyncio.Semaphore(batch.llm_concurrency or BATCH_LLM_CONCURRENCY)
+    
+    async def run_one(index: int, request: ProcessQueryRequest, prepared: Dict[str, Any]) -> Dict[str, Any]:
+        line = {"index": index, "query_id": request.query_id}
+        if prepared["response"] is not None:
+            return {**line, **prepared["response"].model_dump()}
+        try:
+            async with semaphore:
+                response = await answer_prepared(request, prepared)
+            return {**line, **response.model_dump()}
+        except SchedulerOverloaded as e:
+            return {**line, "error": str(e), "status": 503}
+        except Exception as e:
+            logger.error(f"Error answering batch query {request.query_id}: {e}")
+            return {**line, "error": str(e), "status": 500}
+    
+    async def lines():
+        tasks = [
+            asyncio.create_task(run_one(index, request, prepared))
+            for index, (request, prepared) in enumerate(zip(requests, prepared_per_query))
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done, default=str) + "\n"
+        finally:
+            # Client went away mid-batch: stop the remaining generations
+            pending = [task for task in tasks if not task.done()]
+            if pending:
+                QUERY_CANCELLATIONS.labels(endpoint="query-batch").inc()
+                logger.info(f"Query batch abandoned with {len(pending)} queries pending")
+            for task in pending:
+                task.cancel()
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/query/stream")
+async def process_query_stream(request: ProcessQueryRequest):
+    """
+    Streaming variant of /process-query (server-sent events):
+    - "sources": emitted right after retrieval
+    - "token":   answer fragments as the LLM produces them (extractive answers come as a single token)
+    - "done":    final response metadata, plus highlights for extractive answers
+    - "error":   generation failed after the stream started (status 503 when the LLM is saturated)
+    """
+    try:
+        prepared = await retrieve_for_query(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing query: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def events():
+        response = prepared["response"]
+        if response is not None:
+            # Served from a cache (or nothing found): replay it as a stream
+            yield sse_event("sources", {"sources": response.sources})
+            if response.answer:
+                yield sse_event("token", {"text": response.answer})
+            yield sse_event("done", {"metadata": response.metadata, "highlights": response.highlights})
+            return
         
-        if not search_results:
-            logger.warning("No relevant documents found")
-            return ProcessQueryResponse(
-                answer="No relevant documents were found to answer your question." if request.use_llm else None,
-                sources=[],
-                metadata={"search_results_count": 0}
-            )
-        
-        # 2. Retrieve chunk contexts
-        logger.info("Step 2: Retrieving document contexts")
-        contexts = []
-        sources = []
+        yield sse_event("sources", {"sources": prepared["sources"]})
         
-        for result in search_results:
-            chunk_data = await db_service.get_chunk_by_vector_id(result["id"])
-            if chunk_data:
-                contexts.append({
-                    "content": chunk_data["content"],
-                    "score": result["score"],
-                    "metadata": chunk_data.get("metadata", {})
-                })
+        parts = []
+        if answers_query(request) and prepared["contexts"]:
+            try:
+                extractive = await prepare_answer(request, prepared)
+                if extractive is not None:
+                    response = finalize_query(request, prepared, extractive["answer"], extractive)
+                    if response.answer:
+                        yield sse_event("token", {"text": response.answer})
+                    yield sse_event("done", {"metadata": response.metadata, "highlights": response.highlights})
+                    return
                 
-                # Get document info for sources
-                doc_data = await db_service.get_document(chunk_data["document_id"])
-                if doc_data:
-                    sources.append({
-                        "document_id": str(doc_data["id"]),
-                        "filename": doc_data["filename"],
-                        "chunk_index": chunk_data["chunk_index"],
-                        "relevance_score": result["score"]
-                    })
+                logger.info("Step 3: Streaming LLM response")
+                async for token in llm_scheduler.stream_answer(
+                    query=request.query,
+                    contexts=format_contexts(prepared["contexts"]),
+                    priority=request.priority,
+                    deadline_seconds=request.deadline_seconds
+                ):
+                    parts.append(token)
+                    yield sse_event("token", {"text": token})
+            except (asyncio.CancelledError, GeneratorExit):
+                # The client went away: leaving the generator closes the provider connection
+                QUERY_CANCELLATIONS.labels(endpoint="query-stream").inc()
+                logger.info(f"Client disconnected, stream cancelled: {request.query_id}")
+                raise
+            except SchedulerOverloaded as e:
+                logger.warning(f"Query {request.query_id} shed ({e.reason}): {e}")
+                yield sse_event("error", {"detail": str(e), "status": 503})
+                return
+            except Exception as e:
+                logger.error(f"Error streaming query {request.query_id}: {e}")
+                yield sse_event("error", {"detail": str(e)})
+                return
         
-        # 3. Generate LLM response
-        answer = None
-        if request.use_llm and contexts:
-            logger.info("Step 3: Generating LLM response")
-            # Include filename in context for better LLM understanding
-            contexts_with_source = [
-                f"[Source: {ctx['metadata'].get('source_file', 'document inconnu')}]\n{ctx['content']}" 
-                for ctx in contexts
-            ]
-            answer = await llm_service.generate_answer(
-                query=request.query,
-                contexts=contexts_with_source
+        response = finalize_query(request, prepared, "".join(parts).strip() if parts else None)
+        yield sse_event("done", {"metadata": response.metadata})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+class ClientDisconnected(Exception):
+    """The HTTP client went away before the response was ready"""
+
+async def run_until_disconnected(http_request: Request, coro, endpoint: str):
+    """
+    Await coro while watching the HTTP connection. If the client disconnects first,
+    the task is cancelled (which aborts in-flight httpx calls such as LLM generation)
+    and ClientDisconnected is raised.
+    """
+    task = asyncio.create_task(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                task.cancel()
+                QUERY_CANCELLATIONS.labels(endpoint=endpoint).inc()
+                raise ClientDisconnected()
+    finally:
+        # Also covers this handler itself being cancelled
+        if not task.done():
+            task.cancel()
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def format_contexts(contexts: List[Dict[str, Any]]) -> List[str]:
+    """Prompt blocks for the LLM, each prefixed with its source file"""
+    # Include filename in context for better LLM understanding
+    return [
+        f"[Source: {ctx['metadata'].get('source_file', 'document inconnu')}]\n{ctx['content']}"
+        for ctx in contexts
+    ]
+
+async def retrieve_for_query(request: ProcessQueryRequest) -> Dict[str, Any]:
+    """
+    Everything before generation: filter validation, caches, search and context building.
+    
+    Returns a dict whose "response" is set when the query is already answered (cache hit
+    or no results); otherwise it carries contexts, sources and the state finalize_query needs.
+    """
+    logger.info(f"Processing query: {request.query_id}")
+    
+    validate_query(request)
+    prepared = new_prepared(request)
+    compress = prepared["compress"]
+    if routes_query(request):
+        # Routing needs the query embedding: caches are then keyed on the routed collections
+        query_vector = prepared["query_vector"] = await vector_store.embed_query(request.query)
+        collection_names = await route_query(request, query_vector, prepared)
+    else:
+        collection_names = await query_collections(request)
+    prepared["collection_name"] = collection_names[0] if len(collection_names) == 1 else None
+    fusion = request.fusion if len(collection_names) > 1 else None
+    
+    # 0. Response cache (keyed on the content versions of the collections searched)
+    if not request.use_cache:
+        query_cache.record_bypass()
+    elif query_cache.enabled and collection_names:
+        prepared["cache_key"] = await query_cache.make_key(
+            collection_names,
+            query=request.query,
+            max_results=request.max_results,
+            use_llm=request.use_llm,
+            metadata_filter=request.metadata_filter,
+            context_source=request.context_source or QUERY_CONTEXT_SOURCE,
+            hybrid=prepared["weights"] if prepared["hybrid"] else None,
+            coarse_documents=prepared["coarse_documents"],
+            diversity=prepared["diversity"],
+            search_options=prepared["search_options"],
+            context_expansion=prepared["expansion"],
+            compress_contexts=compress,
+            answer_mode=request.answer_mode,
+            fusion=fusion,
+            provider=llm_pool.provider,
+            model=llm_pool.model
+        )
+        cached = await query_cache.get(prepared["cache_key"]) if prepared["cache_key"] else None
+        if cached:
+            logger.info(f"Query served from cache: {request.query_id}")
+            prepared["response"] = answered_from_cache(
+                request, cached, {**cached["metadata"], "cached": True}
             )
-        
-        # 4. Save query to database
-        await db_service.save_query(
-            query_id=request.query_id,
-            query_text=request.query,
-            response_text=answer,
-            sources=sources
+            return prepared
+    
+    # 1. Recherche vectorielle (the query embedding is shared with the semantic cache)
+    logger.info("Step 1: Vector search")
+    query_vector = prepared["query_vector"] = (
+        prepared["query_vector"] or await vector_store.embed_query(request.query)
+    )
+    
+    if answers_query(request) and request.use_cache and semantic_cache.enabled and collection_names:
+        prepared["semantic_scope"] = SemanticCache.scope(
+            collection_names,
+            max_results=request.max_results,
+            metadata_filter=request.metadata_filter,
+            hybrid=prepared["weights"] if prepared["hybrid"] else None,
+            coarse_documents=prepared["coarse_documents"],
+            diversity=prepared["diversity"],
+            search_options=prepared["search_options"],
+            context_expansion=prepared["expansion"],
+            compress_contexts=compress,
+            answer_mode=request.answer_mode,
+            fusion=fusion,
+            provider=llm_pool.provider,
+            model=llm_pool.model
         )
-        
-        logger.info(f"Query processed successfully: {request.query_id}")
-        
-        return ProcessQueryResponse(
-            answer=answer,
-            sources=sources,
-            metadata={
-                "search_results_count": len(search_results),
-                "contexts_used": len(contexts)
-            }
+        prepared["semantic_version"] = await semantic_cache.version(collection_names)
+        similar = await semantic_cache.lookup(prepared["semantic_version"], prepared["semantic_scope"], query_vector)
+        if similar:
+            logger.info(f"Query answered from semantic cache ({similar['similarity']:.3f}): {request.query_id}")
+            prepared["response"] = answered_from_cache(request, similar, {
+                **similar["metadata"],
+                "cached": True,
+                "semantic_cache": {"similarity": similar["similarity"], "matched_query": similar["query"]}
+            })
+            return prepared
+    
+    search_results = await search_collections(request, collection_names, query_vector, prepared)
+    prepared["search_results"] = search_results
+    
+    if not search_results:
+        logger.warning("No relevant documents found")
+        prepared["response"] = no_results_response(request)
+        return prepared
+    
+    # 2. Build chunk contexts and sources
+    logger.info("Step 2: Retrieving document contexts")
+    contexts, sources, prepared["expanded"] = await build_contexts(
+        search_results, request.context_source, prepared["expansion"]
+    )
+    set_contexts(request, prepared, contexts, sources)
+    return prepared
+
+def validate_query(request: ProcessQueryRequest):
+    """Reject malformed query options with a 400"""
+    try:
+        build_filter(request.metadata_filter)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid metadata_filter: {e}")
+    if request.answer_mode not in ANSWER_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown answer_mode: {request.answer_mode}")
+    if request.priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown priority: {request.priority}")
+    if request.fusion not in FUSION_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown fusion method: {request.fusion}")
+    weights = hybrid_retriever.weights(request.vector_weight, request.lexical_weight)
+    if min(weights.values()) < 0 or not any(weights.values()):
+        raise HTTPException(status_code=400, detail="Hybrid search weights must be non-negative and not all zero")
+    if request.coarse_documents is not None and request.coarse_documents < 0:
+        raise HTTPException(status_code=400, detail="coarse_documents must not be negative")
+    if isinstance(request.collection_ids, str) and request.collection_ids not in ("*", "auto"):
+        raise HTTPException(status_code=400, detail='collection_ids must be a list of collections, "*" or "auto"')
+    if request.route_collections is not None and request.route_collections < 1:
+        raise HTTPException(status_code=400, detail="route_collections must be at least 1")
+    if request.diversity is not None and request.diversity not in DIVERSITY_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown diversity mode: {request.diversity}")
+    if request.mmr_lambda is not None and not 0 <= request.mmr_lambda <= 1:
+        raise HTTPException(status_code=400, detail="mmr_lambda must be between 0 and 1")
+    if request.max_per_document is not None and request.max_per_document < 1:
+        raise HTTPException(status_code=400, detail="max_per_document must be at least 1")
+    if request.hnsw_ef is not None and request.hnsw_ef < 1:
+        raise HTTPException(status_code=400, detail="hnsw_ef must be at least 1")
+    if request.context_expansion is not None and request.context_expansion not in CONTEXT_EXPANSION_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown context_expansion: {request.context_expansion}")
+    if request.context_neighbors is not None and request.context_neighbors < 0:
+        raise HTTPException(status_code=400, detail="context_neighbors must not be negative")
+
+def answers_query(request: ProcessQueryRequest) -> bool:
+    """Whether the query gets an answer: from the LLM, or extractive ("extractive" mode needs no LLM)"""
+    return request.use_llm or request.answer_mode == "extractive"
+
+def routes_query(request: ProcessQueryRequest) -> bool:
+    """Whether the collections to search are picked by the collection router"""
+    if request.collection_ids == "auto":
+        return True
+    return request.collection_ids is None and request.collection_id is None and collection_router.enabled
+
+async def route_query(request: ProcessQueryRequest, query_vector: List[float], prepared: Dict[str, Any]) -> List[str]:
+    """Collections closest to the query, falling back to the default collection"""
+    try:
+        routes = await collection_router.route(query_vector, request.route_collections)
+    except Exception as e:
+        logger.warning(f"Collection routing failed, searching the default collection: {e}")
+        routes = []
+    prepared["routing"] = routes
+    return [route["collection"] for route in routes] or ["documents_embeddings"]
+
+async def query_collections(request: ProcessQueryRequest) -> List[str]:
+    """Collections a query searches"""
+    if request.collection_ids == "*":
+        return await asyncio.to_thread(vector_store.list_document_collections)
+    if request.collection_ids:
+        return list(dict.fromkeys(request.collection_ids))
+    return [request.collection_id or "documents_embeddings"]
+
+async def search_collections(
+    request: ProcessQueryRequest,
+    collection_names: List[str],
+    query_vector: List[float],
+    prepared: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """
+    Search (vector, or hybrid vector + full-text) of one collection, or of several concurrently
+    with the same query vector, their hits fused into one ranking (request.fusion).
+    Collections that fail are skipped and reported in the response metadata.
+    """
+    limit = request.max_results or 5
+    
+    async def search(name: str):
+        hits, stats = await hybrid_retriever.search(
+            query=request.query,
+            collection_name=name,
+            query_vector=query_vector,
+            limit=limit,
+            metadata_filter=request.metadata_filter,
+            hybrid=prepared["hybrid"],
+            weights=prepared["weights"],
+            coarse_documents=prepared["coarse_documents"],
+            diversity=prepared["diversity"],
+            search_options=prepared["search_options"]
         )
+        prepared["retrieval"][name] = stats
+        return hits
+    
+    prepared["retrieval"] = {}
+    if len(collection_names) == 1:
+        return await search(collection_names[0])
+    prepared["federation"] = {"collections": collection_names, "failed": [], "fusion": request.fusion}
+    if not collection_names:
+        return []
+    
+    outcomes = await asyncio.gather(*(search(name) for name in collection_names), return_exceptions=True)
+    result_lists = []
+    failed = []
+    for name, outcome in zip(collection_names, outcomes):
+        if isinstance(outcome, Exception):
+            logger.warning(f"Search in collection {name} failed: {outcome}")
+            failed.append(name)
+            continue
+        result_lists.append([{**hit, "collection": name} for hit in outcome])
+    if not result_lists:
+        raise outcomes[0]
+    
+    prepared["federation"]["failed"] = failed
+    return fuse(result_lists, request.fusion, limit)
+
+def new_prepared(request: ProcessQueryRequest) -> Dict[str, Any]:
+    """Initial per-query pipeline state"""
+    return {
+        "response": None,
+        "started": time.perf_counter(),
+        "collection_name": request.collection_id or "documents_embeddings",
+        "cache_key": None,
+        "semantic_scope": None,
+        "semantic_version": None,
+        "query_vector": None,
+        "packing": None,
+        "compression": None,
+        "extractive": None,
+        "federation": None,
+        "routing": None,
+        "retrieval": None,
+        "expanded": None,
+        "expansion": {
+            "mode": request.context_expansion or context_expander.mode,
+            "neighbors": request.context_neighbors if request.context_neighbors is not None else context_expander.neighbors
+        },
+        "hybrid": request.hybrid if request.hybrid is not None else hybrid_retriever.enabled,
+        "weights": hybrid_retriever.weights(request.vector_weight, request.lexical_weight),
+        "search_options": {"hnsw_ef": request.hnsw_ef, "exact": request.exact}
+            if request.hnsw_ef is not None or request.exact else None,
+        "diversity": hybrid_retriever.diversity(request.diversity, request.mmr_lambda, request.max_per_document),
+        "coarse_documents": request.coarse_documents if request.coarse_documents is not None else document_index.coarse_documents,
+        "compress": request.compress_contexts if request.compress_contexts is not None else context_compressor.enabled
+    }
+
+def no_results_response(request: ProcessQueryRequest) -> ProcessQueryResponse:
+    return ProcessQueryResponse(
+        answer="No relevant documents were found to answer your question." if answers_query(request) else None,
+        sources=[],
+        metadata={"search_results_count": 0}
+    )
+
+def set_contexts(
+    request: ProcessQueryRequest,
+    prepared: Dict[str, Any],
+    contexts: List[Dict[str, Any]],
+    sources: List[Dict[str, Any]]
+):
+    """Store a query's contexts and sources, packed into the prompt budget when an answer is generated"""
+    if request.use_llm:
+        contexts, sources, prepared["packing"] = context_packer.pack(
+            contexts, sources, llm_pool.context_budget(request.query)
+        )
+    prepared["contexts"], prepared["sources"] = contexts, sources
+
+async def prepare_answer(request: ProcessQueryRequest, prepared: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Steps between retrieval and generation, sharing one sentence-scoring pass:
+    - answer_mode "extractive"/"auto": build the extractive answer and return it when it is
+      to be served instead of the LLM's ("extractive" always, "auto" when confident)
+    - context compression, when enabled, for the LLM prompt
+    """
+    extract = request.answer_mode != "llm"
+    scored = None
+    if extract or prepared["compress"]:
+        try:
+            scored = await context_compressor.score_sentences(prepared["query_vector"], prepared["contexts"])
+        except Exception as e:
+            if request.answer_mode == "extractive":
+                raise
+            logger.warning(f"Sentence scoring failed, using full contexts: {e}")
+    
+    if extract and scored is not None:
+        extractive = prepared["extractive"] = extractive_answerer.answer(prepared["contexts"], scored)
+        if request.answer_mode == "extractive" or extractive_answerer.is_confident(extractive):
+            return extractive or {"answer": None, "confidence": None, "highlights": []}
+    
+    if prepared["compress"] and scored is not None:
+        prepared["contexts"], prepared["compression"] = await context_compressor.compress(
+            prepared["query_vector"], prepared["contexts"], scored=scored
+        )
+        prepared["sources"] = covered_sources(prepared["contexts"], prepared["sources"])
+    return None
+
+def answered_from_cache(
+    request: ProcessQueryRequest,
+    entry: Dict[str, Any],
+    metadata: Dict[str, Any]
+) -> ProcessQueryResponse:
+    """Response for a cache hit; the query is still recorded in the history"""
+    run_in_background(record_query(
+        query_id=request.query_id,
+        query_text=request.query,
+        response_text=entry["answer"],
+        sources=entry["sources"]
+    ))
+    return ProcessQueryResponse(
+        answer=entry["answer"], sources=entry["sources"], metadata=metadata, highlights=entry.get("highlights")
+    )
+
+def finalize_query(
+    request: ProcessQueryRequest,
+    prepared: Dict[str, Any],
+    answer: Optional[str],
+    extractive: Optional[Dict[str, Any]] = None
+) -> ProcessQueryResponse:
+    """
+    Build the response, then record history and fill the caches in the background.
+    extractive is the extractive answer when it is served instead of the LLM's.
+    """
+    sources = prepared["sources"]
+    answer_metadata = {}
+    if answers_query(request) and prepared["contexts"]:
+        answer_metadata["answer_mode"] = "extractive" if extractive is not None else "llm"
+        if prepared["extractive"]:
+            answer_metadata["extractive_confidence"] = prepared["extractive"]["confidence"]
+    
+    # 4. Save query to database (off the response path)
+    run_in_background(record_query(
+        query_id=request.query_id,
+        query_text=request.query,
+        response_text=answer,
+        sources=sources
+    ))
+    
+    logger.info(f"Query processed successfully: {request.query_id}")
+    
+    response = ProcessQueryResponse(
+        answer=answer,
+        sources=sources,
+        metadata={
+            "search_results_count": len(prepared["search_results"]),
+            "contexts_used": len(prepared["contexts"]),
+            **({"context_packing": prepared["packing"]} if prepared["packing"] else {}),
+            **({"context_compression": prepared["compression"]} if prepared["compression"] else {}),
+            **({"federation": prepared["federation"]} if prepared["federation"] else {}),
+            **({"routing": prepared["routing"]} if prepared["routing"] is not None else {}),
+            **({"retrieval": prepared["retrieval"]} if prepared["retrieval"] else {}),
+            **({"context_expansion": prepared["expanded"]} if prepared["expanded"] else {}),
+            **answer_metadata
+        },
+        highlights=extractive["highlights"] if extractive is not None else None
+    )
+    if prepared["cache_key"]:
+        run_in_background(query_cache.set(
+            prepared["cache_key"], response.model_dump(), time.perf_counter() - prepared["started"]
+        ))
+    if prepared["semantic_scope"] and answer and sources:
+        run_in_background(semantic_cache.store(
+            prepared["semantic_version"], prepared["semantic_scope"], request.query,
+            prepared["query_vector"], response.model_dump()
+        ))
+    return response
+
+async def build_contexts(
+    search_results: List[Dict[str, Any]],
+    context_source: Optional[str] = None,
+    expansion: Optional[Dict[str, Any]] = None
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Turn search hits into LLM contexts and response sources, in hit order.
+    
+    In "payload" mode everything comes from the Qdrant payloads; PostgreSQL is only
+    queried for hits whose payload lacks the chunk content. In "database" mode all hits
+    are resolved with one batched PostgreSQL lookup.
+    
+    With an expansion ({"mode", "neighbors"}), contexts are then widened to their parent
+    window or neighbouring chunks (see ContextExpander), also returning its statistics.
+    """
+    return (await build_contexts_batch([search_results], context_source, expansion))[0]
+
+async def build_contexts_batch(
+    results_per_query: List[List[Dict[str, Any]]],
+    context_source: Optional[str] = None,
+    expansion: Optional[Dict[str, Any]] = None
+) -> List[Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Optional[Dict[str, Any]]]]:
+    """build_contexts for several queries, with a single PostgreSQL round trip per step for all of them"""
+    source = context_source or QUERY_CONTEXT_SOURCE
+    if source not in ("payload", "database"):
+        raise HTTPException(status_code=400, detail=f"Unknown context_source: {source}")
+    
+    lookup_ids = list({
+        r["id"]
+        for search_results in results_per_query
+        for r in search_results
+        if source == "database" or not (r.get("payload") or {}).get("content")
+    })
+    chunks_by_vector_id = await db_service.get_chunks_by_vector_ids(lookup_ids) if lookup_ids else {}
+    
+    built = [assemble_contexts(search_results, chunks_by_vector_id) for search_results in results_per_query]
+    expansion = expansion or {"mode": "none", "neighbors": 0}
+    expanded = await context_expander.expand_batch(
+        [contexts for contexts, _ in built], expansion["mode"], expansion["neighbors"]
+    )
+    return [
+        (contexts, sources, stats)
+        for (_, sources), (contexts, stats) in zip(built, expanded)
+    ]
+
+def assemble_contexts(
+    search_results: List[Dict[str, Any]],
+    chunks_by_vector_id: Dict[str, Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Contexts and sources of one query's hits, from database chunks or else from the payloads"""
+    contexts = []
+    sources = []
+    for result in search_results:
+        chunk_data = chunks_by_vector_id.get(result["id"])
+        if chunk_data is None:
+            payload = result.get("payload") or {}
+            if not payload.get("content"):
+                continue
+            metadata = payload.get("metadata") or {}
+            chunk_data = {
+                "document_id": payload.get("document_id"),
+                "chunk_index": payload.get("chunk_index"),
+                "content": payload["content"],
+                "filename": payload.get("filename") or metadata.get("source_file"),
+                "metadata": metadata
+            }
         
+        contexts.append({
+            "document_id": str(chunk_data["document_id"]),
+            "chunk_index": chunk_data["chunk_index"],
+            "content": chunk_data["content"],
+            "score": result["score"],
+            **({"fusion_score": result["fusion_score"]} if "fusion_score" in result else {}),
+            "metadata": chunk_data.get("metadata") or {}
+        })
+        sources.append({
+            "document_id": str(chunk_data["document_id"]),
+            "filename": chunk_data["filename"],
+            "chunk_index": chunk_data["chunk_index"],
+            "relevance_score": result["score"],
+            **({"collection": result["collection"]} if result.get("collection") else {})
+        })
+    
+    return contexts, sources
+
+async def record_query(**kwargs):
+    """Save a query to the history table, logging instead of raising"""
+    try:
+        await db_service.save_query(**kwargs)
     except Exception as e:
-        logger.error(f"Error processing query: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error(f"Error saving query {kwargs.get('query_id')}: {e}")
 
 @app.post("/documents/ingest")
 async def ingest_document(
@@ -226,7 +1085,7 @@ async def ingest_document(
         )
         
         # 4. Start async processing
-        asyncio.create_task(
+        run_in_background(
             process_document_async(document_id, object_key, file.filename, collection_id)
         )
         
@@ -271,38 +1130,17 @@ async def process_document_async(document_id: str, object_key: str, filename: st
         
         logger.info(f"Document chunked into {len(chunks)} pieces")
         
-        # 3. Generate embeddings and index in vector store
-        for idx, chunk in enumerate(chunks):
-            # Generate embedding
-            embedding = await document_processor.generate_embedding(chunk["content"])
-            
-            # Create a unique vector ID (UUID required by Qdrant)
-            vector_id = str(uuid.uuid4())
-            
-            # Indexer dans Qdrant
-            await vector_store.add_vector(
-                collection_name=collection_id or "documents_embeddings",
-                vector_id=vector_id,
-                vector=embedding,
-                payload={
-                    "document_id": document_id,
-                    "chunk_index": idx,
-                    "content": chunk["content"],
-                    "metadata": chunk.get("metadata", {})
-                }
-            )
-            
-            # Save chunk to database
-            await db_service.create_chunk(
-                document_id=document_id,
-                chunk_index=idx,
-                content=chunk["content"],
-                vector_id=vector_id,
-                metadata=chunk.get("metadata", {})
-            )
+        # 3. Generate embeddings (batched) and index in vector store + database
+        await indexer.index_chunks(
+            document_id=document_id,
+            collection_name=collection_id or "documents_embeddings",
+            chunks=chunks,
+            filename=filename
+        )
         
         # 4. Update document status
         await db_service.update_document_status(document_id, "processed")
+        await query_cache.bump_version(collection_id or "documents_embeddings")
         
         logger.info(f"Document processing completed: {document_id}")
         
@@ -362,13 +1200,11 @@ async def delete_document(document_id: str):
             object_key=document["minio_object_key"]
         )
         
-        # Delete vectors from Qdrant
-        chunks = await db_service.get_document_chunks(document_id)
-        for chunk in chunks:
-            await vector_store.delete_vector(
-                collection_name="documents_embeddings",
-                vector_id=chunk["vector_id"]
-            )
+        # Delete vectors from Qdrant (one filter-based delete in the collection it was indexed into)
+        collection_name = await db_service.get_document_collection(document_id) or "documents_embeddings"
+        await vector_store.delete_document_vectors(collection_name, [document_id])
+        await document_index.delete_documents(collection_name, [document_id])
+        await query_cache.bump_version(collection_name)
         
         # Delete from database (cascades to chunks)
         await db_service.delete_document(document_id)
@@ -382,16 +1218,388 @@ async def delete_document(document_id: str):
         logger.error(f"Error deleting document: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/documents/bulk-delete")
+async def bulk_delete_documents(request: BulkDeleteRequest):
+    """
+    Delete every document matching the filters (collection, status, upload date range)
+    in a background job. At least one filter is required.
+    """
+    filters = request.model_dump(exclude_none=True)
+    if not filters:
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+    
+    try:
+        matched = await db_service.count_documents(**filters)
+        job_id = await db_service.create_processing_job(
+            job_type="bulk_delete",
+            metadata={
+                "filters": request.model_dump(mode="json", exclude_none=True),
+                "total": matched,
+                "deleted": 0
+            }
+        )
+        run_in_background(purge_documents_async(job_id, filters, matched))
+        
+        logger.info(f"Bulk delete started: {job_id} ({matched} documents)")
+        return {"job_id": job_id, "matched": matched, "status": "pending"}
+        
+    except Exception as e:
+        logger.error(f"Error starting bulk delete: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def purge_documents_async(job_id: str, filters: Dict[str, Any], total: int):
+    """
+    Background purge: pages through matching documents and, per batch,
+    deletes their vectors (one filter delete per collection), objects and rows.
+    """
+    batch_size = int(os.getenv("BULK_DELETE_BATCH_SIZE", "500"))
+    bucket_name = os.getenv("MINIO_BUCKET_NAME", "documents")
+    deleted = 0
+    try:
+        await db_service.update_processing_job(job_id, status="running")
+        while True:
+            # Deleted rows drop out of the result set, so every batch starts from the beginning
+            batch = await db_service.list_documents_after(limit=batch_size, **filters)
+            if not batch:
+                break
+            
+            by_collection: Dict[str, List[str]] = {}
+            for doc in batch:
+                name = doc.get("collection_name") or "documents_embeddings"
+                by_collection.setdefault(name, []).append(str(doc["id"]))
+            for collection_name, document_ids in by_collection.items():
+                await vector_store.delete_document_vectors(collection_name, document_ids)
+                await document_index.delete_documents(collection_name, document_ids)
+                await query_cache.bump_version(collection_name)
+            
+            await storage.delete_files(bucket_name, [doc["minio_object_key"] for doc in batch])
+            await db_service.delete_documents([str(doc["id"]) for doc in batch])
+            
+            deleted += len(batch)
+            await db_service.update_processing_job(
+                job_id,
+                progress=min(100, int(100 * deleted / total)) if total else 100,
+                metadata={"deleted": deleted}
+            )
+        
+        await db_service.update_processing_job(
+            job_id, status="completed", progress=100, metadata={"deleted": deleted}
+        )
+        logger.info(f"Bulk delete completed: {job_id} ({deleted} documents)")
+        
+    except Exception as e:
+        logger.error(f"Error in bulk delete {job_id}: {e}")
+        await db_service.update_processing_job(
+            job_id, status="failed", error_message=str(e), metadata={"deleted": deleted}
+        )
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get processing job status and progress"""
+    try:
+        job = await db_service.get_processing_job(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching job: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/collections")
 async def list_collections():
-    """Liste toutes les collections"""
+    """
+    Liste toutes les collections, plus the logical Qdrant collections holding documents
+    (without versions, document indexes, the semantic cache or the routing centroids)
+    """
     try:
         collections = await db_service.list_collections()
-        return {"collections": collections}
+        vector_collections = await asyncio.to_thread(vector_store.list_document_collections)
+        return {"collections": collections, "vector_collections": vector_collections}
     except Exception as e:
         logger.error(f"Error listing collections: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/collections/{collection_name}/payload-indexes")
+async def list_payload_indexes(collection_name: str):
+    """Indexed payload fields of a collection"""
+    try:
+        return {"indexes": await asyncio.to_thread(vector_store.list_payload_indexes, collection_name)}
+    except Exception as e:
+        logger.error(f"Error listing payload indexes: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/collections/{collection_name}/payload-indexes")
+async def create_payload_index(collection_name: str, request: PayloadIndexRequest):
+    """Declare an additional payload field to index (e.g. metadata.year) for fast filtered search"""
+    try:
+        field = await asyncio.to_thread(vector_store.create_payload_index, collection_name, request.field, request.type)
+        return {"status": "indexed", "field": field}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error creating payload index: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/collections/{collection_name}/bulk-load")
+async def begin_bulk_load(collection_name: str):
+    """
+    Put a collection in bulk-load mode before a large ingest: Qdrant index building is
+    deferred and upserts are sent in parallel without waiting. Finish it with
+    POST /collections/{name}/bulk-load/finish.
+    """
+    try:
+        previous = await asyncio.to_thread(vector_store.begin_bulk_load, collection_name)
+        # Kept in collections.metadata so a restart before /finish does not lose it
+        await db_service.set_bulk_load(collection_name, previous)
+        return {"status": "bulk_load", "collection": collection_name, "indexing_threshold": previous}
+    except Exception as e:
+        logger.error(f"Error starting bulk load of {collection_name}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/collections/{collection_name}/bulk-load/finish")
+async def finish_bulk_load(collection_name: str, indexing_threshold: Optional[int] = None):
+    """
+    Restore index building of a bulk-loaded collection in a background job that
+    completes once Qdrant has finished optimizing; follow it with GET /jobs/{job_id}.
+    """
+    try:
+        job_id = await db_service.create_processing_job(
+            job_type="bulk_load_finish",
+            metadata={"collection": collection_name, "optimization": None}
+        )
+        run_in_background(finish_bulk_load_async(job_id, collection_name, indexing_threshold))
+        return {"job_id": job_id, "status": "pending"}
+    except Exception as e:
+        logger.error(f"Error finishing bulk load of {collection_name}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def finish_bulk_load_async(job_id: str, collection_name: str, indexing_threshold: Optional[int]):
+    """Background job: restore indexing, report optimization progress, then refresh cached answers"""
+    async def report(status: Dict[str, Any]):
+        await db_service.update_processing_job(job_id, metadata={"optimization": dict(status)})
+    
+    try:
+        await db_service.update_processing_job(job_id, status="running")
+        status = await vector_store.finish_bulk_load(collection_name, indexing_threshold, on_progress=report)
+        await db_service.clear_bulk_load(collection_name)
+        await query_cache.bump_version(collection_name)
+        await db_service.update_processing_job(
+            job_id, status="completed", progress=100, metadata={"optimization": status}
+        )
+    except Exception as e:
+        logger.error(f"Error in bulk load finish {job_id}: {e}")
+        if collection_name not in vector_store.bulk_loads:
+            # Indexing was restored, only the optimization wait failed
+            await db_service.clear_bulk_load(collection_name)
+        await db_service.update_processing_job(job_id, status="failed", error_message=str(e))
+
+@app.get("/collections/{collection_name}/index-profile")
+async def get_index_profile(collection_name: str):
+    """Index profile of a collection, its live Qdrant settings and estimated vector RAM"""
+    try:
+        live = await asyncio.to_thread(vector_store.index_status, collection_name)
+    except Exception as e:
+        logger.debug(f"No live collection for {collection_name}: {e}")
+        live = None
+    return {"profile": vector_store.index_profile(collection_name), "live": live}
+
+@app.put("/collections/{collection_name}/index-profile")
+async def set_index_profile(collection_name: str, request: IndexProfileRequest):
+    """
+    Store a collection's index profile (collections.metadata) and apply it: new versions are
+    created with it, the live collection is updated in place and re-indexed by Qdrant in the
+    background. Unset settings take their defaults.
+    """
+    try:
+        profile = normalize_profile(request.model_dump(exclude_none=True))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        await db_service.set_index_profile(collection_name, profile)
+        applied = await asyncio.to_thread(vector_store.apply_index_profile, collection_name, profile)
+        if applied:
+            await query_cache.bump_version(collection_name)
+        return {"profile": profile, "applied": applied}
+    except Exception as e:
+        logger.error(f"Error applying index profile to {collection_name}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/collections/{collection_name}/migrations")
+async def start_migration(collection_name: str, request: MigrationRequest):
+    """
+    Re-embed a collection into a shadow collection in a background job,
+    then switch the alias once point counts are validated.
+    Follow it with GET /collections/{name}/migration or GET /jobs/{job_id}.
+    """
+    try:
+        state = await asyncio.to_thread(
+            vector_store.prepare_migration,
+            collection_name,
+            request.vector_size,
+            request.embedding_service_url,
+            request.auto_swap
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error starting migration: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    try:
+        state["job_id"] = await db_service.create_processing_job(
+            job_type="collection_migration",
+            metadata=vector_store.migration_status(collection_name)
+        )
+    except Exception as e:
+        state.update(status="failed", error=str(e), finished_at=datetime.utcnow().isoformat())
+        logger.error(f"Error recording migration job: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    run_in_background(migrate_collection_async(state))
+    return vector_store.migration_status(collection_name)
+
+def rebuild_derived_indexes(collection_name: str) -> Dict[str, str]:
+    """
+    Recompute what is derived from a collection's vectors once its alias points at another
+    version, possibly of another embedding model and dimension: its document index companion
+    (coarse search) and the routing centroids. Returns the rebuilds started (or why not).
+    """
+    started = {}
+    if document_index.enabled:
+        try:
+            document_index.start_rebuild(collection_name, on_swap=lambda: query_cache.bump_version(collection_name))
+            started["document_index"] = "started"
+        except ValueError as e:
+            started["document_index"] = str(e)
+    if collection_router.enabled:
+        try:
+            collection_router.start_rebuild()
+            started["routing"] = "started"
+        except ValueError as e:
+            started["routing"] = str(e)
+    if started:
+        logger.info(f"Derived indexes of {collection_name} rebuilding after a version swap: {started}")
+    return started
+
+async def migrate_collection_async(state: Dict[str, Any]):
+    """Background job: build the shadow collection, checkpointing progress in the processing job"""
+    job_id = state["job_id"]
+    
+    async def report(status: Dict[str, Any]):
+        try:
+            await db_service.update_processing_job(job_id, progress=int(status["progress"]), metadata=status)
+        except Exception as e:
+            logger.warning(f"Migration progress of {state['collection']} not recorded: {e}")
+    
+    async def on_swap():
+        await query_cache.bump_version(state["collection"])
+        state["derived_rebuilds"] = rebuild_derived_indexes(state["collection"])
+    
+    try:
+        await db_service.update_processing_job(job_id, status="running")
+    except Exception as e:
+        logger.warning(f"Migration job {job_id} not marked running: {e}")
+    status = await vector_store.run_migration(state, on_progress=report, on_swap=on_swap)
+    try:
+        await db_service.update_processing_job(
+            job_id,
+            status="failed" if status["status"] == "failed" else "completed",
+            progress=int(status["progress"]),
+            error_message=status["error"],
+            metadata=status
+        )
+    except Exception as e:
+        logger.error(f"Error recording the end of migration job {job_id}: {e}")
+
+@app.get("/collections/{collection_name}/migration")
+async def get_migration(collection_name: str):
+    """Progress of the latest migration and the collection versions"""
+    status = vector_store.migration_status(collection_name)
+    try:
+        live = await asyncio.to_thread(vector_store.resolve_collection, collection_name)
+        versions = await asyncio.to_thread(vector_store.list_versions, collection_name)
+    except Exception as e:
+        logger.error(f"Error fetching collection versions: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "migration": status,
+        "live": live,
+        "versions": versions,
+        "document_index": document_index.rebuild_status(collection_name)
+    }
+
+@app.post("/collections/{collection_name}/migration/promote")
+async def promote_migration(collection_name: str):
+    """Switch the alias to a validated shadow collection built with auto_swap=false"""
+    try:
+        live = await asyncio.to_thread(vector_store.promote_migration, collection_name)
+        await query_cache.bump_version(collection_name)
+        vector_store.migrations[collection_name]["derived_rebuilds"] = rebuild_derived_indexes(collection_name)
+        status = vector_store.migration_status(collection_name)
+        if status.get("job_id"):
+            await db_service.update_processing_job(status["job_id"], metadata=status)
+        return {"live": live}
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/collections/{collection_name}/rollback")
+async def rollback_collection(collection_name: str):
+    """Point the alias back at the previous collection version"""
+    try:
+        live = await asyncio.to_thread(vector_store.rollback, collection_name)
+        await query_cache.bump_version(collection_name)
+        return {"live": live, "derived_rebuilds": rebuild_derived_indexes(collection_name)}
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.delete("/collections/{collection_name}/versions/{version_name}")
+async def drop_collection_version(collection_name: str, version_name: str):
+    """Delete an old collection version kept for rollback"""
+    try:
+        await asyncio.to_thread(vector_store.drop_version, collection_name, version_name)
+        return {"status": "deleted", "version": version_name}
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/collections/{collection_name}/document-index")
+async def rebuild_document_index(collection_name: str):
+    """Recompute the per-document vectors of a collection (coarse-to-fine search) in the background"""
+    try:
+        return document_index.start_rebuild(
+            collection_name, on_swap=lambda: query_cache.bump_version(collection_name)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/collections/{collection_name}/document-index")
+async def get_document_index(collection_name: str):
+    """Progress of the latest document index rebuild"""
+    return {"rebuild": document_index.rebuild_status(collection_name)}
+
+@app.get("/routing/centroids")
+async def get_collection_centroids():
+    """Collections known to the query router, and the latest rebuild"""
+    try:
+        centroids = await collection_router.list_centroids()
+    except Exception as e:
+        logger.error(f"Error listing collection centroids: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "enabled": collection_router.enabled,
+        "top_n": collection_router.top_n,
+        "collections": centroids,
+        "rebuild": collection_router.rebuild_status()
+    }
+
+@app.post("/routing/rebuild")
+async def rebuild_collection_centroids():
+    """Recompute every collection centroid from the stored vectors in the background"""
+    try:
+        return collection_router.start_rebuild()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -1,99 +1,93 @@
 #!/usr/bin/env python3
 """
-Script to reprocess all previously uploaded documents
+Script to reprocess previously uploaded documents
+
+Usage:
+    python reprocess_documents.py                          # all documents with status='uploaded'
+    python reprocess_documents.py --status failed -c 8     # retry failed documents, 8 at a time
+    python reprocess_documents.py --status processed --reembed-only   # re-embed after a model change
+    python reprocess_documents.py --resume <job_id>        # continue an interrupted run
+    python reprocess_documents.py --status all --bulk-load # large corpus: build the Qdrant index once at the end
 """
 
+import argparse
 import asyncio
-import os
 import sys
-import httpx
 from pathlib import Path
 
-# Ajouter le chemin parent pour les imports
-sys.path.insert(0, str(Path(__file__).parent.parent / "backend" / "services" / "orchestrator"))
+# Make the orchestrator packages importable wherever the script is launched from
+sys.path.insert(0, str(Path(__file__).resolve().parent))
 
 from database.db import DatabaseService
 from services.storage import MinIOStorage
 from services.document_processor import DocumentProcessor
 from services.vector_store import VectorStoreService
+from services.query_cache import QueryCache
+from services.reprocessor import ReprocessingEngine
+from services.document_index import DocumentIndex
+from services.collection_router import CollectionRouter
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Reprocess or re-embed OpenRAG documents")
+    parser.add_argument("--status", default="uploaded",
+                        help="Only documents with this status ('all' for every status)")
+    parser.add_argument("--collection", default=None,
+                        help="Only documents of this collection")
+    parser.add_argument("--target-collection", default=None,
+                        help="Qdrant collection to write to (default: each document's collection)")
+    parser.add_argument("--reembed-only", action="store_true",
+                        help="Re-embed stored chunk text; skip download and parsing")
+    parser.add_argument("-c", "--concurrency", type=int, default=None,
+                        help="Documents processed concurrently (default: REPROCESS_CONCURRENCY or 4)")
+    parser.add_argument("--page-size", type=int, default=None,
+                        help="Documents fetched per page (default: REPROCESS_PAGE_SIZE or 200)")
+    parser.add_argument("--resume", metavar="JOB_ID", default=None,
+                        help="Resume an interrupted job")
+    parser.add_argument("--bulk-load", action="store_true",
+                        help="Defer Qdrant index building until all documents are written (large corpora)")
+    return parser.parse_args(argv)
+
+
+async def reprocess_documents(args) -> int:
+    """Run the reprocessing engine with the given CLI options"""
 
-async def reprocess_all_documents():
-    """Retraite tous les documents avec status='uploaded'"""
-    
     print("🔄 Starting document reprocessing...")
-    
-    # Initialize services
-    db_service = DatabaseService()
-    storage = MinIOStorage()
+
     document_processor = DocumentProcessor()
     vector_store = VectorStoreService()
-    
-    # Get all documents with status='uploaded'
-    documents = await db_service.list_documents(status='uploaded', limit=1000)
-    
-    print(f"📊 Found {len(documents)} documents to process")
-    
-    for idx, doc in enumerate(documents, 1):
-        try:
-            print(f"\n[{idx}/{len(documents)}] Processing: {doc['filename']}")
-            
-            # Update status
-            await db_service.update_document_status(doc['id'], 'processing')
-            
-            # Download from MinIO
-            file_data = await storage.download_file(
-                bucket_name=os.getenv("MINIO_BUCKET_NAME", "documents"),
-                object_key=doc['minio_object_key']
-            )
-            
-            # Process document (extract text + chunk)
-            chunks = await document_processor.process_document(
-                file_data=file_data,
-                filename=doc['filename']
-            )
-            
-            print(f"  → Created {len(chunks)} chunks")
-            
-            # Generate embeddings and index
-            for chunk_idx, chunk in enumerate(chunks):
-                # Generate embedding
-                embedding = await document_processor.generate_embedding(chunk["content"])
-                
-                # Create vector ID
-                import uuid
-                vector_id = str(uuid.uuid4())
-                
-                # Index in Qdrant
-                await vector_store.add_vector(
-                    collection_name="documents_embeddings",
-                    vector_id=vector_id,
-                    vector=embedding,
-                    payload={
-                        "document_id": str(doc['id']),
-                        "chunk_index": chunk_idx,
-                        "content": chunk["content"],
-                        "metadata": chunk.get("metadata", {})
-                    }
-                )
-                
-                # Save chunk in DB
-                await db_service.create_chunk(
-                    document_id=str(doc['id']),
-                    chunk_index=chunk_idx,
-                    content=chunk["content"],
-                    vector_id=vector_id,
-                    metadata=chunk.get("metadata", {})
-                )
-            
-            # Update status to processed
-            await db_service.update_document_status(doc['id'], 'processed')
-            print(f"  ✅ Success!")
-            
-        except Exception as e:
-            print(f"  ❌ Error: {e}")
-            await db_service.update_document_status(doc['id'], 'failed')
-    
+    engine = ReprocessingEngine(
+        db_service=DatabaseService(),
+        storage=MinIOStorage(),
+        document_processor=document_processor,
+        vector_store=vector_store,
+        concurrency=args.concurrency,
+        page_size=args.page_size,
+        query_cache=QueryCache(),
+        document_index=DocumentIndex(vector_store, document_processor),
+        collection_router=CollectionRouter(vector_store)
+    )
+
+    summary = await engine.run(
+        status=None if args.status == "all" else args.status,
+        collection_id=args.collection,
+        target_collection=args.target_collection,
+        reembed_only=args.reembed_only,
+        job_id=args.resume,
+        bulk_load=args.bulk_load
+    )
+
+    print(f"\n📊 Job {summary['job_id']}: {summary['total']} documents")
+    print(f"  ✅ Processed: {summary['processed']}")
+    print(f"  ⏭️  Skipped:   {summary['skipped']}")
+    print(f"  ❌ Failed:    {summary['failed']}")
     print("\n✨ Reprocessing complete!")
+    return 1 if summary["failed"] else 0
+
+
+def main(argv=None) -> int:
+    return asyncio.run(reprocess_documents(parse_args(argv)))
+
 
 if __name__ == "__main__":
-    asyncio.run(reprocess_all_documents())
+    sys.exit(main())
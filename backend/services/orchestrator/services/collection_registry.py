@@ -0,0 +1,63 @@
+"""
+Collection Registry - In-process cache of the Qdrant collections / aliases and MinIO buckets that exist
+Writes and "*" queries check it instead of listing the store on every call
+"""
+
+from typing import Callable, Dict, Optional, Set
+import os
+import threading
+import time
+
+
+class CollectionRegistry:
+    """
+    Names that exist in a store, each mapped to what it resolves to (an alias to its physical
+    collection, anything else to itself), loaded with loader on first use.
+
+    The process keeps it up to date as it creates, swaps and drops collections (add / discard);
+    invalidate() forces a reload, and the whole registry is reloaded every REGISTRY_TTL_SECONDS
+    (0: never) to pick up changes made by other processes.
+    """
+
+    def __init__(self, loader: Callable[[], Dict[str, str]], ttl: Optional[float] = None):
+        self.loader = loader
+        self.ttl = float(os.getenv("REGISTRY_TTL_SECONDS", "300")) if ttl is None else ttl
+        self._names: Optional[Dict[str, str]] = None
+        self._loaded_at = 0.0
+        # Blocking store clients are called from worker threads
+        self._lock = threading.Lock()
+
+    def _current(self) -> Dict[str, str]:
+        with self._lock:
+            expired = self.ttl > 0 and time.monotonic() - self._loaded_at > self.ttl
+            if self._names is None or expired:
+                self._names = dict(self.loader())
+                self._loaded_at = time.monotonic()
+            return self._names
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._current()
+
+    def names(self) -> Set[str]:
+        return set(self._current())
+
+    def resolve(self, name: str) -> str:
+        """What name resolves to (the name itself if it is not an alias or does not exist)"""
+        return self._current().get(name, name)
+
+    def add(self, name: str, target: Optional[str] = None):
+        """Record a name created (or an alias pointed at target) by this process"""
+        with self._lock:
+            if self._names is not None:
+                self._names[name] = target or name
+
+    def discard(self, name: str):
+        """Forget a name deleted by this process"""
+        with self._lock:
+            if self._names is not None:
+                self._names.pop(name, None)
+
+    def invalidate(self):
+        """Reload from the store on next use"""
+        with self._lock:
+            self._names = None
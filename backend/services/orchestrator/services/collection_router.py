@@ -0,0 +1,200 @@
+"""
+Collection Router - Send queries without a collection to the collections closest to them
+"""
+
+from typing import List, Dict, Any, Optional
+from qdrant_client.models import Distance, VectorParams, PointStruct
+from loguru import logger
+from datetime import datetime
+import numpy as np
+import asyncio
+import os
+import uuid
+
+
+class CollectionRouter:
+    """
+    Keeps one centroid (mean chunk embedding) per document collection in a small internal
+    Qdrant collection, point ID derived from the collection name.
+
+    Centroids are updated incrementally at ingest from the running sum of the chunk embeddings,
+    kept in the point payload (the stored vector is normalized by the cosine distance), so
+    routing costs one search over a handful of points. Deleted or re-processed
+    chunks are not subtracted; start_rebuild() recomputes exact centroids from the
+    collections. Updates are serialized per collection within this process only.
+    """
+
+    def __init__(self, vector_store):
+        self.vector_store = vector_store
+        self.client = vector_store.client
+        self.enabled = os.getenv("COLLECTION_ROUTING_ENABLED", "false").lower() == "true"
+        self.top_n = int(os.getenv("COLLECTION_ROUTING_TOP_N", "2"))
+        self.collection_name = os.getenv("COLLECTION_ROUTING_COLLECTION", "openrag_collection_centroids")
+        vector_store.internal_collections.add(self.collection_name)
+        self._vector_size: Optional[int] = None
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.rebuild_state: Optional[Dict[str, Any]] = None
+
+    @staticmethod
+    def _point_id(collection_name: str) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"openrag/collections/{collection_name}"))
+
+    def _ensure_collection(self, vector_size: int):
+        """Create the centroid collection, recreating it if the embedding dimension changed"""
+        if self._vector_size == vector_size:
+            return
+        if self.collection_name not in self.vector_store.collections:
+            # Another process may have created it since the registry was loaded
+            self.vector_store.collections.invalidate()
+        if self.collection_name in self.vector_store.collections:
+            params = self.client.get_collection(self.collection_name).config.params.vectors
+            if params.size == vector_size:
+                self._vector_size = vector_size
+                return
+            logger.warning(f"Embedding dimension changed, recreating {self.collection_name}")
+            self.client.delete_collection(self.collection_name)
+            self.vector_store.collections.discard(self.collection_name)
+
+        self.client.create_collection(
+            collection_name=self.collection_name,
+            vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE)
+        )
+        self.vector_store.collections.add(self.collection_name)
+        self._vector_size = vector_size
+        logger.info(f"Collection centroid index created: {self.collection_name}")
+
+    async def add_vectors(self, collection_name: str, vectors: List[List[float]]):
+        """Fold newly indexed chunk embeddings into the centroid of their collection"""
+        if not vectors or collection_name in self.vector_store.internal_collections:
+            return
+        lock = self._locks.setdefault(collection_name, asyncio.Lock())
+        try:
+            async with lock:
+                added = np.asarray(vectors, dtype=np.float32)
+                await asyncio.to_thread(self._ensure_collection, added.shape[1])
+                points = await asyncio.to_thread(
+                    self.client.retrieve,
+                    collection_name=self.collection_name,
+                    ids=[self._point_id(collection_name)],
+                    with_payload=True,
+                    with_vectors=True
+                )
+                total = added.sum(axis=0)
+                count = len(added)
+                if points:
+                    payload = points[0].payload
+                    if "sum" in payload:
+                        total = total + np.asarray(payload["sum"], dtype=np.float32)
+                    else:
+                        # Written before the sum was kept: approximate it until the next rebuild
+                        total = total + np.asarray(points[0].vector, dtype=np.float32) * payload.get("chunks", 0)
+                    count += payload.get("chunks", 0)
+                await self._write(collection_name, total, count)
+        except Exception as e:
+            logger.warning(f"Centroid of {collection_name} not updated (rebuild the routing index): {e}")
+
+    async def _write(self, collection_name: str, total: np.ndarray, chunks: int):
+        """Store the centroid of chunks embeddings summing to total, and the sum itself"""
+        await asyncio.to_thread(
+            self.client.upsert,
+            collection_name=self.collection_name,
+            points=[PointStruct(
+                id=self._point_id(collection_name),
+                vector=(total / chunks).tolist(),
+                payload={
+                    "collection": collection_name,
+                    "chunks": chunks,
+                    "sum": total.tolist(),
+                    "updated_at": datetime.utcnow().isoformat()
+                }
+            )]
+        )
+
+    async def route(self, query_vector: List[float], top_n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """The collections whose centroid is closest to the query: [{"collection", "score"}], best first"""
+        await asyncio.to_thread(self._ensure_collection, len(query_vector))
+        hits = await asyncio.to_thread(
+            self.client.search,
+            collection_name=self.collection_name,
+            query_vector=query_vector,
+            limit=top_n or self.top_n,
+            with_payload=["collection"]
+        )
+        return [{"collection": hit.payload["collection"], "score": hit.score} for hit in hits]
+
+    async def list_centroids(self) -> List[Dict[str, Any]]:
+        """Collections known to the router with their chunk counts"""
+        if self.collection_name not in await asyncio.to_thread(self.vector_store.collections.names):
+            return []
+        points, _ = await asyncio.to_thread(
+            self.client.scroll,
+            collection_name=self.collection_name,
+            limit=10000,
+            with_payload=["collection", "chunks", "updated_at"],
+            with_vectors=False
+        )
+        return sorted((dict(point.payload) for point in points), key=lambda entry: entry["collection"])
+
+    def start_rebuild(self, batch_size: int = 256) -> Dict[str, Any]:
+        """Recompute the centroid of every document collection from its chunk vectors, in the background"""
+        if self.rebuild_state and self.rebuild_state["status"] == "running":
+            raise ValueError("The routing index is already being rebuilt")
+        self.rebuild_state = {
+            "status": "running",
+            "collections": {},
+            "started_at": datetime.utcnow().isoformat(),
+            "finished_at": None,
+            "error": None
+        }
+        self.rebuild_state["task"] = asyncio.create_task(self._rebuild(self.rebuild_state, batch_size))
+        return self.rebuild_status()
+
+    def rebuild_status(self) -> Optional[Dict[str, Any]]:
+        if self.rebuild_state is None:
+            return None
+        return {k: v for k, v in self.rebuild_state.items() if k != "task"}
+
+    async def _rebuild(self, state: Dict[str, Any], batch_size: int):
+        """Background task: one exact centroid per collection; centroids of vanished collections are dropped"""
+        try:
+            collections = await asyncio.to_thread(self.vector_store.list_document_collections)
+            for collection_name in collections:
+                total = None
+                count = 0
+                offset = None
+                while True:
+                    points, offset = await asyncio.to_thread(
+                        self.client.scroll,
+                        collection_name=collection_name,
+                        limit=batch_size,
+                        offset=offset,
+                        with_payload=False,
+                        with_vectors=True
+                    )
+                    if points:
+                        vectors = np.asarray([point.vector for point in points], dtype=np.float32)
+                        total = vectors.sum(axis=0) if total is None else total + vectors.sum(axis=0)
+                        count += len(points)
+                    if offset is None:
+                        break
+                state["collections"][collection_name] = count
+                if count:
+                    async with self._locks.setdefault(collection_name, asyncio.Lock()):
+                        await asyncio.to_thread(self._ensure_collection, len(total))
+                        await self._write(collection_name, total, count)
+
+            known = {entry["collection"] for entry in await self.list_centroids()}
+            stale = [
+                self._point_id(name) for name in known
+                if not state["collections"].get(name)
+            ]
+            if stale:
+                await asyncio.to_thread(self.client.delete, collection_name=self.collection_name, points_selector=stale)
+            state["status"] = "completed"
+            logger.info(f"Routing index rebuilt for {len(collections)} collections")
+        except Exception as e:
+            state["status"] = "failed"
+            state["error"] = str(e)
+            logger.error(f"Routing index rebuild failed: {e}")
+        finally:
+            state["finished_at"] = datetime.utcnow().isoformat()
@@ -0,0 +1,170 @@
+"""
+Context Compressor - Extractive compression of retrieved contexts
+Keeps the sentences most similar to the question, in document order
+"""
+
+from typing import List, Dict, Any, Tuple, Optional
+from loguru import logger
+import numpy as np
+import os
+import re
+
+from services.context_packer import estimate_tokens
+
+
+# Sentence ends (., !, ?, ellipsis) followed by whitespace, or line breaks
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+# Marker placed where sentences were removed from the middle of a context
+GAP_MARKER = " [...] "
+
+
+def sentence_spans(text: str, min_chars: int = 20) -> List[Tuple[int, int]]:
+    """
+    (start, end) offsets of the sentences of text, without surrounding whitespace.
+    Fragments shorter than min_chars are glued to the next sentence.
+    """
+    spans = []
+    pending: Optional[List[int]] = None
+    position = 0
+    for boundary in list(SENTENCE_BOUNDARY.finditer(text)) + [None]:
+        end = boundary.start() if boundary else len(text)
+        part = text[position:end]
+        stripped = part.strip()
+        if stripped:
+            start = position + len(part) - len(part.lstrip())
+            stop = start + len(stripped)
+            pending = [pending[0], stop] if pending else [start, stop]
+            if pending[1] - pending[0] >= min_chars:
+                spans.append(tuple(pending))
+                pending = None
+        position = boundary.end() if boundary else len(text)
+    if pending:
+        if spans:
+            spans[-1] = (spans[-1][0], pending[1])
+        else:
+            spans.append(tuple(pending))
+    return spans
+
+
+def split_sentences(text: str, min_chars: int = 20) -> List[str]:
+    return [text[start:end] for start, end in sentence_spans(text, min_chars)]
+
+
+class ContextCompressor:
+    """
+    Shrinks contexts to the sentences that matter for the question.
+
+    All sentences of all contexts are embedded with one batched call to the embedding
+    service and ranked by cosine similarity to the query embedding. The best ones are
+    kept until CONTEXT_COMPRESSION_RATIO of the original tokens (or the token budget,
+    if smaller) is reached, then put back in their original order within each context.
+    """
+
+    def __init__(self, document_processor):
+        self.document_processor = document_processor
+        self.enabled = os.getenv("CONTEXT_COMPRESSION_ENABLED", "false").lower() == "true"
+        self.ratio = float(os.getenv("CONTEXT_COMPRESSION_RATIO", "0.3"))
+        self.min_sentences = int(os.getenv("CONTEXT_COMPRESSION_MIN_SENTENCES", "3"))
+
+    async def score_sentences(
+        self,
+        query_vector: List[float],
+        contexts: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Every sentence of the contexts with its similarity to the query, in context order:
+        {context_idx, sentence_idx, start, end, text, score} (offsets are within the context content).
+        Raises if the embedding service fails.
+        """
+        sentences = [
+            {"context_idx": context_idx, "sentence_idx": sentence_idx, "start": start, "end": end,
+             "text": context["content"][start:end]}
+            for context_idx, context in enumerate(contexts)
+            for sentence_idx, (start, end) in enumerate(sentence_spans(context["content"]))
+        ]
+        if not sentences:
+            return []
+
+        # One request: the embedding service batches internally, slices would be sequential round trips
+        embeddings = await self.document_processor.generate_embeddings(
+            [sentence["text"] for sentence in sentences], batch_size=len(sentences)
+        )
+        scores = self._cosine(np.asarray(query_vector, dtype=np.float32), np.asarray(embeddings, dtype=np.float32))
+        for sentence, score in zip(sentences, scores):
+            sentence["score"] = float(score)
+        return sentences
+
+    async def compress(
+        self,
+        query_vector: List[float],
+        contexts: List[Dict[str, Any]],
+        token_budget: Optional[int] = None,
+        scored: Optional[List[Dict[str, Any]]] = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Return compressed copies of contexts (contexts left without sentences are dropped)
+        and statistics. scored may hold the output of score_sentences for these contexts.
+        On embedding errors the contexts are returned unchanged.
+        """
+        original_tokens = sum(estimate_tokens(context["content"]) for context in contexts)
+        stats = {"original_tokens": original_tokens}
+
+        if scored is None:
+            try:
+                scored = await self.score_sentences(query_vector, contexts)
+            except Exception as e:
+                logger.warning(f"Context compression skipped: {e}")
+                stats["error"] = str(e)
+                return contexts, stats
+
+        stats["sentences"] = len(scored)
+        if len(scored) <= self.min_sentences:
+            stats["compressed_tokens"] = original_tokens
+            return contexts, stats
+
+        budget = max(int(original_tokens * self.ratio), 1)
+        if token_budget is not None:
+            budget = min(budget, token_budget)
+
+        selected = []
+        used = 0
+        for sentence in sorted(scored, key=lambda sentence: sentence["score"], reverse=True):
+            cost = estimate_tokens(sentence["text"])
+            if used + cost > budget and len(selected) >= self.min_sentences:
+                continue
+            selected.append(sentence)
+            used += cost
+
+        kept_by_context: Dict[int, List[Dict[str, Any]]] = {}
+        for sentence in sorted(selected, key=lambda sentence: (sentence["context_idx"], sentence["sentence_idx"])):
+            kept_by_context.setdefault(sentence["context_idx"], []).append(sentence)
+
+        compressed = []
+        for context_idx, context in enumerate(contexts):
+            kept = kept_by_context.get(context_idx)
+            if not kept:
+                continue
+            compressed.append({**context, "content": self._join(kept)})
+
+        stats["kept_sentences"] = len(selected)
+        stats["compressed_tokens"] = sum(estimate_tokens(context["content"]) for context in compressed)
+        stats["ratio"] = round(stats["compressed_tokens"] / max(original_tokens, 1), 3)
+        return compressed, stats
+
+    @staticmethod
+    def _cosine(query: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        return matrix @ query / np.where(norms == 0, 1.0, norms)
+
+    @staticmethod
+    def _join(kept: List[Dict[str, Any]]) -> str:
+        """Sentences in document order, marking the places where text was cut"""
+        parts = []
+        previous = None
+        for sentence in kept:
+            if previous is not None:
+                parts.append(" " if sentence["sentence_idx"] == previous + 1 else GAP_MARKER)
+            parts.append(sentence["text"])
+            previous = sentence["sentence_idx"]
+        return "".join(parts)
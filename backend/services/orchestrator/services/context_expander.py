@@ -0,0 +1,155 @@
+"""
+Context Expander - Widen matched chunks to their parent window or to their neighbours
+Small chunks are searched, the LLM reads the larger span around them
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+from loguru import logger
+import os
+
+from services.context_packer import merge_overlapping
+
+
+CONTEXT_EXPANSION_MODES = ("none", "parent", "neighbors")
+
+
+def stitch(contents: List[str]) -> str:
+    """Join consecutive chunks of a document, removing the text each one repeats from the previous"""
+    text = contents[0]
+    for content in contents[1:]:
+        joined = merge_overlapping(text, content)
+        text = joined if joined is not None else f"{text}\n{content}"
+    return text
+
+
+class ContextExpander:
+    """
+    Replaces the contexts of matched chunks with a window of consecutive chunks:
+    - "parent": chunks ingested as children (CHILD_CHUNK_SIZE) expand to their whole parent
+      window, recorded in their metadata; chunks without a parent are left as they are
+    - "neighbors": every chunk expands to chunk_index ± CONTEXT_EXPANSION_NEIGHBORS
+
+    Windows of a document that overlap or touch are merged into one context carrying the
+    best score of the hits inside it. The windows of all queries are fetched with a single
+    PostgreSQL range query; if it fails, the matched chunks are used unexpanded.
+    """
+
+    def __init__(self, db_service):
+        self.db_service = db_service
+        self.mode = os.getenv("CONTEXT_EXPANSION", "parent")
+        if self.mode not in CONTEXT_EXPANSION_MODES:
+            raise ValueError(f"Unknown CONTEXT_EXPANSION: {self.mode}")
+        self.neighbors = int(os.getenv("CONTEXT_EXPANSION_NEIGHBORS", "1"))
+
+    async def expand_batch(
+        self,
+        contexts_per_query: List[List[Dict[str, Any]]],
+        mode: str,
+        neighbors: int
+    ) -> List[Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]]:
+        """Expanded contexts of several queries (in rank order) with per-query statistics"""
+        if mode == "none":
+            return [(contexts, None) for contexts in contexts_per_query]
+
+        windows_per_query = [self._windows(contexts, mode, neighbors) for contexts in contexts_per_query]
+        requested = list({
+            (document_id, first, last)
+            for windows in windows_per_query
+            for document_id, first, last, _ in windows
+        })
+        if not requested:
+            return [(contexts, None) for contexts in contexts_per_query]
+
+        try:
+            chunks_by_document = await self.db_service.get_chunk_windows(requested)
+        except Exception as e:
+            logger.warning(f"Context expansion failed, using the matched chunks: {e}")
+            return [(contexts, {"mode": mode, "error": str(e)}) for contexts in contexts_per_query]
+
+        return [
+            self._expand(contexts, windows, chunks_by_document, mode)
+            for contexts, windows in zip(contexts_per_query, windows_per_query)
+        ]
+
+    @staticmethod
+    def _window(context: Dict[str, Any], mode: str, neighbors: int) -> Optional[Tuple[int, int]]:
+        """First and last chunk_index a context expands to, or None if it stays as it is"""
+        chunk_index = context["chunk_index"]
+        if chunk_index is None:
+            return None
+        if mode == "parent":
+            parent = (context.get("metadata") or {}).get("parent_chunks")
+            return (parent[0], parent[1]) if parent else None
+        if neighbors <= 0:
+            return None
+        return max(chunk_index - neighbors, 0), chunk_index + neighbors
+
+    def _windows(
+        self,
+        contexts: List[Dict[str, Any]],
+        mode: str,
+        neighbors: int
+    ) -> List[Tuple[str, int, int, List[Dict[str, Any]]]]:
+        """Merged windows of one query: (document_id, first, last, contexts inside)"""
+        by_document: Dict[str, List[Tuple[int, int, Dict[str, Any]]]] = {}
+        for context in contexts:
+            window = self._window(context, mode, neighbors)
+            if window is not None:
+                by_document.setdefault(context["document_id"], []).append((*window, context))
+
+        windows = []
+        for document_id, spans in by_document.items():
+            spans.sort(key=lambda span: span[0])
+            first, last, members = spans[0][0], spans[0][1], [spans[0][2]]
+            for span_first, span_last, context in spans[1:]:
+                if span_first <= last + 1:
+                    last = max(last, span_last)
+                    members.append(context)
+                    continue
+                windows.append((document_id, first, last, members))
+                first, last, members = span_first, span_last, [context]
+            windows.append((document_id, first, last, members))
+        return windows
+
+    @staticmethod
+    def _expand(
+        contexts: List[Dict[str, Any]],
+        windows: List[Tuple[str, int, int, List[Dict[str, Any]]]],
+        chunks_by_document: Dict[str, List[Dict[str, Any]]],
+        mode: str
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        def rank(context: Dict[str, Any]) -> float:
+            return context.get("fusion_score", context["score"])
+
+        replaced = set()
+        expanded = []
+        fetched = 0
+        for document_id, first, last, members in windows:
+            chunks = [
+                chunk for chunk in chunks_by_document.get(document_id, [])
+                if first <= chunk["chunk_index"] <= last and chunk["content"]
+            ]
+            if not chunks:
+                continue
+            best = max(members, key=rank)
+            fetched += len(chunks)
+            replaced.update(id(context) for context in members)
+            expanded.append({
+                **best,
+                "chunk_index": chunks[0]["chunk_index"],
+                "chunk_indexes": sorted(
+                    {chunk["chunk_index"] for chunk in chunks} | {context["chunk_index"] for context in members}
+                ),
+                "content": stitch([chunk["content"] for chunk in chunks]),
+                "score": max(context["score"] for context in members),
+                **({"fusion_score": rank(best)} if "fusion_score" in best else {}),
+                "metadata": {
+                    **best["metadata"],
+                    "start_char": (chunks[0].get("metadata") or {}).get("start_char"),
+                    "end_char": (chunks[-1].get("metadata") or {}).get("end_char")
+                }
+            })
+
+        kept = [context for context in contexts if id(context) not in replaced]
+        stats = {"mode": mode, "windows": len(expanded), "chunks": fetched}
+        return sorted(expanded + kept, key=rank, reverse=True), stats
@@ -0,0 +1,189 @@
+"""
+Context Packer - Assemble retrieved chunks into the LLM prompt budget
+Merges overlapping neighbours, drops near-duplicates, cuts at score cliffs and packs by tokens
+"""
+
+from typing import List, Dict, Any, Tuple, Optional
+import os
+import re
+
+
+# Rough characters-per-token ratio, good enough to budget prompts across tokenizers
+CHARS_PER_TOKEN = 4
+
+# Tokens taken by the "[Source: ...]" header and separator around each context
+CONTEXT_OVERHEAD_TOKENS = 12
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def merge_overlapping(first: str, second: str, probe: int = 32) -> Optional[str]:
+    """
+    Join two consecutive chunks, removing the text the second one repeats from the first.
+    Returns None if the second does not start inside the first.
+    """
+    head = second[:probe]
+    if not head:
+        return None
+    # Earliest match first, so the longest overlap wins on repetitive text
+    position = first.find(head, max(len(first) - len(second), 0))
+    while position >= 0:
+        if second.startswith(first[position:]):
+            return first[:position] + second
+        position = first.find(head, position + 1)
+    return None
+
+
+def covered_sources(contexts: List[Dict[str, Any]], sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Sources whose chunk is part of one of the contexts (merged contexts cover several chunks)"""
+    covered = {
+        (context["document_id"], chunk_index)
+        for context in contexts
+        for chunk_index in context.get("chunk_indexes", [context["chunk_index"]])
+    }
+    return [source for source in sources if (source["document_id"], source["chunk_index"]) in covered]
+
+
+class ContextPacker:
+    """
+    Turns ranked chunk contexts into the set that is actually sent to the LLM:
+    1. score cliff: hits after the first drop larger than CONTEXT_SCORE_GAP are cut
+       (similarity scores only: fused rankings, which carry a fusion_score, are not cut)
+    2. merge: chunks of the same document that overlap or are adjacent become one context
+    3. dedup: contexts whose word shingles overlap more than CONTEXT_DEDUP_THRESHOLD are dropped
+    4. budget: contexts are taken by score until the token budget is spent
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("CONTEXT_PACKING_ENABLED", "true").lower() == "true"
+        self.score_gap = float(os.getenv("CONTEXT_SCORE_GAP", "0.15"))
+        self.min_contexts = int(os.getenv("CONTEXT_MIN_CONTEXTS", "1"))
+        self.dedup_threshold = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.85"))
+
+    def pack(
+        self,
+        contexts: List[Dict[str, Any]],
+        sources: List[Dict[str, Any]],
+        token_budget: int
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Pack contexts (as built by build_contexts, in score order) into token_budget.
+        Returns the packed contexts, the sources they cover and packing statistics.
+        """
+        stats = {"hits": len(contexts), "token_budget": token_budget}
+        if not self.enabled or not contexts:
+            return contexts, sources, stats
+
+        kept = self._cut_at_cliff(contexts)
+        stats["after_cutoff"] = len(kept)
+
+        merged = self._merge_neighbours(kept)
+        stats["after_merge"] = len(merged)
+
+        unique = self._drop_duplicates(merged)
+        stats["after_dedup"] = len(unique)
+
+        packed = []
+        used = 0
+        for context in unique:
+            cost = estimate_tokens(context["content"]) + CONTEXT_OVERHEAD_TOKENS
+            if used + cost > token_budget:
+                if packed:
+                    continue
+                # Always send something: trim the best context to the budget
+                chars = max(token_budget - CONTEXT_OVERHEAD_TOKENS, 0) * CHARS_PER_TOKEN
+                context = {**context, "content": context["content"][:chars]}
+                cost = estimate_tokens(context["content"]) + CONTEXT_OVERHEAD_TOKENS
+            packed.append(context)
+            used += cost
+        stats["packed"] = len(packed)
+        stats["tokens"] = used
+
+        return packed, covered_sources(packed, sources), stats
+
+    @staticmethod
+    def _rank_score(context: Dict[str, Any]) -> float:
+        """Score contexts are ordered by: the fused rank score of hybrid / federated hits, else the similarity"""
+        return context.get("fusion_score", context["score"])
+    
+    def _cut_at_cliff(self, contexts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Keep hits up to the first sharp score drop"""
+        ranked = sorted(contexts, key=self._rank_score, reverse=True)
+        if any("fusion_score" in context for context in contexts):
+            return ranked
+        for idx in range(max(self.min_contexts, 1), len(ranked)):
+            if ranked[idx - 1]["score"] - ranked[idx]["score"] > self.score_gap:
+                return ranked[:idx]
+        return ranked
+
+    def _merge_neighbours(self, contexts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merge runs of consecutive chunks of a document; merged contexts keep their best score"""
+        by_document: Dict[str, List[Dict[str, Any]]] = {}
+        for context in contexts:
+            by_document.setdefault(context["document_id"], []).append(context)
+
+        merged = []
+        for document_contexts in by_document.values():
+            document_contexts.sort(key=lambda context: context["chunk_index"] if context["chunk_index"] is not None else -1)
+            current = None
+            for context in document_contexts:
+                if current is not None and self._adjacent(current, context):
+                    joined = merge_overlapping(current["content"], context["content"])
+                    current = {
+                        **current,
+                        "content": joined if joined is not None else f"{current['content']}\n{context['content']}",
+                        "score": max(current["score"], context["score"]),
+                        **({"fusion_score": max(self._rank_score(current), self._rank_score(context))}
+                           if "fusion_score" in current else {}),
+                        "chunk_indexes": current["chunk_indexes"] + context.get("chunk_indexes", [context["chunk_index"]]),
+                        "metadata": {
+                            **current["metadata"],
+                            "end_char": context["metadata"].get("end_char", current["metadata"].get("end_char"))
+                        }
+                    }
+                    continue
+                if current is not None:
+                    merged.append(current)
+                current = {**context, "chunk_indexes": context.get("chunk_indexes", [context["chunk_index"]])}
+            merged.append(current)
+
+        return sorted(merged, key=self._rank_score, reverse=True)
+
+    @staticmethod
+    def _adjacent(previous: Dict[str, Any], context: Dict[str, Any]) -> bool:
+        """Consecutive chunk indexes, or character ranges that touch"""
+        if previous["chunk_indexes"][-1] is None or context["chunk_index"] is None:
+            return False
+        if context["chunk_index"] == previous["chunk_indexes"][-1] + 1:
+            return True
+        start = context["metadata"].get("start_char")
+        end = previous["metadata"].get("end_char")
+        return start is not None and end is not None and start <= end
+
+    def _drop_duplicates(self, contexts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop contexts nearly identical to a better-scored one (e.g. the same file uploaded twice)"""
+        kept = []
+        kept_shingles = []
+        for context in contexts:
+            shingles = self._shingles(context["content"])
+            if any(self._similarity(shingles, other) >= self.dedup_threshold for other in kept_shingles):
+                continue
+            kept.append(context)
+            kept_shingles.append(shingles)
+        return kept
+
+    @staticmethod
+    def _shingles(text: str, size: int = 3) -> set:
+        words = re.findall(r"\w+", text.lower())
+        if len(words) < size:
+            return {" ".join(words)}
+        return {" ".join(words[idx:idx + size]) for idx in range(len(words) - size + 1)}
+
+    @staticmethod
+    def _similarity(first: set, second: set) -> float:
+        """Share of the smaller shingle set found in the other (catches contained duplicates)"""
+        if not first or not second:
+            return 0.0
+        return len(first & second) / min(len(first), len(second))
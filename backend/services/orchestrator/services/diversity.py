@@ -0,0 +1,51 @@
+"""
+Diversity - Keep near-identical passages from filling the top hits
+Maximal marginal relevance over the hit vectors, or a cap on hits per document
+"""
+
+from typing import List, Dict, Any
+import numpy as np
+
+
+DIVERSITY_MODES = ("none", "mmr", "group")
+
+
+def mmr(hits: List[Dict[str, Any]], limit: int, lambda_: float) -> List[Dict[str, Any]]:
+    """
+    Pick limit hits by maximal marginal relevance: each step takes the hit maximizing
+    lambda_ * score - (1 - lambda_) * (highest cosine similarity to a hit already picked).
+    Hits need their "vector" (search with with_vectors); it is dropped from the result.
+    lambda_ = 1 keeps the similarity order, lower values favour diverse passages.
+    """
+    if not hits:
+        return []
+    vectors = np.asarray([hit["vector"] for hit in hits], dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+    relevance = np.asarray([hit["score"] for hit in hits], dtype=np.float32)
+    similarity = vectors @ vectors.T
+
+    selected = [int(np.argmax(relevance))]
+    redundancy = similarity[selected[0]].copy()
+    while len(selected) < min(limit, len(hits)):
+        scores = lambda_ * relevance - (1 - lambda_) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, similarity[best])
+
+    return [{k: v for k, v in hits[idx].items() if k != "vector"} for idx in selected]
+
+
+def cap_per_document(hits: List[Dict[str, Any]], cap: int, limit: int) -> List[Dict[str, Any]]:
+    """The first limit hits (in rank order) keeping at most cap of each document"""
+    kept = []
+    counts: Dict[Any, int] = {}
+    for hit in hits:
+        document_id = (hit.get("payload") or {}).get("document_id")
+        if counts.get(document_id, 0) >= cap:
+            continue
+        counts[document_id] = counts.get(document_id, 0) + 1
+        kept.append(hit)
+        if len(kept) == limit:
+            break
+    return kept
@@ -0,0 +1,281 @@
+"""
+Document Index - One vector per document for coarse-to-fine retrieval
+Queries first pick the closest documents, then search only their chunks
+"""
+
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+from loguru import logger
+from datetime import datetime
+from qdrant_client.models import PointStruct
+import numpy as np
+import asyncio
+import os
+
+from services.vector_store import DOCUMENT_INDEX_SUFFIX
+from services.context_compressor import sentence_spans
+
+
+DOCUMENT_VECTOR_MODES = ("mean", "summary")
+
+# Filter keys that are document-level and can restrict the coarse search; others only apply to chunks
+DOCUMENT_FILTER_KEYS = {"document_id", "filename", "source_file", "metadata.source_file"}
+
+
+def lead_summary(contents: List[str], max_chars: int) -> str:
+    """Leading sentences of a document's chunks (in order), up to max_chars"""
+    picked = []
+    seen = set()
+    used = 0
+    for content in contents:
+        for start, end in sentence_spans(content):
+            sentence = content[start:end]
+            if sentence in seen:  # repeated by the chunk overlap
+                continue
+            if picked and used + len(sentence) > max_chars:
+                return " ".join(picked)
+            picked.append(sentence)
+            seen.add(sentence)
+            used += len(sentence) + 1
+    return " ".join(picked)
+
+
+class DocumentIndex:
+    """
+    Maintains the companion collection "<collection>__documents" (point ID = document ID)
+    and runs coarse-to-fine searches against it.
+
+    A document vector is the mean of its chunk embeddings (DOCUMENT_VECTOR_MODE=mean, free
+    at ingest) or the embedding of its leading sentences (summary, one extra embedding).
+    Document vectors are derived data: failures to write them are logged, not raised, and
+    start_rebuild() recomputes a whole companion collection from the chunk collection.
+    """
+
+    def __init__(self, vector_store, document_processor):
+        self.vector_store = vector_store
+        self.document_processor = document_processor
+        self.enabled = os.getenv("DOCUMENT_INDEX_ENABLED", "true").lower() == "true"
+        self.mode = os.getenv("DOCUMENT_VECTOR_MODE", "mean")
+        if self.mode not in DOCUMENT_VECTOR_MODES:
+            raise ValueError(f"Unknown DOCUMENT_VECTOR_MODE: {self.mode}")
+        self.summary_chars = int(os.getenv("DOCUMENT_SUMMARY_CHARS", "1000"))
+        self.coarse_documents = int(os.getenv("COARSE_SEARCH_DOCUMENTS", "0"))  # 0 searches all chunks
+        self.rebuilds: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def collection_for(collection_name: str) -> str:
+        return f"{collection_name}{DOCUMENT_INDEX_SUFFIX}"
+
+    # ============================================
+    # Maintenance
+    # ============================================
+
+    async def index_document(
+        self,
+        document_id: str,
+        collection_name: str,
+        contents: List[str],
+        embeddings: List[List[float]],
+        filename: Optional[str] = None
+    ):
+        """Write the vector of a document from its chunk contents and embeddings (in chunk order)"""
+        if not self.enabled or not embeddings:
+            return
+        try:
+            if self.mode == "summary":
+                vector = await self.document_processor.generate_embedding(lead_summary(contents, self.summary_chars))
+            else:
+                vector = np.asarray(embeddings, dtype=np.float32).mean(axis=0).tolist()
+            await self.vector_store.add_vectors(self.collection_for(collection_name), [{
+                "id": document_id,
+                "vector": vector,
+                "payload": self._payload(document_id, filename, len(embeddings))
+            }])
+        except Exception as e:
+            logger.warning(f"Document vector of {document_id} not written (rebuild the document index): {e}")
+
+    async def delete_documents(self, collection_name: str, document_ids: List[str]):
+        """Remove documents from the companion collection, if there is one"""
+        if not document_ids:
+            return
+        try:
+            await asyncio.to_thread(
+                self.vector_store.client.delete,
+                collection_name=self.collection_for(collection_name),
+                points_selector=[str(d) for d in document_ids]
+            )
+        except Exception as e:
+            logger.debug(f"No document vectors deleted from {self.collection_for(collection_name)}: {e}")
+
+    def start_rebuild(
+        self,
+        collection_name: str,
+        batch_size: int = 256,
+        on_swap: Optional[Callable[[], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Recompute the companion collection of collection_name in the background, e.g. for
+        collections indexed before document vectors existed or after an embedding migration.
+        The new version is built aside, swapped in through the alias, then on_swap is awaited.
+        """
+        current = self.rebuilds.get(collection_name)
+        if current and current["status"] == "running":
+            raise ValueError(f"The document index of {collection_name} is already being rebuilt")
+
+        state = {
+            "collection": collection_name,
+            "status": "running",
+            "mode": self.mode,
+            "chunks_scanned": 0,
+            "documents": 0,
+            "started_at": datetime.utcnow().isoformat(),
+            "finished_at": None,
+            "error": None
+        }
+        self.rebuilds[collection_name] = state
+        state["task"] = asyncio.create_task(self._rebuild(state, batch_size, on_swap))
+        logger.info(f"Document index rebuild started for {collection_name}")
+        return self.rebuild_status(collection_name)
+
+    def rebuild_status(self, collection_name: str) -> Optional[Dict[str, Any]]:
+        state = self.rebuilds.get(collection_name)
+        if state is None:
+            return None
+        return {k: v for k, v in state.items() if k != "task"}
+
+    async def _rebuild(
+        self,
+        state: Dict[str, Any],
+        batch_size: int,
+        on_swap: Optional[Callable[[], Awaitable[None]]] = None
+    ):
+        """Background task: aggregate chunk vectors per document, write a new version, swap"""
+        collection_name = state["collection"]
+        companion = self.collection_for(collection_name)
+        client = self.vector_store.client
+        try:
+            vector_size = await asyncio.to_thread(self.vector_store.vector_size_of, collection_name)
+
+            sums: Dict[str, np.ndarray] = {}
+            counts: Dict[str, int] = {}
+            filenames: Dict[str, Optional[str]] = {}
+            leads: Dict[str, tuple] = {}  # document_id -> (chunk_index, content) of its first chunk
+            offset = None
+            while True:
+                points, offset = await asyncio.to_thread(
+                    client.scroll,
+                    collection_name=collection_name,
+                    limit=batch_size,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=self.mode == "mean"
+                )
+                for point in points:
+                    payload = point.payload or {}
+                    document_id = payload.get("document_id")
+                    if not document_id:
+                        continue
+                    counts[document_id] = counts.get(document_id, 0) + 1
+                    filenames.setdefault(document_id, payload.get("filename"))
+                    if self.mode == "mean":
+                        vector = np.asarray(point.vector, dtype=np.float32)
+                        sums[document_id] = sums[document_id] + vector if document_id in sums else vector
+                    else:
+                        chunk_index = payload.get("chunk_index") or 0
+                        if document_id not in leads or chunk_index < leads[document_id][0]:
+                            leads[document_id] = (chunk_index, payload.get("content") or "")
+                state["chunks_scanned"] += len(points)
+                if offset is None:
+                    break
+
+            physical_name = await asyncio.to_thread(self.vector_store.create_version, companion, vector_size)
+            document_ids = list(counts)
+            for start in range(0, len(document_ids), batch_size):
+                batch = document_ids[start:start + batch_size]
+                if self.mode == "mean":
+                    vectors = [(sums[d] / counts[d]).tolist() for d in batch]
+                else:
+                    vectors = await self.document_processor.generate_embeddings([
+                        lead_summary([leads[d][1]], self.summary_chars) or filenames[d] or d for d in batch
+                    ])
+                await asyncio.to_thread(
+                    client.upsert,
+                    collection_name=physical_name,
+                    points=[
+                        PointStruct(id=d, vector=vector, payload=self._payload(d, filenames[d], counts[d]))
+                        for d, vector in zip(batch, vectors)
+                    ]
+                )
+                state["documents"] += len(batch)
+
+            await asyncio.to_thread(self.vector_store.swap_alias, companion, physical_name)
+            for version in await asyncio.to_thread(self.vector_store.list_versions, companion):
+                if version != physical_name:
+                    await asyncio.to_thread(self.vector_store.drop_version, companion, version)
+            state["status"] = "completed"
+            if on_swap:
+                await on_swap()
+            logger.info(f"Document index of {collection_name} rebuilt: {state['documents']} documents")
+
+        except Exception as e:
+            state["status"] = "failed"
+            state["error"] = str(e)
+            logger.error(f"Document index rebuild of {collection_name} failed: {e}")
+        finally:
+            state["finished_at"] = datetime.utcnow().isoformat()
+
+    @staticmethod
+    def _payload(document_id: str, filename: Optional[str], chunks: int) -> Dict[str, Any]:
+        return {
+            "document_id": document_id,
+            "filename": filename,
+            "chunks": chunks,
+            "metadata": {"source_file": filename}
+        }
+
+    # ============================================
+    # Coarse-to-fine search
+    # ============================================
+
+    async def search(
+        self,
+        collection_name: str,
+        query_vectors: List[List[float]],
+        limit: int,
+        documents: int,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        with_vectors: bool = False,
+        search_options: Optional[Dict[str, Any]] = None
+    ) -> Optional[List[List[Dict[str, Any]]]]:
+        """
+        Chunk hits per query vector, searched only among the chunks of the query's top
+        `documents` documents. Returns None when the collection has no usable document
+        index, so the caller falls back to a flat search.
+        """
+        try:
+            document_hits = await self.vector_store.search_batch(
+                collection_name=self.collection_for(collection_name),
+                query_vectors=query_vectors,
+                limit=documents,
+                score_threshold=0.0,
+                metadata_filter={
+                    key: value for key, value in (metadata_filter or {}).items() if key in DOCUMENT_FILTER_KEYS
+                }
+            )
+        except Exception as e:
+            logger.warning(f"Coarse search unavailable for {collection_name}, searching all chunks: {e}")
+            return None
+
+        # Queries without any document hit search every chunk
+        filters = [
+            {**(metadata_filter or {}), "document_id": [hit["id"] for hit in hits]} if hits else metadata_filter
+            for hits in document_hits
+        ]
+        return await self.vector_store.search_batch(
+            collection_name=collection_name,
+            query_vectors=query_vectors,
+            limit=limit,
+            score_threshold=0.0,
+            metadata_filters=filters,
+            with_vectors=with_vectors,
+            search_options=search_options
+        )
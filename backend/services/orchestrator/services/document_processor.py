@@ -3,7 +3,7 @@ Document Processing Service
 Text extraction, chunking, and preparation for embedding
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import io
 from loguru import logger
 import httpx
@@ -22,6 +22,10 @@ class DocumentProcessor:
         self.embedding_service_url = os.getenv("EMBEDDING_SERVICE_URL", "http://embedding-service:8002")
         self.chunk_size = int(os.getenv("CHUNK_SIZE", "512"))
         self.chunk_overlap = int(os.getenv("CHUNK_OVERLAP", "50"))
+        # Small-to-big: search small child chunks, answer from their CHUNK_SIZE parent (0 disables)
+        self.child_chunk_size = int(os.getenv("CHILD_CHUNK_SIZE", "0"))
+        self.child_chunk_overlap = int(os.getenv("CHILD_CHUNK_OVERLAP", "0"))
+        self.embedding_batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
     
     async def process_document(self, file_data: bytes, filename: str) -> List[Dict[str, Any]]:
         """
@@ -104,16 +108,57 @@ class DocumentProcessor:
         """
         Split text into overlapping chunks.
         Uses a simple character-based approach.
+        
+        With CHILD_CHUNK_SIZE set, the CHUNK_SIZE windows become parents: each is split
+        into small child chunks, which are what gets embedded and searched. Children
+        record their parent window in their metadata (parent_index, its character span
+        and the first / last chunk_index of its children), so that matched children can
+        be expanded back to the whole parent at query time.
         """
         chunks = []
         
+        for parent_idx, (start, end) in enumerate(self._split(text, self.chunk_size, self.chunk_overlap)):
+            if not self.child_chunk_size:
+                chunks.append(self._chunk(text, filename, len(chunks), start, end))
+                continue
+            
+            first_child = len(chunks)
+            parent_text = text[start:end]
+            for child_start, child_end in self._split(parent_text, self.child_chunk_size, self.child_chunk_overlap):
+                chunks.append(self._chunk(text, filename, len(chunks), start + child_start, start + child_end))
+            for chunk in chunks[first_child:]:
+                chunk["metadata"].update({
+                    "parent_index": parent_idx,
+                    "parent_start_char": start,
+                    "parent_end_char": end,
+                    "parent_chunks": [first_child, len(chunks) - 1]
+                })
+        
+        return chunks
+    
+    @staticmethod
+    def _chunk(text: str, filename: str, chunk_idx: int, start: int, end: int) -> Dict[str, Any]:
+        return {
+            "content": text[start:end].strip(),
+            "metadata": {
+                "source_file": filename,
+                "chunk_index": chunk_idx,
+                "start_char": start,
+                "end_char": end
+            }
+        }
+    
+    @staticmethod
+    def _split(text: str, size: int, overlap: int) -> List[Tuple[int, int]]:
+        """(start, end) spans of size characters, broken at a sentence end when possible"""
+        spans = []
+        
         # Simple chunking by characters (can be improved with semantic chunking)
         start = 0
-        chunk_idx = 0
         
         while start < len(text):
             # Get chunk
-            end = start + self.chunk_size
+            end = start + size
             chunk_text = text[start:end]
             
             # Try to break at sentence boundary
@@ -123,25 +168,15 @@ class DocumentProcessor:
                 last_newline = chunk_text.rfind('\n')
                 break_point = max(last_period, last_newline)
                 
-                if break_point > self.chunk_size // 2:  # Only break if not too early
-                    chunk_text = chunk_text[:break_point + 1]
+                if break_point > size // 2:  # Only break if not too early
                     end = start + break_point + 1
             
-            chunks.append({
-                "content": chunk_text.strip(),
-                "metadata": {
-                    "source_file": filename,
-                    "chunk_index": chunk_idx,
-                    "start_char": start,
-                    "end_char": end
-                }
-            })
+            spans.append((start, min(end, len(text))))
             
             # Move to next chunk with overlap
-            start = end - self.chunk_overlap
-            chunk_idx += 1
+            start = end - overlap
         
-        return chunks
+        return spans
     
     async def generate_embedding(self, text: str) -> List[float]:
         """
@@ -163,3 +198,36 @@ class DocumentProcessor:
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
             raise
+    
+    async def generate_embeddings(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        """
+        Generate embeddings for many texts via the embedding service batch endpoint.
+        Texts are sent in slices of batch_size (EMBEDDING_BATCH_SIZE by default), one after
+        the other; empty texts are not allowed.
+        """
+        batch_size = batch_size or self.embedding_batch_size
+        embeddings: List[List[float]] = []
+        try:
+            async with httpx.AsyncClient(timeout=120.0) as client:
+                for start in range(0, len(texts), batch_size):
+                    batch = texts[start:start + batch_size]
+                    response = await client.post(
+                        f"{self.embedding_service_url}/embed/batch",
+                        json={"texts": batch}
+                    )
+                    
+                    if response.status_code != 200:
+                        raise Exception(f"Embedding service error: {response.text}")
+                    
+                    result = response.json()
+                    if result["count"] != len(batch):
+                        raise Exception(
+                            f"Embedding service returned {result['count']} embeddings for {len(batch)} texts"
+                        )
+                    embeddings.extend(result["embeddings"])
+            
+            return embeddings
+            
+        except Exception as e:
+            logger.error(f"Error generating batch embeddings: {e}")
+            raise
@@ -0,0 +1,85 @@
+"""
+Extractive Answerer - Answer from the best-matching context sentences, without the LLM
+"""
+
+from typing import List, Dict, Any, Optional
+import os
+
+
+ANSWER_MODES = ("llm", "extractive", "auto")
+
+
+class ExtractiveAnswerer:
+    """
+    Builds an answer from the context sentences closest to the question
+    (scored by ContextCompressor.score_sentences).
+
+    Each kept sentence is returned as a highlight: the surrounding passage, the span of
+    the sentence inside it, and its character offsets in the source document derived from
+    the chunk's start_char metadata. The best sentence score is the answer's confidence;
+    "auto" queries fall back to the LLM below EXTRACTIVE_CONFIDENCE_THRESHOLD.
+    """
+
+    def __init__(self):
+        self.max_sentences = int(os.getenv("EXTRACTIVE_MAX_SENTENCES", "3"))
+        self.min_score = float(os.getenv("EXTRACTIVE_MIN_SCORE", "0.3"))
+        self.confidence_threshold = float(os.getenv("EXTRACTIVE_CONFIDENCE_THRESHOLD", "0.7"))
+        self.passage_window = int(os.getenv("EXTRACTIVE_PASSAGE_WINDOW", "1"))  # sentences of context on each side
+
+    def answer(
+        self,
+        contexts: List[Dict[str, Any]],
+        scored: List[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        {"answer", "confidence", "highlights"} from scored sentences, or None if no sentence
+        reaches EXTRACTIVE_MIN_SCORE.
+        """
+        best = [
+            sentence for sentence in sorted(scored, key=lambda sentence: sentence["score"], reverse=True)
+            if sentence["score"] >= self.min_score
+        ][:self.max_sentences]
+        if not best:
+            return None
+
+        by_context: Dict[int, List[Dict[str, Any]]] = {}
+        for sentence in scored:
+            by_context.setdefault(sentence["context_idx"], []).append(sentence)
+
+        highlights = [self._highlight(contexts[sentence["context_idx"]], by_context[sentence["context_idx"]], sentence)
+                      for sentence in best]
+        return {
+            "answer": " ".join(sentence["text"] for sentence in best),
+            "confidence": best[0]["score"],
+            "highlights": highlights
+        }
+
+    def is_confident(self, extractive: Optional[Dict[str, Any]]) -> bool:
+        return extractive is not None and extractive["confidence"] >= self.confidence_threshold
+
+    def _highlight(
+        self,
+        context: Dict[str, Any],
+        context_sentences: List[Dict[str, Any]],
+        sentence: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Passage around a sentence, with the sentence span and its document offsets"""
+        first = max(sentence["sentence_idx"] - self.passage_window, 0)
+        last = min(sentence["sentence_idx"] + self.passage_window, len(context_sentences) - 1)
+        passage_start = context_sentences[first]["start"]
+        passage_end = context_sentences[last]["end"]
+
+        # Chunk offsets are positions in the extracted document text (approximate: chunks are stripped)
+        chunk_start = (context.get("metadata") or {}).get("start_char")
+        return {
+            "document_id": context["document_id"],
+            "chunk_index": context["chunk_index"],
+            "filename": (context.get("metadata") or {}).get("source_file"),
+            "text": sentence["text"],
+            "score": sentence["score"],
+            "passage": context["content"][passage_start:passage_end],
+            "highlight_start": sentence["start"] - passage_start,
+            "highlight_end": sentence["end"] - passage_start,
+            "start_char": chunk_start + sentence["start"] if chunk_start is not None else None,
+            "end_char": chunk_start + sentence["end"] if chunk_start is not None else None
+        }
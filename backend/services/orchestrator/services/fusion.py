@@ -0,0 +1,50 @@
+"""
+Result Fusion - Merge ranked hit lists from several searches
+"""
+
+from typing import List, Dict, Any, Optional
+import os
+
+
+FUSION_METHODS = ("rrf", "score")
+
+# Rank offset of reciprocal rank fusion; higher values flatten the advantage of top ranks
+RRF_K = int(os.getenv("FUSION_RRF_K", "60"))
+
+
+def fuse(
+    result_lists: List[List[Dict[str, Any]]],
+    method: str = "rrf",
+    limit: Optional[int] = None,
+    weights: Optional[List[float]] = None,
+    k: int = RRF_K
+) -> List[Dict[str, Any]]:
+    """
+    Merge hit lists (each sorted best first, hits identified by "id") into one ranking.
+
+    - "score": hits ordered by their raw score; a hit found by several searches keeps its best score.
+      Only meaningful when the scores are comparable (same embedding model and distance).
+    - "rrf": reciprocal rank fusion, sum of weight / (k + rank) over the lists a hit appears in.
+      Rank-based, so it also merges searches whose scores are on different scales.
+
+    Every returned hit carries its "fusion_score"; "score" keeps the original value of the
+    first list it was found in.
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method: {method}")
+    weights = weights or [1.0] * len(result_lists)
+
+    fused: Dict[str, Dict[str, Any]] = {}
+    for hits, weight in zip(result_lists, weights):
+        for rank, hit in enumerate(hits, start=1):
+            contribution = weight / (k + rank) if method == "rrf" else hit["score"]
+            entry = fused.get(hit["id"])
+            if entry is None:
+                fused[hit["id"]] = {**hit, "fusion_score": contribution}
+            elif method == "rrf":
+                entry["fusion_score"] += contribution
+            else:
+                entry["fusion_score"] = max(entry["fusion_score"], contribution)
+
+    ranked = sorted(fused.values(), key=lambda hit: hit["fusion_score"], reverse=True)
+    return ranked[:limit] if limit else ranked
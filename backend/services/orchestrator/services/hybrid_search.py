@@ -0,0 +1,259 @@
+"""
+Hybrid Retriever - Dense (Qdrant) and lexical (PostgreSQL full-text) search fused by rank
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+from loguru import logger
+from prometheus_client import Histogram
+import asyncio
+import os
+import time
+
+from services.fusion import fuse
+from services.diversity import mmr, cap_per_document, DIVERSITY_MODES
+
+
+RETRIEVAL_SECONDS = Histogram(
+    "openrag_retrieval_seconds",
+    "Time spent in each retrieval leg",
+    ["leg"]
+)
+
+LEGS = ("vector", "lexical")
+
+
+class HybridRetriever:
+    """
+    Runs the vector search and, for hybrid queries, a full-text search of the chunk
+    contents concurrently, then merges both rankings with weighted reciprocal rank fusion.
+
+    Dense retrieval misses exact tokens (identifiers, error codes, arXiv IDs) that the
+    lexical leg matches verbatim. Each leg fetches HYBRID_CANDIDATE_FACTOR times the
+    requested hits so the fusion has candidates to reorder. A leg that fails is logged
+    and left out; the search only fails when every leg does.
+
+    With coarse_documents, the vector leg is a coarse-to-fine search (see DocumentIndex).
+
+    Diversification keeps near-identical passages from filling the hits: "mmr" fetches
+    DIVERSITY_CANDIDATE_FACTOR times the hits with their vectors and re-selects them by
+    maximal marginal relevance; "group" runs a Qdrant group-by-document_id search with at
+    most max_per_document hits per document (capped in Python for coarse and fused lists).
+    """
+
+    def __init__(self, vector_store, db_service, document_index=None):
+        self.vector_store = vector_store
+        self.db_service = db_service
+        self.document_index = document_index
+        self.enabled = os.getenv("HYBRID_SEARCH_ENABLED", "false").lower() == "true"
+        self.vector_weight = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+        self.lexical_weight = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0"))
+        self.candidate_factor = int(os.getenv("HYBRID_CANDIDATE_FACTOR", "2"))
+        self.diversity_mode = os.getenv("DIVERSITY_MODE", "none")
+        if self.diversity_mode not in DIVERSITY_MODES:
+            raise ValueError(f"Unknown DIVERSITY_MODE: {self.diversity_mode}")
+        self.mmr_lambda = float(os.getenv("MMR_LAMBDA", "0.7"))
+        self.max_per_document = int(os.getenv("MAX_HITS_PER_DOCUMENT", "2"))
+        self.diversity_candidate_factor = int(os.getenv("DIVERSITY_CANDIDATE_FACTOR", "4"))
+
+    def weights(
+        self,
+        vector_weight: Optional[float] = None,
+        lexical_weight: Optional[float] = None
+    ) -> Dict[str, float]:
+        """Per-request leg weights, defaulting to the configured ones"""
+        return {
+            "vector": self.vector_weight if vector_weight is None else vector_weight,
+            "lexical": self.lexical_weight if lexical_weight is None else lexical_weight
+        }
+
+    def diversity(
+        self,
+        mode: Optional[str] = None,
+        mmr_lambda: Optional[float] = None,
+        max_per_document: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Per-request diversification settings, defaulting to the configured ones"""
+        return {
+            "mode": mode or self.diversity_mode,
+            "mmr_lambda": self.mmr_lambda if mmr_lambda is None else mmr_lambda,
+            "max_per_document": self.max_per_document if max_per_document is None else max_per_document
+        }
+
+    async def search(
+        self,
+        query: str,
+        collection_name: str,
+        query_vector: List[float],
+        limit: int,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        hybrid: bool = False,
+        weights: Optional[Dict[str, float]] = None,
+        coarse_documents: int = 0,
+        diversity: Optional[Dict[str, Any]] = None,
+        search_options: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Hits of one collection and per-leg statistics ({leg: {"hits", "ms"}}).
+        Without hybrid, this is the plain vector search. Fused hits carry a "fusion_score"
+        that orders them; "score" stays the similarity (or text rank) of the leg that found them.
+        """
+        results, stats = await self.search_batch(
+            [query], collection_name, [query_vector], limit, metadata_filter, hybrid, weights, coarse_documents, diversity,
+            search_options
+        )
+        return results[0], stats
+
+    async def search_batch(
+        self,
+        queries: List[str],
+        collection_name: str,
+        query_vectors: List[List[float]],
+        limit: int,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        hybrid: bool = False,
+        weights: Optional[Dict[str, float]] = None,
+        coarse_documents: int = 0,
+        diversity: Optional[Dict[str, Any]] = None,
+        search_options: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[List[Dict[str, Any]]], Dict[str, Any]]:
+        """search for several queries: one batched vector search, lexical searches run concurrently"""
+        weights = weights or self.weights()
+        diversity = diversity or self.diversity()
+        stats: Dict[str, Any] = {}
+        if diversity["mode"] != "none":
+            stats["diversity"] = diversity
+        if not hybrid:
+            search = self._vector(
+                queries, collection_name, query_vectors, limit, metadata_filter, coarse_documents, diversity,
+                search_options, stats
+            )
+            return await self._timed("vector", search, stats), stats
+
+        depth = limit * max(self.candidate_factor, 1)
+        legs = [leg for leg in LEGS if weights[leg] > 0]
+        if not legs:
+            raise ValueError("At least one hybrid search weight must be positive")
+        searches = {
+            "vector": lambda: self._vector(
+                queries, collection_name, query_vectors, depth, metadata_filter, coarse_documents, diversity,
+                search_options, stats
+            ),
+            "lexical": lambda: self._lexical(queries, collection_name, depth, metadata_filter)
+        }
+        outcomes = await asyncio.gather(
+            *(self._timed(leg, searches[leg](), stats) for leg in legs),
+            return_exceptions=True
+        )
+
+        ranked = {}
+        for leg, outcome in zip(legs, outcomes):
+            if isinstance(outcome, Exception):
+                logger.warning(f"{leg.capitalize()} search failed, continuing without it: {outcome}")
+                stats[leg]["error"] = str(outcome)
+            else:
+                ranked[leg] = outcome
+        if not ranked:
+            raise outcomes[0]
+
+        stats["weights"] = {leg: weights[leg] for leg in legs}
+        grouped = diversity["mode"] == "group"
+        results = [
+            fuse(
+                [ranked[leg][idx] for leg in ranked],
+                "rrf",
+                depth if grouped else limit,
+                weights=[weights[leg] for leg in ranked]
+            )
+            for idx in range(len(queries))
+        ]
+        if grouped:  # lexical hits are not grouped
+            results = [cap_per_document(hits, diversity["max_per_document"], limit) for hits in results]
+        return results, stats
+
+    async def _vector(
+        self,
+        queries: List[str],
+        collection_name: str,
+        query_vectors: List[List[float]],
+        limit: int,
+        metadata_filter: Optional[Dict[str, Any]],
+        coarse_documents: int,
+        diversity: Dict[str, Any],
+        search_options: Optional[Dict[str, Any]],
+        stats: Dict[str, Any]
+    ) -> List[List[Dict[str, Any]]]:
+        mode = diversity["mode"]
+        use_coarse = bool(coarse_documents) and self.document_index is not None
+        if mode == "group" and not use_coarse:
+            return list(await asyncio.gather(*(
+                self.vector_store.search_groups(
+                    collection_name=collection_name,
+                    query_vector=query_vector,
+                    limit=limit,
+                    group_size=diversity["max_per_document"],
+                    metadata_filter=metadata_filter,
+                    search_options=search_options
+                )
+                for query_vector in query_vectors
+            )))
+
+        depth = limit if mode == "none" else limit * max(self.diversity_candidate_factor, 1)
+        with_vectors = mode == "mmr"
+        results = None
+        if use_coarse:
+            results = await self.document_index.search(
+                collection_name, query_vectors, depth, coarse_documents, metadata_filter, with_vectors, search_options
+            )
+            stats["coarse"] = {"documents": coarse_documents, "fallback": results is None}
+        if results is None and len(query_vectors) == 1:
+            results = [await self.vector_store.search(
+                query=queries[0],
+                collection_name=collection_name,
+                limit=depth,
+                score_threshold=0.0,  # low-relevance hits are cut at the score cliff by the context packer
+                metadata_filter=metadata_filter,
+                query_vector=query_vectors[0],
+                with_vectors=with_vectors,
+                search_options=search_options
+            )]
+        elif results is None:
+            results = await self.vector_store.search_batch(
+                collection_name=collection_name,
+                query_vectors=query_vectors,
+                limit=depth,
+                score_threshold=0.0,
+                metadata_filter=metadata_filter,
+                with_vectors=with_vectors,
+                search_options=search_options
+            )
+
+        if mode == "mmr":
+            return [mmr(hits, limit, diversity["mmr_lambda"]) for hits in results]
+        if mode == "group":
+            return [cap_per_document(hits, diversity["max_per_document"], limit) for hits in results]
+        return results
+
+    async def _lexical(
+        self,
+        queries: List[str],
+        collection_name: str,
+        limit: int,
+        metadata_filter: Optional[Dict[str, Any]]
+    ) -> List[List[Dict[str, Any]]]:
+        return list(await asyncio.gather(*(
+            self.db_service.search_chunks_lexical(query, collection_name, limit, metadata_filter)
+            for query in queries
+        )))
+
+    @staticmethod
+    async def _timed(leg: str, search, stats: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+        """Await one leg, recording its duration and hit count"""
+        started = time.perf_counter()
+        try:
+            results = await search
+        finally:
+            elapsed = time.perf_counter() - started
+            RETRIEVAL_SECONDS.labels(leg=leg).observe(elapsed)
+            stats[leg] = {"ms": round(elapsed * 1000, 1)}
+        stats[leg]["hits"] = sum(len(hits) for hits in results)
+        return results
@@ -0,0 +1,146 @@
+"""
+Index Profiles - Per-collection Qdrant storage and HNSW settings
+Quantization (scalar int8, product, binary), on-disk vectors / payload and HNSW m / ef_construct
+"""
+
+from typing import Dict, Any, Optional
+from qdrant_client.models import (
+    HnswConfigDiff, SearchParams, QuantizationSearchParams,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    ProductQuantization, ProductQuantizationConfig, CompressionRatio,
+    BinaryQuantization, BinaryQuantizationConfig
+)
+
+
+QUANTIZATION_TYPES = ("none", "scalar", "product", "binary")
+
+PRODUCT_COMPRESSIONS = {"x4": 4, "x8": 8, "x16": 16, "x32": 32, "x64": 64}
+
+# Qdrant defaults; a profile only overrides what it sets
+DEFAULT_INDEX_PROFILE = {
+    "quantization": "none",
+    "quantile": None,  # scalar: share of values kept in the int8 range (outliers are clipped)
+    "compression": "x16",  # product
+    "always_ram": True,  # keep the quantized vectors in RAM (the originals may be on disk)
+    "rescore": True,  # re-rank quantized candidates with the original vectors
+    "oversampling": 2.0,  # quantized candidates fetched per requested hit before rescoring
+    "on_disk": False,  # original vectors memory-mapped from disk
+    "on_disk_payload": False,
+    "hnsw_m": None,  # Qdrant default 16
+    "hnsw_ef_construct": None,  # Qdrant default 100
+    "hnsw_ef": None  # default search ef (Qdrant uses ef_construct)
+}
+
+
+# Expected type of each setting (ints are accepted for floats)
+PROFILE_TYPES = {
+    "quantization": str,
+    "quantile": (int, float),
+    "compression": str,
+    "always_ram": bool,
+    "rescore": bool,
+    "oversampling": (int, float),
+    "on_disk": bool,
+    "on_disk_payload": bool,
+    "hnsw_m": int,
+    "hnsw_ef_construct": int,
+    "hnsw_ef": int
+}
+
+PROFILE_TYPE_NAMES = {str: "a string", (int, float): "a number", bool: "true or false", int: "an integer"}
+
+
+def normalize_profile(profile: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """A complete profile from a partial one; raises ValueError on unknown keys or bad values"""
+    profile = profile or {}
+    unknown = set(profile) - set(DEFAULT_INDEX_PROFILE)
+    if unknown:
+        raise ValueError(f"Unknown index profile settings: {', '.join(sorted(unknown))}")
+    normalized = {**DEFAULT_INDEX_PROFILE, **{k: v for k, v in profile.items() if v is not None}}
+
+    for key, value in normalized.items():
+        if value is None:
+            continue
+        expected = PROFILE_TYPES[key]
+        if isinstance(value, bool) != (expected is bool) or not isinstance(value, expected):
+            raise ValueError(f"{key} must be {PROFILE_TYPE_NAMES[expected]}, got {value!r}")
+    if normalized["quantization"] not in QUANTIZATION_TYPES:
+        raise ValueError(f"Unknown quantization: {normalized['quantization']}")
+    if normalized["compression"] not in PRODUCT_COMPRESSIONS:
+        raise ValueError(f"Unknown product quantization compression: {normalized['compression']}")
+    if normalized["quantile"] is not None and not 0.5 <= normalized["quantile"] <= 1:
+        raise ValueError("quantile must be between 0.5 and 1")
+    if normalized["oversampling"] < 1:
+        raise ValueError("oversampling must be at least 1")
+    for key in ("hnsw_m", "hnsw_ef_construct", "hnsw_ef"):
+        if normalized[key] is not None and normalized[key] < (0 if key == "hnsw_m" else 4):
+            raise ValueError(f"{key} is too small")
+    return normalized
+
+
+def quantization_config(profile: Dict[str, Any]):
+    """Qdrant quantization config of a profile, None without quantization"""
+    quantization = profile["quantization"]
+    if quantization == "scalar":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(
+            type=ScalarType.INT8, quantile=profile["quantile"], always_ram=profile["always_ram"]
+        ))
+    if quantization == "product":
+        return ProductQuantization(product=ProductQuantizationConfig(
+            compression=CompressionRatio(profile["compression"]), always_ram=profile["always_ram"]
+        ))
+    if quantization == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=profile["always_ram"]))
+    return None
+
+
+def hnsw_config(profile: Dict[str, Any]) -> Optional[HnswConfigDiff]:
+    if profile["hnsw_m"] is None and profile["hnsw_ef_construct"] is None:
+        return None
+    return HnswConfigDiff(m=profile["hnsw_m"], ef_construct=profile["hnsw_ef_construct"])
+
+
+def search_params(
+    profile: Dict[str, Any],
+    hnsw_ef: Optional[int] = None,
+    exact: Optional[bool] = None
+) -> Optional[SearchParams]:
+    """
+    Search parameters of a collection: the per-request ef / exact override the profile's ef;
+    quantized collections rescore and oversample as configured (exact search skips both).
+    """
+    ef = hnsw_ef if hnsw_ef is not None else profile["hnsw_ef"]
+    quantized = profile["quantization"] != "none"
+    if ef is None and not exact and not quantized:
+        return None
+    return SearchParams(
+        hnsw_ef=ef,
+        exact=exact or None,
+        quantization=QuantizationSearchParams(
+            rescore=profile["rescore"], oversampling=profile["oversampling"]
+        ) if quantized and not exact else None
+    )
+
+
+def estimate_memory(profile: Dict[str, Any], points: int, dimension: int) -> Dict[str, int]:
+    """
+    Approximate RAM in bytes taken by the vectors of a collection under a profile:
+    original float32 vectors (unless on disk), quantized vectors (when kept in RAM)
+    and the HNSW graph links (2 * m per point on layer 0, 4 bytes each).
+    """
+    original = 0 if profile["on_disk"] else points * dimension * 4
+    quantized = 0
+    if profile["quantization"] != "none" and (profile["always_ram"] or not profile["on_disk"]):
+        if profile["quantization"] == "scalar":
+            quantized = points * dimension
+        elif profile["quantization"] == "product":
+            quantized = points * dimension * 4 // PRODUCT_COMPRESSIONS[profile["compression"]]
+        else:
+            quantized = points * ((dimension + 7) // 8)
+    graph = points * 2 * (profile["hnsw_m"] or 16) * 4
+    return {
+        "vectors": original,
+        "quantized": quantized,
+        "hnsw": graph,
+        "total": original + quantized + graph
+    }
@@ -0,0 +1,136 @@
+"""
+Document Indexer
+Embeds document chunks and writes them to Qdrant and PostgreSQL in batches
+"""
+
+from typing import List, Dict, Any, Optional
+from loguru import logger
+import uuid
+
+
+class DocumentIndexer:
+    """Shared chunk indexing pipeline used by ingestion and reprocessing"""
+
+    def __init__(self, db_service, document_processor, vector_store, document_index=None, collection_router=None):
+        self.db_service = db_service
+        self.document_processor = document_processor
+        self.vector_store = vector_store
+        self.document_index = document_index
+        self.collection_router = collection_router
+
+    async def index_chunks(
+        self,
+        document_id: str,
+        collection_name: str,
+        chunks: List[Dict[str, Any]],
+        filename: Optional[str] = None
+    ) -> int:
+        """
+        Embed freshly extracted chunks, upsert them into Qdrant and record them in PostgreSQL.
+        Empty chunks are skipped. Returns the number of chunks indexed.
+        """
+        indexed = [
+            (idx, chunk) for idx, chunk in enumerate(chunks)
+            if chunk["content"].strip()
+        ]
+        if not indexed:
+            return 0
+
+        embeddings = await self.document_processor.generate_embeddings(
+            [chunk["content"] for _, chunk in indexed]
+        )
+
+        points = []
+        rows = []
+        for (idx, chunk), embedding in zip(indexed, embeddings):
+            # Create a unique vector ID (UUID required by Qdrant)
+            vector_id = str(uuid.uuid4())
+            metadata = chunk.get("metadata", {})
+            points.append({
+                "id": vector_id,
+                "vector": embedding,
+                "payload": self._payload(document_id, idx, chunk["content"], metadata, filename)
+            })
+            rows.append({
+                "chunk_index": idx,
+                "content": chunk["content"],
+                "vector_id": vector_id,
+                "metadata": metadata
+            })
+
+        await self.vector_store.add_vectors(collection_name, points)
+        await self.db_service.create_chunks(document_id, rows)
+        await self._index_document(document_id, collection_name, [row["content"] for row in rows], embeddings, filename)
+        if self.collection_router is not None:
+            await self.collection_router.add_vectors(collection_name, embeddings)
+
+        logger.debug(f"Indexed {len(points)} chunks of {document_id} into {collection_name}")
+        return len(points)
+
+    async def reembed_chunks(
+        self,
+        document_id: str,
+        collection_name: str,
+        chunks: List[Dict[str, Any]],
+        filename: Optional[str] = None
+    ) -> int:
+        """
+        Re-embed chunks already stored in PostgreSQL and overwrite their Qdrant points in place.
+        Vector IDs are reused, so the chunk table stays valid. Returns the number of chunks re-embedded.
+        """
+        chunks = [chunk for chunk in chunks if chunk["content"].strip() and chunk.get("vector_id")]
+        if not chunks:
+            return 0
+
+        embeddings = await self.document_processor.generate_embeddings(
+            [chunk["content"] for chunk in chunks]
+        )
+
+        points = [
+            {
+                "id": chunk["vector_id"],
+                "vector": embedding,
+                "payload": self._payload(
+                    document_id, chunk["chunk_index"], chunk["content"], chunk.get("metadata") or {}, filename
+                )
+            }
+            for chunk, embedding in zip(chunks, embeddings)
+        ]
+
+        await self.vector_store.add_vectors(collection_name, points)
+        await self._index_document(document_id, collection_name, [chunk["content"] for chunk in chunks], embeddings, filename)
+
+        logger.debug(f"Re-embedded {len(points)} chunks of {document_id} into {collection_name}")
+        return len(points)
+
+    async def _index_document(
+        self,
+        document_id: str,
+        collection_name: str,
+        contents: List[str],
+        embeddings: List[List[float]],
+        filename: Optional[str]
+    ):
+        """Refresh the document-level vector used by coarse-to-fine search"""
+        if self.document_index is not None:
+            await self.document_index.index_document(document_id, collection_name, contents, embeddings, filename)
+
+    @staticmethod
+    def _payload(
+        document_id: str,
+        chunk_index: int,
+        content: str,
+        metadata: Dict[str, Any],
+        filename: Optional[str]
+    ) -> Dict[str, Any]:
+        """
+        Qdrant payload of a chunk. It carries everything the query path needs
+        (content, metadata and the denormalized filename) so search hits can be served without PostgreSQL.
+        """
+        return {
+            "document_id": document_id,
+            "chunk_index": chunk_index,
+            "content": content,
+            "filename": filename or metadata.get("source_file"),
+            "metadata": metadata
+        }
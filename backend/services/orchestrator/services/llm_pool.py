@@ -0,0 +1,325 @@
+"""
+LLM Backend Pool - Route generations across several LLM endpoints
+Least-outstanding / throughput-aware routing, passive health ejection and optional hedging
+"""
+
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+from loguru import logger
+from prometheus_client import Counter, Gauge
+import asyncio
+import json
+import os
+import random
+import time
+
+from services.llm_service import LLMService
+
+
+# Rough characters-per-token ratio used to estimate throughput across providers
+CHARS_PER_TOKEN = 4
+
+LLM_BACKEND_REQUESTS = Counter(
+    "openrag_llm_backend_requests_total",
+    "Generations started per LLM backend by outcome",
+    ["backend", "result"]  # success, failure, cancelled
+)
+LLM_BACKEND_HEDGES = Counter(
+    "openrag_llm_backend_hedges_total",
+    "Generations duplicated to a second backend because the first token was late"
+)
+LLM_BACKEND_EJECTED = Gauge(
+    "openrag_llm_backend_ejected",
+    "1 while a backend is ejected from the pool after repeated failures",
+    ["backend"]
+)
+
+
+def default_concurrency(provider: str) -> int:
+    """Concurrent generations of one backend: LLM_CONCURRENCY_<PROVIDER>, else LLM_CONCURRENCY"""
+    return int(os.getenv(f"LLM_CONCURRENCY_{provider.upper()}", os.getenv("LLM_CONCURRENCY", "2")))
+
+
+class LLMBackend:
+    """One LLM endpoint of the pool along with its live routing statistics"""
+
+    def __init__(self, name: str, service: LLMService, weight: float = 1.0, concurrency: Optional[int] = None):
+        self.name = name
+        self.service = service
+        self.weight = weight
+        self.concurrency = concurrency or default_concurrency(service.provider)
+        self.outstanding = 0
+        self.tokens_per_second: Optional[float] = None
+        self.first_token_seconds: Optional[float] = None
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+    @property
+    def saturated(self) -> bool:
+        return self.outstanding >= self.concurrency
+
+    def record_success(self, chars: int, first_token_seconds: float, generation_seconds: float, alpha: float):
+        """Fold a finished generation into the moving averages"""
+        self.failures = 0
+        LLM_BACKEND_EJECTED.labels(backend=self.name).set(0)
+        self.first_token_seconds = self._ewma(self.first_token_seconds, first_token_seconds, alpha)
+        if generation_seconds > 0 and chars > 0:
+            rate = chars / CHARS_PER_TOKEN / generation_seconds
+            self.tokens_per_second = self._ewma(self.tokens_per_second, rate, alpha)
+
+    def record_failure(self, max_failures: int, eject_seconds: float):
+        """Eject the backend once it failed max_failures times in a row"""
+        self.failures += 1
+        if self.failures >= max_failures:
+            self.ejected_until = time.monotonic() + eject_seconds
+            LLM_BACKEND_EJECTED.labels(backend=self.name).set(1)
+            logger.warning(f"LLM backend {self.name} ejected for {eject_seconds:.0f}s after {self.failures} failures")
+
+    @staticmethod
+    def _ewma(current: Optional[float], sample: float, alpha: float) -> float:
+        return sample if current is None else alpha * sample + (1 - alpha) * current
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "provider": self.service.provider,
+            "model": self.service.model,
+            "healthy": self.healthy,
+            "concurrency": self.concurrency,
+            "outstanding": self.outstanding,
+            "tokens_per_second": self.tokens_per_second,
+            "first_token_seconds": self.first_token_seconds,
+            "consecutive_failures": self.failures
+        }
+
+
+class LLMBackendPool:
+    """
+    Drop-in replacement for LLMService that spreads generations over several backends.
+
+    Backends come from LLM_BACKENDS, a JSON list such as
+        [{"name": "gpu1", "provider": "ollama", "base_url": "http://gpu1:11434", "model": "llama3.1:8b"},
+         {"name": "cloud", "provider": "openai", "model": "gpt-4o-mini", "weight": 0.5}]
+    (api_key falls back to the provider's usual environment variable). Without LLM_BACKENDS
+    the pool holds the single backend described by LLM_PROVIDER / OLLAMA_HOST / LLM_MODEL.
+    Each backend runs up to "concurrency" generations (default LLM_CONCURRENCY_<PROVIDER>,
+    else LLM_CONCURRENCY); the pool's capacity, the scheduler's slot count, is their sum.
+
+    Routing picks the healthy backend with the lowest expected wait: (outstanding + 1)
+    divided by its moving-average tokens/sec and weight, among those below their concurrency. A backend failing
+    LLM_POOL_MAX_FAILURES times in a row is ejected for LLM_POOL_EJECT_SECONDS.
+    When LLM_HEDGE_AFTER_SECONDS is set, a generation whose first token has not arrived
+    in time is also started on a second backend and the first to answer wins.
+    """
+
+    def __init__(self, backends: Optional[List[LLMBackend]] = None):
+        self.backends = backends or self._backends_from_env()
+        self.max_failures = int(os.getenv("LLM_POOL_MAX_FAILURES", "3"))
+        self.eject_seconds = float(os.getenv("LLM_POOL_EJECT_SECONDS", "30"))
+        self.ewma_alpha = float(os.getenv("LLM_POOL_EWMA_ALPHA", "0.3"))
+        self.max_attempts = int(os.getenv("LLM_POOL_MAX_ATTEMPTS", "2"))
+        self.hedge_after = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "0"))  # 0 disables hedging
+
+    @staticmethod
+    def _backends_from_env() -> List[LLMBackend]:
+        config = os.getenv("LLM_BACKENDS")
+        if not config:
+            service = LLMService()
+            return [LLMBackend(service.provider, service)]
+
+        backends = []
+        for idx, entry in enumerate(json.loads(config)):
+            service = LLMService(
+                provider=entry.get("provider"),
+                model=entry.get("model"),
+                base_url=entry.get("base_url"),
+                api_key=entry.get("api_key")
+            )
+            name = entry.get("name") or f"{service.provider}-{idx}"
+            backends.append(LLMBackend(
+                name, service, float(entry.get("weight", 1.0)), entry.get("concurrency")
+            ))
+        if not backends:
+            raise ValueError("LLM_BACKENDS is empty")
+        return backends
+
+    # LLMService compatibility: callers (scheduler, caches, response metadata) read these
+
+    @property
+    def provider(self) -> str:
+        providers = {backend.service.provider for backend in self.backends}
+        return providers.pop() if len(providers) == 1 else "mixed"
+
+    @property
+    def model(self) -> str:
+        models = {backend.service.model for backend in self.backends}
+        return models.pop() if len(models) == 1 else "mixed"
+
+    @property
+    def capacity(self) -> int:
+        """Generations the whole pool runs at once"""
+        return sum(backend.concurrency for backend in self.backends)
+
+    def context_budget(self, query: str, system_prompt: Optional[str] = None) -> int:
+        """Context token budget that fits every backend of the pool"""
+        return min(backend.service.context_budget(query, system_prompt) for backend in self.backends)
+
+    def stats(self) -> Dict[str, Any]:
+        return {backend.name: backend.stats() for backend in self.backends}
+
+    def _pick(self, exclude: Tuple[LLMBackend, ...] = ()) -> Optional[LLMBackend]:
+        """Backend with the lowest expected wait, preferring healthy ones below their concurrency"""
+        candidates = [backend for backend in self.backends if backend not in exclude]
+        if not candidates:
+            return None
+        healthy = [backend for backend in candidates if backend.healthy]
+        if not healthy:
+            # Everything is ejected: try the one that has been out the longest rather than fail
+            return min(candidates, key=lambda backend: backend.ejected_until)
+        # Saturated backends only get work (retries, hedges) when every healthy one is
+        healthy = [backend for backend in healthy if not backend.saturated] or healthy
+
+        measured = [backend.tokens_per_second for backend in healthy if backend.tokens_per_second]
+        # Unmeasured backends are assumed as fast as the pool average so they get traffic
+        default_rate = sum(measured) / len(measured) if measured else 1.0
+
+        def expected_wait(backend: LLMBackend) -> float:
+            rate = (backend.tokens_per_second or default_rate) * backend.weight
+            return (backend.outstanding + 1) / rate
+
+        best = min(expected_wait(backend) for backend in healthy)
+        return random.choice([backend for backend in healthy if expected_wait(backend) == best])
+
+    async def generate_answer(
+        self,
+        query: str,
+        contexts: List[str],
+        system_prompt: Optional[str] = None
+    ) -> str:
+        """Generate a full answer on the best backend"""
+        parts = [token async for token in self.stream_answer(query, contexts, system_prompt)]
+        return "".join(parts).strip()
+
+    async def stream_answer(
+        self,
+        query: str,
+        contexts: List[str],
+        system_prompt: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream an answer from the best backend. Failures before the first token are retried
+        on another backend (up to LLM_POOL_MAX_ATTEMPTS); failures after it are raised.
+        """
+        attempt = await self._first_token(query, contexts, system_prompt)
+        backend, stream, first_token, started, first_token_at = attempt
+        chars = len(first_token)
+        result = "cancelled"
+        try:
+            if first_token:
+                yield first_token
+            async for token in stream:
+                chars += len(token)
+                yield token
+            result = "success"
+            backend.record_success(
+                chars, first_token_at - started, time.monotonic() - first_token_at, self.ewma_alpha
+            )
+        except Exception:
+            result = "failure"
+            backend.record_failure(self.max_failures, self.eject_seconds)
+            raise
+        finally:
+            backend.outstanding -= 1
+            LLM_BACKEND_REQUESTS.labels(backend=backend.name, result=result).inc()
+            await stream.aclose()
+
+    def _start(self, backend: LLMBackend, query: str, contexts: List[str], system_prompt: Optional[str]) -> Dict[str, Any]:
+        """Open a stream on a backend and start waiting for its first token"""
+        backend.outstanding += 1
+        stream = backend.service.stream_answer(query, contexts, system_prompt)
+        return {
+            "backend": backend,
+            "stream": stream,
+            "started": time.monotonic(),
+            "first": asyncio.ensure_future(stream.__anext__())
+        }
+
+    async def _abandon(self, attempt: Dict[str, Any], result: str):
+        """Stop an attempt that lost the race or failed"""
+        attempt["first"].cancel()
+        try:
+            await attempt["first"]
+        except BaseException:
+            pass
+        await attempt["stream"].aclose()
+        attempt["backend"].outstanding -= 1
+        LLM_BACKEND_REQUESTS.labels(backend=attempt["backend"].name, result=result).inc()
+
+    async def _first_token(
+        self,
+        query: str,
+        contexts: List[str],
+        system_prompt: Optional[str]
+    ) -> Tuple[LLMBackend, AsyncIterator[str], str, float, float]:
+        """
+        Race attempts until one produces its first token (or finishes empty).
+        Returns (backend, stream, first_token, started, first_token_at); the winner's
+        outstanding count is left incremented for the caller to release.
+        """
+        attempts = [self._start(self._pick(), query, contexts, system_prompt)]
+        tried = [attempts[0]["backend"]]
+        hedged = False
+        last_error: Optional[Exception] = None
+        try:
+            while attempts:
+                can_hedge = self.hedge_after > 0 and not hedged and len(self.backends) > 1
+                done, _ = await asyncio.wait(
+                    [attempt["first"] for attempt in attempts],
+                    timeout=self.hedge_after if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    hedged = True
+                    backup = self._pick(exclude=tuple(tried))
+                    if backup is not None and backup.healthy:
+                        LLM_BACKEND_HEDGES.inc()
+                        logger.info(f"First token late on {attempts[0]['backend'].name}, hedging to {backup.name}")
+                        attempts.append(self._start(backup, query, contexts, system_prompt))
+                        tried.append(backup)
+                    continue
+
+                for attempt in [attempt for attempt in attempts if attempt["first"] in done]:
+                    try:
+                        first_token = attempt["first"].result()
+                    except StopAsyncIteration:
+                        first_token = ""
+                    except Exception as e:
+                        last_error = e
+                        logger.warning(f"LLM backend {attempt['backend'].name} failed: {type(e).__name__}: {e}")
+                        attempt["backend"].record_failure(self.max_failures, self.eject_seconds)
+                        attempts.remove(attempt)
+                        await self._abandon(attempt, "failure")
+                        continue
+
+                    attempts.remove(attempt)
+                    for loser in attempts:
+                        await self._abandon(loser, "cancelled")
+                    attempts = []
+                    return (
+                        attempt["backend"], attempt["stream"], first_token,
+                        attempt["started"], time.monotonic()
+                    )
+
+                if not attempts and len(tried) < self.max_attempts:
+                    retry = self._pick(exclude=tuple(tried))
+                    if retry is not None:
+                        attempts.append(self._start(retry, query, contexts, system_prompt))
+                        tried.append(retry)
+
+            raise last_error or Exception("No LLM backend available")
+        finally:
+            for attempt in attempts:
+                await self._abandon(attempt, "cancelled")
@@ -0,0 +1,283 @@
+"""
+LLM Scheduler - Admission control in front of LLMService
+Concurrency slots per provider, priority queueing, load shedding and in-flight coalescing
+"""
+
+from typing import List, Dict, Any, Optional, AsyncIterator
+from loguru import logger
+from prometheus_client import Counter, Gauge, Histogram
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import time
+
+
+PRIORITIES = {"interactive": 0, "batch": 10}
+
+LLM_QUEUE_DEPTH = Gauge(
+    "openrag_llm_queue_depth",
+    "Requests waiting for an LLM slot",
+    ["provider"]
+)
+LLM_QUEUE_WAIT = Histogram(
+    "openrag_llm_queue_wait_seconds",
+    "Time spent waiting for an LLM slot",
+    ["provider", "priority"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60)
+)
+LLM_SHED = Counter(
+    "openrag_llm_shed_total",
+    "LLM requests rejected by the scheduler",
+    ["provider", "reason"]  # queue_full, queue_timeout, deadline
+)
+LLM_COALESCED = Counter(
+    "openrag_llm_coalesced_total",
+    "LLM requests served by an identical in-flight generation"
+)
+
+
+class SchedulerOverloaded(Exception):
+    """The LLM is saturated; the request was shed (maps to HTTP 503)"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class PrioritySlots:
+    """A semaphore whose waiters are served by priority, then arrival order"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.active = 0
+        self._waiters: List = []
+        self._queued: Dict[asyncio.Future, int] = {}
+        self._sequence = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._queued)
+
+    def enqueue(self, priority: int) -> asyncio.Future:
+        """Join the queue; the returned future resolves once the caller holds a slot"""
+        future = asyncio.get_running_loop().create_future()
+        if self.active < self.capacity and not self.waiting:
+            self.active += 1
+            future.set_result(None)
+        else:
+            self._queued[future] = priority
+            heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        return future
+
+    def promote(self, future: asyncio.Future, priority: int):
+        """Move a queued waiter up to a better priority (its old entry is skipped once served)"""
+        if future in self._queued and priority < self._queued[future]:
+            self._queued[future] = priority
+            heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+
+    def leave(self, future: asyncio.Future):
+        """Give up waiting; a slot handed over meanwhile is passed on"""
+        self._queued.pop(future, None)
+        if future.done() and not future.cancelled():
+            self.release()
+        else:
+            future.cancel()
+
+    def release(self):
+        """Give the slot to the best waiter, or free it"""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                del self._queued[future]
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+class LLMScheduler:
+    """
+    Wraps LLMService calls with:
+    - a fixed number of concurrent generations per provider (LLM_CONCURRENCY[_<PROVIDER>]);
+      for a backend pool, the sum of its backends' concurrency (the pool routes within it)
+    - a priority queue: interactive requests are served before batch ones
+    - load shedding with SchedulerOverloaded when the queue is full (LLM_MAX_QUEUE_SIZE),
+      a request waited too long for a slot (LLM_MAX_QUEUE_SECONDS) or its deadline passed
+      (LLM_DEADLINE_SECONDS, overridable per request)
+    - singleflight: identical prompts in flight share one generation, served at the best
+      priority and latest deadline of the callers waiting on it
+    """
+
+    def __init__(self, llm_service):
+        self.llm_service = llm_service
+        self.default_concurrency = int(os.getenv("LLM_CONCURRENCY", "2"))
+        self.max_queue_size = int(os.getenv("LLM_MAX_QUEUE_SIZE", "100"))
+        self.max_queue_seconds = float(os.getenv("LLM_MAX_QUEUE_SECONDS", "30"))
+        self.default_deadline = float(os.getenv("LLM_DEADLINE_SECONDS", "300"))
+        self._slots: Dict[str, PrioritySlots] = {}
+        self._inflight: Dict[str, Dict[str, Any]] = {}
+
+    def _slots_for(self, provider: str) -> PrioritySlots:
+        if provider not in self._slots:
+            capacity = getattr(self.llm_service, "capacity", None) or int(
+                os.getenv(f"LLM_CONCURRENCY_{provider.upper()}", self.default_concurrency)
+            )
+            self._slots[provider] = PrioritySlots(capacity)
+        return self._slots[provider]
+
+    def stats(self) -> Dict[str, Any]:
+        """Current slot usage and queue depth per provider"""
+        return {
+            "providers": {
+                provider: {"capacity": slots.capacity, "active": slots.active, "waiting": slots.waiting}
+                for provider, slots in self._slots.items()
+            },
+            "inflight_prompts": len(self._inflight)
+        }
+
+    async def _acquire(self, request: Dict[str, Any]) -> PrioritySlots:
+        """
+        Wait for a slot of the current provider or shed the request. request holds the
+        "priority" and "deadline" of the callers waiting on it, which _join may raise meanwhile.
+        """
+        provider = self.llm_service.provider
+        slots = self._slots_for(provider)
+
+        if slots.waiting >= self.max_queue_size:
+            LLM_SHED.labels(provider=provider, reason="queue_full").inc()
+            raise SchedulerOverloaded("queue_full", f"LLM queue is full ({slots.waiting} waiting)")
+        if request["deadline"] <= time.monotonic():
+            LLM_SHED.labels(provider=provider, reason="deadline").inc()
+            raise SchedulerOverloaded("deadline", "Request deadline passed before generation could start")
+
+        started = time.monotonic()
+        ticket = slots.enqueue(PRIORITIES[request["priority"]])
+        request["slots"], request["ticket"] = slots, ticket
+        LLM_QUEUE_DEPTH.labels(provider=provider).inc()
+        try:
+            while True:
+                queue_left = started + self.max_queue_seconds - time.monotonic()
+                deadline_left = request["deadline"] - time.monotonic()
+                if min(queue_left, deadline_left) <= 0:
+                    reason = "queue_timeout" if queue_left <= deadline_left else "deadline"
+                    LLM_SHED.labels(provider=provider, reason=reason).inc()
+                    raise SchedulerOverloaded(
+                        reason, f"No LLM slot available after {time.monotonic() - started:.1f}s"
+                    )
+                try:
+                    await asyncio.wait_for(asyncio.shield(ticket), min(queue_left, deadline_left))
+                    break
+                except asyncio.TimeoutError:
+                    pass  # a coalesced caller may have pushed the deadline back
+        except BaseException:
+            slots.leave(ticket)
+            raise
+        finally:
+            request.pop("ticket")
+            LLM_QUEUE_DEPTH.labels(provider=provider).dec()
+        LLM_QUEUE_WAIT.labels(provider=provider, priority=request["priority"]).observe(time.monotonic() - started)
+        return slots
+
+    def _check_priority(self, priority: str):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority} (expected one of {', '.join(PRIORITIES)})")
+
+    def _join(self, request: Dict[str, Any], priority: str, deadline: float):
+        """Serve a shared request at the best priority and latest deadline of its callers"""
+        if PRIORITIES[priority] < PRIORITIES[request["priority"]]:
+            request["priority"] = priority
+            if "ticket" in request:
+                request["slots"].promote(request["ticket"], PRIORITIES[priority])
+        request["deadline"] = max(request["deadline"], deadline)
+
+    def _deadline(self, deadline_seconds: Optional[float]) -> float:
+        return time.monotonic() + (deadline_seconds or self.default_deadline)
+
+    def _prompt_key(self, query: str, contexts: List[str], system_prompt: Optional[str]) -> str:
+        return hashlib.sha256(json.dumps(
+            [self.llm_service.provider, self.llm_service.model, system_prompt, query, contexts]
+        ).encode("utf-8")).hexdigest()
+
+    async def generate_answer(
+        self,
+        query: str,
+        contexts: List[str],
+        system_prompt: Optional[str] = None,
+        priority: str = "interactive",
+        deadline_seconds: Optional[float] = None
+    ) -> str:
+        """
+        LLMService.generate_answer under admission control.
+        Raises SchedulerOverloaded when the request is shed, ValueError on an unknown priority.
+        """
+        self._check_priority(priority)
+        deadline = self._deadline(deadline_seconds)
+        key = self._prompt_key(query, contexts, system_prompt)
+
+        entry = self._inflight.get(key)
+        if entry is None:
+            request = {"priority": priority, "deadline": deadline}
+            entry = {"waiters": 0, "request": request, "task": asyncio.create_task(
+                self._generate(query, contexts, system_prompt, request)
+            )}
+            self._inflight[key] = entry
+            entry["task"].add_done_callback(lambda _: self._forget(key, entry))
+        else:
+            LLM_COALESCED.inc()
+            logger.info("Coalescing with an identical in-flight LLM request")
+            self._join(entry["request"], priority, deadline)
+
+        entry["waiters"] += 1
+        try:
+            remaining = deadline - time.monotonic()
+            return await asyncio.wait_for(asyncio.shield(entry["task"]), max(remaining, 0))
+        except asyncio.TimeoutError:
+            LLM_SHED.labels(provider=self.llm_service.provider, reason="deadline").inc()
+            raise SchedulerOverloaded("deadline", "LLM generation exceeded the request deadline")
+        finally:
+            entry["waiters"] -= 1
+            # Nobody is interested any more (all callers disconnected or timed out); later
+            # identical requests must start their own generation, not join the cancelled one
+            if entry["waiters"] == 0 and not entry["task"].done():
+                self._forget(key, entry)
+                entry["task"].cancel()
+
+    def _forget(self, key: str, entry: Dict[str, Any]):
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+
+    async def _generate(
+        self,
+        query: str,
+        contexts: List[str],
+        system_prompt: Optional[str],
+        request: Dict[str, Any]
+    ) -> str:
+        slots = await self._acquire(request)
+        try:
+            return await self.llm_service.generate_answer(query, contexts, system_prompt)
+        finally:
+            slots.release()
+
+    async def stream_answer(
+        self,
+        query: str,
+        contexts: List[str],
+        system_prompt: Optional[str] = None,
+        priority: str = "interactive",
+        deadline_seconds: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        LLMService.stream_answer under admission control (streams are not coalesced).
+        Raises SchedulerOverloaded before the first token when the request is shed,
+        ValueError on an unknown priority.
+        """
+        self._check_priority(priority)
+        slots = await self._acquire({"priority": priority, "deadline": self._deadline(deadline_seconds)})
+        try:
+            async for token in self.llm_service.stream_answer(query, contexts, system_prompt):
+                yield token
+        finally:
+            slots.release()
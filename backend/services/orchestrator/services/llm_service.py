@@ -2,29 +2,40 @@
 LLM Service - Interface with language model providers
 """
 
-from typing import List, Optional
+from typing import List, Optional, Tuple, AsyncIterator
 from loguru import logger
 import os
 import httpx
 import json
 
+from services.context_packer import estimate_tokens
+
 
 class LLMService:
     """Handles interactions with configured LLM providers"""
     
-    def __init__(self):
-        self.provider = os.getenv("LLM_PROVIDER", "ollama")  # ollama, openai, anthropic
-        self.model = os.getenv("LLM_MODEL", "llama3.1:8b")
+    def __init__(
+        self,
+        provider: Optional[str] = None,
+        model: Optional[str] = None,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None
+    ):
+        """Arguments override the LLM_* environment settings (used by LLMBackendPool)"""
+        self.provider = provider or os.getenv("LLM_PROVIDER", "ollama")  # ollama, openai, anthropic
+        self.model = model or os.getenv("LLM_MODEL", "llama3.1:8b")
         self.temperature = float(os.getenv("LLM_TEMPERATURE", "0.3"))
         self.max_tokens = int(os.getenv("LLM_MAX_TOKENS", "4096"))
+        self.context_window = int(os.getenv("LLM_CONTEXT_WINDOW", "8192"))  # prompt + answer, in tokens
         
         if self.provider == "ollama":
-            self.base_url = os.getenv("OLLAMA_HOST", "http://ollama:11434")
+            self.base_url = base_url or os.getenv("OLLAMA_HOST", "http://ollama:11434")
         elif self.provider == "openai":
-            self.api_key = os.getenv("OPENAI_API_KEY")
-            self.base_url = "https://api.openai.com/v1"
+            self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+            self.base_url = base_url or "https://api.openai.com/v1"
         elif self.provider == "anthropic":
-            self.api_key = os.getenv("ANTHROPIC_API_KEY")
+            self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+            self.base_url = base_url or "https://api.anthropic.com/v1"
     
     async def generate_answer(
         self,
@@ -35,7 +46,65 @@ class LLMService:
         """
         Generate an answer from the query and retrieved context chunks.
         """
-        # Build the prompt
+        system_prompt, user_prompt = self._build_prompts(query, contexts, system_prompt)
+
+        try:
+            if self.provider == "ollama":
+                return await self._generate_with_ollama(system_prompt, user_prompt)
+            elif self.provider == "openai":
+                return await self._generate_with_openai(system_prompt, user_prompt)
+            elif self.provider == "anthropic":
+                return await self._generate_with_anthropic(system_prompt, user_prompt)
+            else:
+                raise ValueError(f"Unknown LLM provider: {self.provider}")
+                
+        except Exception as e:
+            logger.error(f"Error generating answer: {e}")
+            raise
+    
+    async def stream_answer(
+        self,
+        query: str,
+        contexts: List[str],
+        system_prompt: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Generate an answer like generate_answer, yielding text fragments as the provider produces them.
+        """
+        system_prompt, user_prompt = self._build_prompts(query, contexts, system_prompt)
+
+        if self.provider == "ollama":
+            stream = self._stream_with_ollama(system_prompt, user_prompt)
+        elif self.provider == "openai":
+            stream = self._stream_with_openai(system_prompt, user_prompt)
+        elif self.provider == "anthropic":
+            stream = self._stream_with_anthropic(system_prompt, user_prompt)
+        else:
+            raise ValueError(f"Unknown LLM provider: {self.provider}")
+
+        try:
+            async for token in stream:
+                yield token
+        except Exception as e:
+            logger.error(f"Error streaming answer: {type(e).__name__}: {e}")
+            raise
+    
+    def context_budget(self, query: str, system_prompt: Optional[str] = None) -> int:
+        """
+        Tokens left for retrieved contexts once the prompt template, the question
+        and the answer (max_tokens) are accounted for.
+        """
+        system_prompt, user_prompt = self._build_prompts(query, [], system_prompt)
+        prompt_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+        return max(self.context_window - self.max_tokens - prompt_tokens, 0)
+    
+    def _build_prompts(
+        self,
+        query: str,
+        contexts: List[str],
+        system_prompt: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """Build the system and user prompts"""
         if system_prompt is None:
             system_prompt = self._get_default_system_prompt()
         
@@ -56,19 +125,7 @@ Instructions:
 - If the context does not contain enough information, state that clearly
 - Answer the question directly without unnecessary preamble"""
 
-        try:
-            if self.provider == "ollama":
-                return await self._generate_with_ollama(system_prompt, user_prompt)
-            elif self.provider == "openai":
-                return await self._generate_with_openai(system_prompt, user_prompt)
-            elif self.provider == "anthropic":
-                return await self._generate_with_anthropic(system_prompt, user_prompt)
-            else:
-                raise ValueError(f"Unknown LLM provider: {self.provider}")
-                
-        except Exception as e:
-            logger.error(f"Error generating answer: {e}")
-            raise
+        return system_prompt, user_prompt
     
     async def _generate_with_ollama(self, system_prompt: str, user_prompt: str) -> str:
         """Generate a response using Ollama"""
@@ -84,7 +141,8 @@ Instructions:
                         "stream": False,
                         "options": {
                             "temperature": self.temperature,
-                            "num_predict": self.max_tokens
+                            "num_predict": self.max_tokens,
+                            "num_ctx": self.context_window
                         }
                     }
                 )
@@ -139,7 +197,7 @@ Instructions:
         try:
             async with httpx.AsyncClient(timeout=120.0) as client:
                 response = await client.post(
-                    "https://api.anthropic.com/v1/messages",
+                    f"{self.base_url}/messages",
                     headers={
                         "x-api-key": self.api_key,
                         "anthropic-version": "2023-06-01",
@@ -166,6 +224,112 @@ Instructions:
             logger.error(f"Error with Anthropic: {e}")
             raise
     
+    async def _stream_with_ollama(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        """Stream a response from Ollama (NDJSON, one object per token batch)"""
+        async with httpx.AsyncClient(timeout=httpx.Timeout(300.0, connect=10.0)) as client:
+            async with client.stream(
+                "POST",
+                f"{self.base_url}/api/generate",
+                json={
+                    "model": self.model,
+                    "prompt": f"{system_prompt}\n\n{user_prompt}",
+                    "stream": True,
+                    "options": {
+                        "temperature": self.temperature,
+                        "num_predict": self.max_tokens,
+                        "num_ctx": self.context_window
+                    }
+                }
+            ) as response:
+                if response.status_code != 200:
+                    raise Exception(f"Ollama API error: {(await response.aread()).decode()}")
+                
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise Exception(f"Ollama API error: {chunk['error']}")
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        break
+    
+    async def _stream_with_openai(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        """Stream a response from OpenAI (server-sent events)"""
+        async with httpx.AsyncClient(timeout=httpx.Timeout(120.0, connect=10.0)) as client:
+            async with client.stream(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": self.model,
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    "temperature": self.temperature,
+                    "max_tokens": self.max_tokens,
+                    "stream": True
+                }
+            ) as response:
+                if response.status_code != 200:
+                    raise Exception(f"OpenAI API error: {(await response.aread()).decode()}")
+                
+                async for data in self._sse_data(response):
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or [{}]
+                    text = choices[0].get("delta", {}).get("content")
+                    if text:
+                        yield text
+    
+    async def _stream_with_anthropic(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        """Stream a response from Anthropic (server-sent events)"""
+        async with httpx.AsyncClient(timeout=httpx.Timeout(120.0, connect=10.0)) as client:
+            async with client.stream(
+                "POST",
+                f"{self.base_url}/messages",
+                headers={
+                    "x-api-key": self.api_key,
+                    "anthropic-version": "2023-06-01",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": self.model,
+                    "system": system_prompt,
+                    "messages": [
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    "temperature": self.temperature,
+                    "max_tokens": self.max_tokens,
+                    "stream": True
+                }
+            ) as response:
+                if response.status_code != 200:
+                    raise Exception(f"Anthropic API error: {(await response.aread()).decode()}")
+                
+                async for data in self._sse_data(response):
+                    event = json.loads(data)
+                    if event.get("type") == "content_block_delta":
+                        text = event.get("delta", {}).get("text")
+                        if text:
+                            yield text
+                    elif event.get("type") == "message_stop":
+                        break
+                    elif event.get("type") == "error":
+                        raise Exception(f"Anthropic API error: {event.get('error')}")
+    
+    @staticmethod
+    async def _sse_data(response: httpx.Response) -> AsyncIterator[str]:
+        """Yield the data field of each server-sent event"""
+        async for line in response.aiter_lines():
+            if line.startswith("data:"):
+                yield line[5:].strip()
+    
     def _get_default_system_prompt(self) -> str:
         """Return the default system prompt"""
         return """You are a knowledgeable assistant. Answer questions accurately and helpfully based on the provided context.
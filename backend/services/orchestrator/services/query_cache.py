@@ -0,0 +1,126 @@
+"""
+Query Cache Service - Redis-backed cache of query responses
+"""
+
+from typing import Dict, Any, List, Optional
+from loguru import logger
+from prometheus_client import Counter
+import redis.asyncio as redis
+import hashlib
+import json
+import os
+import re
+
+
+CACHE_REQUESTS = Counter(
+    "openrag_query_cache_requests_total",
+    "Query cache lookups by result",
+    ["result"]  # hit, miss, bypass
+)
+CACHE_SAVED_SECONDS = Counter(
+    "openrag_query_cache_saved_seconds_total",
+    "Processing time saved by answering queries from the cache"
+)
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query"""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class QueryCache:
+    """
+    Caches full query responses in Redis.
+
+    Keys embed a per-collection version counter; ingestion and deletion bump the
+    counter, which makes every earlier entry of that collection unreachable (they
+    then expire through their TTL). Redis failures are logged and treated as misses.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+        self.ttl = int(os.getenv("QUERY_CACHE_TTL", "86400"))
+        self.prefix = os.getenv("QUERY_CACHE_PREFIX", "openrag")
+        self.client = redis.Redis(
+            host=os.getenv("REDIS_HOST", "redis"),
+            port=int(os.getenv("REDIS_PORT", "6379")),
+            db=int(os.getenv("REDIS_DB", "0")),
+            password=os.getenv("REDIS_PASSWORD") or None,
+            socket_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5")),
+            decode_responses=True
+        )
+
+    def _version_key(self, collection_name: str) -> str:
+        return f"{self.prefix}:collection_version:{collection_name}"
+
+    async def get_version(self, collection_name: str) -> int:
+        """Current version of a collection's content"""
+        value = await self.client.get(self._version_key(collection_name))
+        return int(value) if value else 0
+
+    async def bump_version(self, collection_name: str):
+        """Invalidate every cached response of a collection"""
+        try:
+            version = await self.client.incr(self._version_key(collection_name))
+            logger.debug(f"Collection {collection_name} now at cache version {version}")
+        except Exception as e:
+            logger.error(f"Error bumping cache version of {collection_name}: {e}")
+
+    async def get_versions(self, collection_names: List[str]) -> List[int]:
+        """Current versions of several collections, in one round trip"""
+        values = await self.client.mget([self._version_key(name) for name in collection_names])
+        return [int(value) if value else 0 for value in values]
+
+    async def make_key(self, collection_names: List[str], **params) -> Optional[str]:
+        """
+        Cache key for a query over one or more collections (routed or federated queries are
+        keyed on the collections actually searched). params must hold the normalized-able
+        "query" and every parameter that changes the response (max_results, use_llm,
+        filters, model, ...). Returns None if Redis is unavailable.
+        """
+        try:
+            versions = await self.get_versions(collection_names)
+        except Exception as e:
+            logger.warning(f"Query cache unavailable: {e}")
+            return None
+        params = {**params, "query": normalize_query(params["query"])}
+        if len(collection_names) > 1:
+            params["collections"] = dict(zip(collection_names, versions))
+        digest = hashlib.sha256(
+            json.dumps(params, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        if len(collection_names) > 1:
+            return f"{self.prefix}:query:federated:{digest}"
+        return f"{self.prefix}:query:{collection_names[0]}:v{versions[0]}:{digest}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached response for a key, recording hit/miss metrics"""
+        try:
+            value = await self.client.get(key)
+        except Exception as e:
+            logger.warning(f"Query cache read failed: {e}")
+            value = None
+
+        if value is None:
+            CACHE_REQUESTS.labels(result="miss").inc()
+            return None
+
+        entry = json.loads(value)
+        CACHE_REQUESTS.labels(result="hit").inc()
+        CACHE_SAVED_SECONDS.inc(entry.get("elapsed_seconds", 0.0))
+        return entry
+
+    async def set(self, key: str, response: Dict[str, Any], elapsed_seconds: float):
+        """Store a response along with the time it took to compute"""
+        try:
+            await self.client.set(
+                key,
+                json.dumps({**response, "elapsed_seconds": elapsed_seconds}, default=str),
+                ex=self.ttl
+            )
+        except Exception as e:
+            logger.warning(f"Query cache write failed: {e}")
+
+    @staticmethod
+    def record_bypass():
+        CACHE_REQUESTS.labels(result="bypass").inc()
@@ -0,0 +1,251 @@
+"""
+Reprocessing Engine
+Parallel, resumable reprocessing and re-embedding of stored documents
+"""
+
+from typing import Dict, Any, Optional
+from loguru import logger
+import asyncio
+import os
+
+from services.indexer import DocumentIndexer
+
+
+DEFAULT_COLLECTION = "documents_embeddings"
+
+
+class ReprocessingEngine:
+    """
+    Walks the documents table with keyset pagination and reprocesses each page
+    with a bounded number of concurrent workers.
+
+    Progress is checkpointed in processing_jobs after every page, so an interrupted
+    run can be resumed from its job ID without redoing finished pages.
+
+    With bulk_load, every collection written to is put in bulk-load mode when first
+    touched (HNSW indexing deferred, unacknowledged parallel upserts). At the end, indexing
+    is restored and the job stays running in the "optimizing" phase until Qdrant has
+    built the indexes; a failed run restores indexing without waiting.
+    """
+
+    def __init__(
+        self,
+        db_service,
+        storage,
+        document_processor,
+        vector_store,
+        concurrency: Optional[int] = None,
+        page_size: Optional[int] = None,
+        query_cache=None,
+        document_index=None,
+        collection_router=None
+    ):
+        self.db_service = db_service
+        self.storage = storage
+        self.document_processor = document_processor
+        self.vector_store = vector_store
+        self.query_cache = query_cache
+        self.indexer = DocumentIndexer(db_service, document_processor, vector_store, document_index, collection_router)
+        self.bucket_name = os.getenv("MINIO_BUCKET_NAME", "documents")
+        self.concurrency = concurrency or int(os.getenv("REPROCESS_CONCURRENCY", "4"))
+        self.page_size = page_size or int(os.getenv("REPROCESS_PAGE_SIZE", "200"))
+        self._bulk_lock = asyncio.Lock()
+
+    async def run(
+        self,
+        status: Optional[str] = "uploaded",
+        collection_id: Optional[str] = None,
+        target_collection: Optional[str] = None,
+        reembed_only: bool = False,
+        job_id: Optional[str] = None,
+        bulk_load: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Reprocess every matching document.
+
+        Args:
+            status: Only documents with this status (None for all)
+            collection_id: Only documents of this collection (None for all)
+            target_collection: Qdrant collection to write to (defaults to each document's collection)
+            reembed_only: Re-embed chunk text from document_chunks instead of downloading and parsing
+            job_id: Resume an earlier job; its stored options and cursor take precedence
+            bulk_load: Defer Qdrant index building until every document is written
+
+        Returns the final job state (counters and cursor).
+        """
+        if job_id:
+            job = await self.db_service.get_processing_job(job_id)
+            if not job:
+                raise ValueError(f"Processing job not found: {job_id}")
+            state = job.get("metadata") or {}
+            state.setdefault("bulk_load", False)
+            state.setdefault("bulk_collections", {})
+            state["phase"] = "indexing"
+            logger.info(f"Resuming job {job_id} after document {state.get('cursor')}")
+        else:
+            state = {
+                "status_filter": status,
+                "collection_filter": collection_id,
+                "target_collection": target_collection,
+                "reembed_only": reembed_only,
+                "bulk_load": bulk_load,
+                "bulk_collections": {},  # collection -> indexing_threshold to restore
+                "phase": "indexing",
+                "cursor": None,
+                "processed": 0,
+                "failed": 0,
+                "skipped": 0,
+                "total": await self.db_service.count_documents(
+                    collection_id=collection_id, status=status
+                )
+            }
+            job_id = await self.db_service.create_processing_job(
+                job_type="reembedding" if reembed_only else "reprocessing",
+                metadata=state
+            )
+            logger.info(f"Created job {job_id} for {state['total']} documents")
+
+        await self.db_service.update_processing_job(job_id, status="running")
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def worker(doc: Dict[str, Any]) -> str:
+            async with semaphore:
+                return await self._process_one(doc, state)
+
+        try:
+            while True:
+                page = await self.db_service.list_documents_after(
+                    after_id=state["cursor"],
+                    collection_id=state["collection_filter"],
+                    status=state["status_filter"],
+                    limit=self.page_size
+                )
+                if not page:
+                    break
+
+                outcomes = await asyncio.gather(*(worker(doc) for doc in page))
+                for outcome in outcomes:
+                    state[outcome] += 1
+                await self._invalidate_cache(page, state)
+
+                state["cursor"] = str(page[-1]["id"])
+                done = state["processed"] + state["failed"] + state["skipped"]
+                await self.db_service.update_processing_job(
+                    job_id,
+                    progress=min(100, int(100 * done / state["total"])) if state["total"] else 100,
+                    metadata=state
+                )
+                logger.info(
+                    f"Job {job_id}: {done}/{state['total']} documents "
+                    f"({state['processed']} ok, {state['failed']} failed, {state['skipped']} skipped)"
+                )
+
+            await self._finish_bulk_load(job_id, state)
+            await self.db_service.update_processing_job(
+                job_id, status="completed", progress=100, metadata=state
+            )
+        except BaseException as e:
+            # Leave the cursor at the last finished page so the job can be resumed
+            await self._finish_bulk_load(job_id, state, wait=False)
+            await self.db_service.update_processing_job(
+                job_id, status="failed", error_message=str(e) or type(e).__name__, metadata=state
+            )
+            raise
+
+        return {"job_id": job_id, **state}
+
+    def _collection_for(self, doc: Dict[str, Any], state: Dict[str, Any]) -> str:
+        """Qdrant collection a document is written to"""
+        return state["target_collection"] or doc.get("collection_name") or DEFAULT_COLLECTION
+
+    async def _begin_bulk_load(self, collection_name: str, state: Dict[str, Any]):
+        """Put a collection in bulk-load mode the first time a document is written to it"""
+        async with self._bulk_lock:
+            if collection_name in self.vector_store.bulk_loads:
+                return
+            previous = await asyncio.to_thread(self.vector_store.begin_bulk_load, collection_name)
+            # A resumed job keeps the threshold recorded before indexing was first disabled
+            threshold = state["bulk_collections"].setdefault(collection_name, previous)
+            # Kept in collections.metadata like POST /collections/{name}/bulk-load, so a restart
+            # shows the collection in bulk-load mode and finishing it restores this threshold
+            await self.db_service.set_bulk_load(collection_name, threshold)
+
+    async def _finish_bulk_load(self, job_id: str, state: Dict[str, Any], wait: bool = True):
+        """Restore indexing of the bulk-loaded collections and, with wait, report the optimization"""
+        if not state["bulk_collections"]:
+            return
+        state["phase"] = "optimizing" if wait else "restoring"
+        state["optimization"] = {}
+        for collection_name, threshold in state["bulk_collections"].items():
+            async def report(status: Dict[str, Any], name: str = collection_name):
+                state["optimization"][name] = dict(status)
+                await self.db_service.update_processing_job(job_id, metadata=state)
+            try:
+                await self.vector_store.finish_bulk_load(collection_name, threshold, wait=wait, on_progress=report)
+                await self.db_service.clear_bulk_load(collection_name)
+            except Exception as e:
+                if collection_name not in self.vector_store.bulk_loads:
+                    # Indexing was restored, only the optimization wait failed
+                    await self.db_service.clear_bulk_load(collection_name)
+                if wait:
+                    raise
+                logger.error(f"Indexing of {collection_name} not restored, finish its bulk load again: {e}")
+        state["phase"] = "done"
+
+    async def _invalidate_cache(self, page, state: Dict[str, Any]):
+        """Bump the query cache version of every collection touched by a page"""
+        if self.query_cache is None:
+            return
+        for collection_name in {self._collection_for(doc, state) for doc in page}:
+            await self.query_cache.bump_version(collection_name)
+
+    async def _process_one(self, doc: Dict[str, Any], state: Dict[str, Any]) -> str:
+        """Process one document; returns the counter to increment"""
+        document_id = str(doc["id"])
+        collection_name = self._collection_for(doc, state)
+        try:
+            if state["bulk_load"]:
+                await self._begin_bulk_load(collection_name, state)
+            if state["reembed_only"]:
+                chunks = await self.db_service.get_document_chunks(document_id)
+                if not chunks:
+                    logger.warning(f"No stored chunks for {document_id}, skipping")
+                    return "skipped"
+                count = await self.indexer.reembed_chunks(
+                    document_id, collection_name, chunks, filename=doc["filename"]
+                )
+            else:
+                count = await self._reprocess_document(doc, collection_name)
+
+            logger.debug(f"{doc['filename']}: {count} chunks -> {collection_name}")
+            return "processed"
+
+        except Exception as e:
+            logger.error(f"Error reprocessing {document_id} ({doc['filename']}): {e}")
+            if not state["reembed_only"]:
+                await self.db_service.update_document_status(document_id, "failed")
+            return "failed"
+
+    async def _reprocess_document(self, doc: Dict[str, Any], collection_name: str) -> int:
+        """Download, parse, chunk and index a document, replacing any previous chunks"""
+        document_id = str(doc["id"])
+        await self.db_service.update_document_status(document_id, "processing")
+
+        file_data = await self.storage.download_file(
+            bucket_name=self.bucket_name,
+            object_key=doc["minio_object_key"]
+        )
+        chunks = await self.document_processor.process_document(
+            file_data=file_data,
+            filename=doc["filename"]
+        )
+
+        # Drop the chunks of an earlier run so they do not linger as orphans
+        await self.vector_store.delete_document_vectors(collection_name, [document_id])
+        await self.db_service.delete_document_chunks(document_id)
+
+        count = await self.indexer.index_chunks(
+            document_id, collection_name, chunks, filename=doc["filename"]
+        )
+        await self.db_service.update_document_status(document_id, "processed")
+        return count
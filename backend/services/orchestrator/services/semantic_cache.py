@@ -0,0 +1,184 @@
+"""
+Semantic Cache Service - Reuse answers of past queries with similar embeddings
+"""
+
+from typing import List, Dict, Any, Optional
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue,
+    Range, FilterSelector, PayloadSchemaType
+)
+from loguru import logger
+from prometheus_client import Counter
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+
+
+SEMANTIC_CACHE_REQUESTS = Counter(
+    "openrag_semantic_cache_requests_total",
+    "Semantic answer cache lookups by result",
+    ["result"]  # hit, miss
+)
+
+
+class SemanticCache:
+    """
+    Small Qdrant index of past query embeddings with their answers and sources.
+
+    Entries are scoped by the collections searched and by the parameters that shape an
+    answer (filters, result count, LLM model). They only match while the content version
+    of those collections (see QueryCache) is unchanged and their TTL has not elapsed.
+    """
+
+    def __init__(self, vector_store, query_cache):
+        self.client = vector_store.client
+        self.collections = vector_store.collections
+        self.query_cache = query_cache
+        self.enabled = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+        self.collection_name = os.getenv("SEMANTIC_CACHE_COLLECTION", "openrag_semantic_cache")
+        vector_store.internal_collections.add(self.collection_name)
+        self.threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+        self.ttl = int(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+        self.purge_every = int(os.getenv("SEMANTIC_CACHE_PURGE_EVERY", "100"))
+        self._vector_size: Optional[int] = None
+        self._writes = 0
+
+    @staticmethod
+    def scope(collection_names: List[str], **params) -> str:
+        """Identifier of the collections and answer-shaping parameters an entry is valid for"""
+        return hashlib.sha256(
+            json.dumps({"collections": sorted(collection_names), **params}, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+    def _filter(self, scope: str, version: int) -> Filter:
+        return Filter(must=[
+            FieldCondition(key="scope", match=MatchValue(value=scope)),
+            FieldCondition(key="version", match=MatchValue(value=version)),
+            FieldCondition(key="created_at", range=Range(gte=time.time() - self.ttl)),
+        ])
+
+    def _ensure_collection(self, vector_size: int):
+        """Create the cache collection, recreating it if the embedding dimension changed"""
+        if self._vector_size == vector_size:
+            return
+        if self.collection_name not in self.collections:
+            # Another process may have created it since the registry was loaded
+            self.collections.invalidate()
+        if self.collection_name in self.collections:
+            params = self.client.get_collection(self.collection_name).config.params.vectors
+            if params.size == vector_size:
+                self._vector_size = vector_size
+                return
+            logger.warning(f"Embedding dimension changed, recreating {self.collection_name}")
+            self.client.delete_collection(self.collection_name)
+            self.collections.discard(self.collection_name)
+
+        self.client.create_collection(
+            collection_name=self.collection_name,
+            vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE)
+        )
+        self.collections.add(self.collection_name)
+        for field, schema in (
+            ("scope", PayloadSchemaType.KEYWORD),
+            ("version", PayloadSchemaType.INTEGER),
+            ("created_at", PayloadSchemaType.FLOAT),
+        ):
+            self.client.create_payload_index(self.collection_name, field_name=field, field_schema=schema)
+        self._vector_size = vector_size
+        logger.info(f"Semantic cache collection created: {self.collection_name}")
+
+    async def version(self, collection_names: List[str]) -> Optional[int]:
+        """
+        Content version of the collections searched (the sum of their counters, which only
+        grow), read before retrieval: the answer is looked up and stored under it, so one built
+        from contexts older than a concurrent ingest or delete is never filed under the newer
+        version. None if unavailable (cache skipped).
+        """
+        try:
+            return sum(await self.query_cache.get_versions(collection_names))
+        except Exception as e:
+            logger.warning(f"Semantic cache version unavailable: {e}")
+            return None
+
+    async def lookup(
+        self,
+        version: Optional[int],
+        scope: str,
+        query_vector: List[float]
+    ) -> Optional[Dict[str, Any]]:
+        """Best cached answer above the similarity threshold for a content version, or None"""
+        if version is None:
+            SEMANTIC_CACHE_REQUESTS.labels(result="miss").inc()
+            return None
+        try:
+            await asyncio.to_thread(self._ensure_collection, len(query_vector))
+            hits = await asyncio.to_thread(
+                self.client.search,
+                collection_name=self.collection_name,
+                query_vector=query_vector,
+                query_filter=self._filter(scope, version),
+                limit=1,
+                score_threshold=self.threshold
+            )
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            hits = []
+
+        if not hits:
+            SEMANTIC_CACHE_REQUESTS.labels(result="miss").inc()
+            return None
+
+        SEMANTIC_CACHE_REQUESTS.labels(result="hit").inc()
+        entry = dict(hits[0].payload)
+        entry["similarity"] = hits[0].score
+        return entry
+
+    async def store(
+        self,
+        version: Optional[int],
+        scope: str,
+        query: str,
+        query_vector: List[float],
+        response: Dict[str, Any]
+    ):
+        """Remember the answer to a query under the content version it was looked up with"""
+        if version is None:
+            return
+        try:
+            await asyncio.to_thread(self._ensure_collection, len(query_vector))
+            await asyncio.to_thread(
+                self.client.upsert,
+                collection_name=self.collection_name,
+                points=[PointStruct(
+                    id=str(uuid.uuid4()),
+                    vector=query_vector,
+                    payload={
+                        "scope": scope,
+                        "version": version,
+                        "created_at": time.time(),
+                        "query": query,
+                        "answer": response["answer"],
+                        "sources": response["sources"],
+                        "metadata": response["metadata"],
+                        "highlights": response.get("highlights")
+                    }
+                )]
+            )
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                await self.purge_expired()
+        except Exception as e:
+            logger.warning(f"Semantic cache write failed: {e}")
+
+    async def purge_expired(self):
+        """Delete entries older than the TTL"""
+        await asyncio.to_thread(
+            self.client.delete,
+            collection_name=self.collection_name,
+            points_selector=FilterSelector(filter=Filter(must=[
+                FieldCondition(key="created_at", range=Range(lt=time.time() - self.ttl))
+            ]))
+        )
@@ -2,12 +2,16 @@
 MinIO Object Storage Service
 """
 
-from typing import Optional
+from typing import List, Optional
 from minio import Minio
 from minio.error import S3Error
+from minio.deleteobjects import DeleteObject
 from loguru import logger
 import os
 import io
+import asyncio
+
+from services.collection_registry import CollectionRegistry
 
 
 class MinIOStorage:
@@ -26,15 +30,23 @@ class MinIOStorage:
             secure=self.secure
         )
         
+        # Buckets known to exist, so uploads do not check first
+        self.buckets = CollectionRegistry(
+            lambda: {bucket.name: bucket.name for bucket in self.client.list_buckets()}
+        )
+        
         # Ensure default bucket exists
         self._ensure_bucket(os.getenv("MINIO_BUCKET_NAME", "documents"))
     
     def _ensure_bucket(self, bucket_name: str):
         """Create the bucket if it does not already exist"""
         try:
+            if bucket_name in self.buckets:
+                return
             if not self.client.bucket_exists(bucket_name):
                 self.client.make_bucket(bucket_name)
                 logger.info(f"Bucket created: {bucket_name}")
+            self.buckets.add(bucket_name)
         except S3Error as e:
             logger.error(f"Error ensuring bucket: {e}")
             raise
@@ -49,17 +61,15 @@ class MinIOStorage:
         """Upload a file to MinIO"""
         try:
             self._ensure_bucket(bucket_name)
-            
-            file_stream = io.BytesIO(file_data)
-            file_size = len(file_data)
-            
-            self.client.put_object(
-                bucket_name=bucket_name,
-                object_name=object_key,
-                data=file_stream,
-                length=file_size,
-                content_type=content_type or "application/octet-stream"
-            )
+            try:
+                self._put_object(bucket_name, object_key, file_data, content_type)
+            except S3Error as e:
+                if e.code != "NoSuchBucket":
+                    raise
+                # Deleted since it was registered: create it again
+                self.buckets.discard(bucket_name)
+                self._ensure_bucket(bucket_name)
+                self._put_object(bucket_name, object_key, file_data, content_type)
             
             logger.info(f"File uploaded: {object_key} to {bucket_name}")
             
@@ -67,13 +77,19 @@ class MinIOStorage:
             logger.error(f"Error uploading file: {e}")
             raise
     
+    def _put_object(self, bucket_name: str, object_key: str, file_data: bytes, content_type: Optional[str]):
+        self.client.put_object(
+            bucket_name=bucket_name,
+            object_name=object_key,
+            data=io.BytesIO(file_data),
+            length=len(file_data),
+            content_type=content_type or "application/octet-stream"
+        )
+    
     async def download_file(self, bucket_name: str, object_key: str) -> bytes:
         """Download a file from MinIO"""
         try:
-            response = self.client.get_object(bucket_name, object_key)
-            data = response.read()
-            response.close()
-            response.release_conn()
+            data = await asyncio.to_thread(self._read_object, bucket_name, object_key)
             
             logger.debug(f"File downloaded: {object_key} from {bucket_name}")
             return data
@@ -82,6 +98,15 @@ class MinIOStorage:
             logger.error(f"Error downloading file: {e}")
             raise
     
+    def _read_object(self, bucket_name: str, object_key: str) -> bytes:
+        """Blocking read of a whole object (run in a worker thread)"""
+        response = self.client.get_object(bucket_name, object_key)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+    
     async def delete_file(self, bucket_name: str, object_key: str):
         """Delete a file from MinIO"""
         try:
@@ -91,6 +116,23 @@ class MinIOStorage:
             logger.error(f"Error deleting file: {e}")
             raise
     
+    async def delete_files(self, bucket_name: str, object_keys: List[str]):
+        """Delete many objects with MinIO multi-object delete"""
+        if not object_keys:
+            return
+        try:
+            errors = await asyncio.to_thread(
+                lambda: list(self.client.remove_objects(
+                    bucket_name, [DeleteObject(key) for key in object_keys]
+                ))
+            )
+            for error in errors:
+                logger.error(f"Error deleting {error.name}: {error.message}")
+            logger.info(f"{len(object_keys) - len(errors)} files deleted from {bucket_name}")
+        except S3Error as e:
+            logger.error(f"Error deleting files: {e}")
+            raise
+    
     def file_exists(self, bucket_name: str, object_key: str) -> bool:
         """Check whether a file exists in the bucket"""
         try:
@@ -2,12 +2,109 @@
 Service Vector Store - Interface avec Qdrant
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Awaitable
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
+from qdrant_client.models import (
+    Distance, VectorParams, HnswConfigDiff, PointStruct, Filter, FieldCondition, MatchValue, MatchAny, MatchExcept,
+    Range, FilterSelector, PayloadSchemaType, SearchRequest, SearchParams,
+    CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation,
+    CollectionParamsDiff, VectorParamsDiff, Disabled, OptimizersConfigDiff, CollectionStatus
+)
 from loguru import logger
+from datetime import datetime
+import json
 import os
 import httpx
+import asyncio
+import threading
+import time
+
+from services.index_profiles import (
+    normalize_profile, quantization_config, hnsw_config, search_params, estimate_memory
+)
+from services.collection_registry import CollectionRegistry
+
+
+# Physical collections are named "<logical>__v<timestamp>" and served through an alias "<logical>"
+VERSION_SEPARATOR = "__v"
+
+# Version holding the data of a legacy collection (created before aliases), sorted before any other
+LEGACY_VERSION = "0" * 14
+
+# Companion collection "<logical>__documents" holding one vector per document (coarse-to-fine search)
+DOCUMENT_INDEX_SUFFIX = "__documents"
+
+# Payload field stamped with the write time of every point, so copies can catch up with updates
+UPDATED_AT_FIELD = "updated_at"
+
+# Payload fields every collection is indexed on
+DEFAULT_PAYLOAD_INDEXES = {
+    "document_id": PayloadSchemaType.KEYWORD,
+    "chunk_index": PayloadSchemaType.INTEGER,
+    "metadata.source_file": PayloadSchemaType.KEYWORD,
+    UPDATED_AT_FIELD: PayloadSchemaType.FLOAT,
+}
+
+# Top-level payload fields; any other filter key is looked up under "metadata."
+TOP_LEVEL_PAYLOAD_FIELDS = {"document_id", "chunk_index", "content", "filename", "metadata", UPDATED_AT_FIELD}
+
+# Writes stamped up to this many seconds before a copy started are copied again (clock skew
+# between processes writing to the same collection)
+CATCH_UP_MARGIN_SECONDS = 5.0
+
+# Catch-up passes of a copy before giving up on a collection that keeps being written to
+MAX_CATCH_UP_PASSES = 5
+
+RANGE_OPERATORS = {"gt", "gte", "lt", "lte"}
+
+# Qdrant's default optimizer indexing_threshold (KB), restored after a bulk load if none was recorded
+DEFAULT_INDEXING_THRESHOLD = 20000
+
+
+def build_filter(metadata_filter: Optional[Dict[str, Any]]) -> Optional[Filter]:
+    """
+    Translate a metadata_filter into a Qdrant filter (all conditions must match).
+    
+    Supported forms, per key:
+        "key": value                         exact match (str, int, bool)
+        "key": [v1, v2]                      match any of the values
+        "key": {"any": [...]}                match any of the values
+        "key": {"except": [...]}             match none of the values
+        "key": {"gte": 1, "lt": 5}           numeric range (gt, gte, lt, lte)
+    
+    Keys other than the top-level payload fields are looked up under "metadata.",
+    so "source_file" and "metadata.source_file" are equivalent.
+    Raises ValueError on unsupported values.
+    """
+    if not metadata_filter:
+        return None
+    
+    conditions = []
+    for key, value in metadata_filter.items():
+        if key.split(".")[0] not in TOP_LEVEL_PAYLOAD_FIELDS:
+            key = f"metadata.{key}"
+        
+        if isinstance(value, dict):
+            unknown = set(value) - RANGE_OPERATORS - {"any", "except"}
+            if unknown:
+                raise ValueError(f"Unsupported filter operators for {key}: {sorted(unknown)}")
+            if "any" in value:
+                conditions.append(FieldCondition(key=key, match=MatchAny(any=list(value["any"]))))
+            if "except" in value:
+                conditions.append(FieldCondition(key=key, match=MatchExcept(**{"except": list(value["except"])})))
+            bounds = {op: value[op] for op in RANGE_OPERATORS if op in value}
+            if bounds:
+                conditions.append(FieldCondition(key=key, range=Range(**bounds)))
+        elif isinstance(value, list):
+            conditions.append(FieldCondition(key=key, match=MatchAny(any=value)))
+        elif isinstance(value, (str, int, bool)):
+            conditions.append(FieldCondition(key=key, match=MatchValue(value=value)))
+        elif isinstance(value, float):
+            conditions.append(FieldCondition(key=key, range=Range(gte=value, lte=value)))
+        else:
+            raise ValueError(f"Unsupported filter value for {key}: {value!r}")
+    
+    return Filter(must=conditions)
 
 
 class VectorStoreService:
@@ -17,78 +114,381 @@ class VectorStoreService:
         self.host = os.getenv("QDRANT_HOST", "qdrant")
         self.port = int(os.getenv("QDRANT_PORT", "6333"))
         self.client = QdrantClient(host=self.host, port=self.port)
-        self.vector_size = int(os.getenv("QDRANT_VECTOR_SIZE", "384"))  # all-MiniLM-L6-v2
+        # New collections take the dimension of the embedding model (GET /model/info);
+        # QDRANT_VECTOR_SIZE, if set, must agree with it
+        configured_size = os.getenv("QDRANT_VECTOR_SIZE")
+        self.configured_vector_size = int(configured_size) if configured_size else None
         self.embedding_service_url = os.getenv("EMBEDDING_SERVICE_URL", "http://embedding-service:8002")
+        self._model_dimensions: Dict[str, int] = {}
+        # Existing collections and aliases, and the vector dimension of the logical collections written to
+        self.collections = CollectionRegistry(self._load_collections)
+        self.dimensions: Dict[str, int] = {}
+        # Latest migration of each collection (also recorded in processing_jobs, see main)
+        self.migrations: Dict[str, Dict[str, Any]] = {}
+        self._version_lock = threading.Lock()
+        self._last_version = ""
+        self.payload_indexes = {**DEFAULT_PAYLOAD_INDEXES, **self._declared_payload_indexes()}
+        self._indexed_collections = set()
+        # Service collections (caches, companion indexes) that are not document collections
+        self.internal_collections = set()
+        # Index profiles (quantization, on-disk storage, HNSW) by logical collection, stored in
+        # collections.metadata and loaded at startup; others use QDRANT_INDEX_PROFILE (JSON)
+        self.default_index_profile = normalize_profile(json.loads(os.getenv("QDRANT_INDEX_PROFILE") or "{}"))
+        self.index_profiles: Dict[str, Dict[str, Any]] = {}
+        # Collections in bulk-load mode -> indexing_threshold to restore (see begin_bulk_load)
+        self.bulk_loads: Dict[str, Optional[int]] = {}
+        self.bulk_batch_size = int(os.getenv("BULK_LOAD_BATCH_SIZE", "1024"))
+        self.bulk_parallelism = int(os.getenv("BULK_LOAD_PARALLELISM", "4"))
+        self.bulk_poll_interval = float(os.getenv("BULK_LOAD_POLL_SECONDS", "2"))
+        self.bulk_timeout = float(os.getenv("BULK_LOAD_TIMEOUT_SECONDS", "3600"))
         
-        # Initialize default collection
-        self._ensure_collection("documents_embeddings")
+        # Initialize default collection (on first write instead if the embedding service is not up yet)
+        try:
+            self._ensure_collection("documents_embeddings")
+        except httpx.HTTPError as e:
+            logger.warning(f"Default collection not created yet, embedding model dimension unknown: {e}")
     
     def _ensure_collection(self, collection_name: str):
-        """Create the Qdrant collection if it does not already exist"""
+        """
+        Create the Qdrant collection if it does not already exist.
+        New collections are created as a versioned physical collection behind an alias
+        named collection_name, so they can later be migrated without downtime.
+        Known collections are answered from the registry, without a round trip to Qdrant.
+        """
+        if collection_name in self._indexed_collections:
+            return
         try:
-            collections = self.client.get_collections().collections
-            collection_names = [c.name for c in collections]
+            if collection_name not in self.collections:
+                # Another process may have created it since the registry was loaded
+                self.collections.invalidate()
+            if collection_name in self.collections:
+                # Collections created before payload indexing get their indexes once
+                self._ensure_payload_indexes(self.resolve_collection(collection_name))
+                self.dimensions[collection_name] = self.vector_size_of(collection_name)
+                self._indexed_collections.add(collection_name)
+                return
             
-            if collection_name not in collection_names:
-                logger.info(f"Creating collection: {collection_name}")
-                self.client.create_collection(
-                    collection_name=collection_name,
-                    vectors_config=VectorParams(
-                        size=self.vector_size,
-                        distance=Distance.COSINE
+            logger.info(f"Creating collection: {collection_name}")
+            dimension = self.embedding_dimension()
+            physical_name = self._versioned_name(collection_name)
+            self._create_physical_collection(physical_name, dimension, self.index_profile(collection_name))
+            self._ensure_payload_indexes(physical_name)
+            self.client.update_collection_aliases(
+                change_aliases_operations=[
+                    CreateAliasOperation(
+                        create_alias=CreateAlias(collection_name=physical_name, alias_name=collection_name)
                     )
-                )
-                logger.info(f"Collection created: {collection_name}")
+                ]
+            )
+            self.collections.add(collection_name, physical_name)
+            self.dimensions[collection_name] = dimension
+            self._indexed_collections.add(collection_name)
+            logger.info(f"Collection created: {collection_name} -> {physical_name} ({dimension}-d)")
         except Exception as e:
             logger.error(f"Error ensuring collection: {e}")
             raise
     
+    def _load_collections(self) -> Dict[str, str]:
+        """Physical collections (mapped to themselves) and aliases (mapped to their collection)"""
+        names = {c.name: c.name for c in self.client.get_collections().collections}
+        names.update({a.alias_name: a.collection_name for a in self.client.get_aliases().aliases})
+        return names
+    
+    def forget_collection(self, collection_name: str):
+        """Check a collection against Qdrant again on next write (e.g. after it was deleted elsewhere)"""
+        self._indexed_collections.discard(collection_name)
+        self.dimensions.pop(collection_name, None)
+        self.collections.invalidate()
+    
+    def embedding_dimension(self, embedding_service_url: Optional[str] = None) -> int:
+        """
+        Vector dimension of the model behind an embedding service (the configured one by default),
+        read once from its /model/info. Raises ValueError if QDRANT_VECTOR_SIZE disagrees with
+        the configured service.
+        """
+        url = embedding_service_url or self.embedding_service_url
+        if url not in self._model_dimensions:
+            response = httpx.get(f"{url}/model/info", timeout=30.0)
+            response.raise_for_status()
+            info = response.json()
+            dimension = int(info["dimension"])
+            if url == self.embedding_service_url and self.configured_vector_size not in (None, dimension):
+                raise ValueError(
+                    f"QDRANT_VECTOR_SIZE is {self.configured_vector_size} but the embedding model "
+                    f"{info.get('model_name')} produces {dimension}-d vectors"
+                )
+            self._model_dimensions[url] = dimension
+        return self._model_dimensions[url]
+    
+    def dimension_mismatches(self) -> Dict[str, int]:
+        """Document collections whose vector dimension differs from the embedding model's"""
+        dimension = self.embedding_dimension()
+        mismatches = {}
+        for collection_name in self.list_document_collections():
+            size = self.vector_size_of(collection_name)
+            self.dimensions[collection_name] = size
+            if size != dimension:
+                mismatches[collection_name] = size
+        return mismatches
+    
+    def _check_dimension(self, collection_name: str, vectors: List[List[float]]):
+        """Refuse vectors of another dimension than the collection's before sending them"""
+        dimension = self.dimensions.get(collection_name)
+        sizes = {len(vector) for vector in vectors}
+        if dimension is not None and sizes - {dimension}:
+            raise ValueError(
+                f"{collection_name} holds {dimension}-d vectors, got {', '.join(map(str, sorted(sizes)))}-d ones; "
+                f"migrate it to the current embedding model (POST /collections/{collection_name}/migrations)"
+            )
+    
+    def _create_physical_collection(
+        self,
+        physical_name: str,
+        vector_size: int,
+        profile: Optional[Dict[str, Any]] = None
+    ):
+        """Create a concrete Qdrant collection with the storage and HNSW settings of an index profile"""
+        profile = profile or self.default_index_profile
+        self.client.create_collection(
+            collection_name=physical_name,
+            vectors_config=VectorParams(
+                size=vector_size,
+                distance=Distance.COSINE,
+                on_disk=profile["on_disk"] or None
+            ),
+            hnsw_config=hnsw_config(profile),
+            quantization_config=quantization_config(profile),
+            on_disk_payload=profile["on_disk_payload"] or None
+        )
+        self.collections.add(physical_name)
+    
+    def index_profile(self, collection_name: str) -> Dict[str, Any]:
+        """Index profile of a logical collection"""
+        return self.index_profiles.get(collection_name, self.default_index_profile)
+    
+    def apply_index_profile(self, collection_name: str, profile: Dict[str, Any]) -> bool:
+        """
+        Use profile for collection_name: new versions are created with it and, if the collection
+        exists, its live version is updated in place (Qdrant re-quantizes and rebuilds the HNSW
+        graph in the background). Returns whether a live collection was updated.
+        """
+        self.index_profiles[collection_name] = profile
+        if collection_name not in self.collections:
+            return False
+        physical_name = self.resolve_collection(collection_name)
+        self.client.update_collection(
+            collection_name=physical_name,
+            vectors_config={"": VectorParamsDiff(on_disk=profile["on_disk"])},
+            hnsw_config=HnswConfigDiff(m=profile["hnsw_m"] or 16, ef_construct=profile["hnsw_ef_construct"] or 100),
+            quantization_config=quantization_config(profile) or Disabled.DISABLED,
+            collection_params=CollectionParamsDiff(on_disk_payload=profile["on_disk_payload"])
+        )
+        logger.info(f"Index profile applied to {collection_name} ({physical_name}): {profile}")
+        return True
+    
+    def index_status(self, collection_name: str) -> Dict[str, Any]:
+        """Live storage settings of a collection and the RAM its vectors take under its profile"""
+        info = self.client.get_collection(self.resolve_collection(collection_name))
+        vectors = info.config.params.vectors
+        points = info.points_count or 0
+        profile = self.index_profile(collection_name)
+        return {
+            "status": info.status.value,
+            "points": points,
+            "dimension": vectors.size,
+            "on_disk": bool(vectors.on_disk),
+            "on_disk_payload": bool(info.config.params.on_disk_payload),
+            "hnsw": {"m": info.config.hnsw_config.m, "ef_construct": info.config.hnsw_config.ef_construct},
+            "quantization": info.config.quantization_config.model_dump() if info.config.quantization_config else None,
+            "estimated_ram_bytes": estimate_memory(profile, points, vectors.size),
+            "estimated_ram_bytes_unquantized": estimate_memory(normalize_profile({}), points, vectors.size)
+        }
+    
+    def begin_bulk_load(self, collection_name: str) -> Optional[int]:
+        """
+        Put a collection in bulk-load mode: indexing_threshold 0 stops Qdrant from building
+        the HNSW graph while points stream in (no repeated segment optimization), and
+        add_vectors stops waiting for each upsert. Returns the indexing threshold to restore.
+        Searches still work meanwhile, on unindexed segments (exact scan, slower).
+        """
+        if collection_name in self.bulk_loads:
+            return self.bulk_loads[collection_name]
+        self._ensure_collection(collection_name)
+        physical_name = self.resolve_collection(collection_name)
+        previous = self.client.get_collection(physical_name).config.optimizer_config.indexing_threshold
+        if previous == 0:
+            # Already bulk-loading (left so by an earlier process): the original threshold is unknown here
+            previous = None
+        self.client.update_collection(
+            collection_name=physical_name,
+            optimizers_config=OptimizersConfigDiff(indexing_threshold=0)
+        )
+        self.bulk_loads[collection_name] = previous
+        logger.info(f"Bulk load started for {collection_name} (indexing deferred, threshold was {previous})")
+        return previous
+    
+    async def finish_bulk_load(
+        self,
+        collection_name: str,
+        indexing_threshold: Optional[int] = None,
+        wait: bool = True,
+        on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Leave bulk-load mode: restore the indexing threshold (the recorded one unless given)
+        and, with wait, poll until Qdrant has finished optimizing (collection status green),
+        reporting each poll to on_progress. Raises TimeoutError after BULK_LOAD_TIMEOUT_SECONDS.
+        """
+        recorded = self.bulk_loads.get(collection_name)
+        threshold = next(
+            value for value in (indexing_threshold, recorded, DEFAULT_INDEXING_THRESHOLD) if value is not None
+        )
+        physical_name = await asyncio.to_thread(self.resolve_collection, collection_name)
+        await asyncio.to_thread(
+            self.client.update_collection,
+            collection_name=physical_name,
+            optimizers_config=OptimizersConfigDiff(indexing_threshold=threshold)
+        )
+        self.bulk_loads.pop(collection_name, None)
+        logger.info(f"Bulk load of {collection_name} finished, indexing threshold restored to {threshold}")
+        
+        started = time.monotonic()
+        status = {"indexing_threshold": threshold}
+        while wait:
+            # The optimizer may not have picked up the change yet: poll before the first check
+            await asyncio.sleep(self.bulk_poll_interval)
+            info = await asyncio.to_thread(self.client.get_collection, physical_name)
+            status.update({
+                "status": info.status.value,
+                "points": info.points_count,
+                "indexed_vectors": info.indexed_vectors_count,
+                "segments": info.segments_count,
+                "seconds": round(time.monotonic() - started, 1)
+            })
+            if on_progress:
+                await on_progress(status)
+            if info.status == CollectionStatus.GREEN:
+                logger.info(f"{collection_name} optimized in {status['seconds']} s")
+                break
+            if info.status == CollectionStatus.RED:
+                raise RuntimeError(f"Optimization of {collection_name} failed: {info.optimizer_status}")
+            if time.monotonic() - started > self.bulk_timeout:
+                raise TimeoutError(f"{collection_name} still optimizing after {self.bulk_timeout:.0f} s")
+        return status
+    
+    def _search_params(self, collection_name: str, options: Optional[Dict[str, Any]] = None) -> Optional[SearchParams]:
+        """Search parameters of a collection with per-request overrides ({"hnsw_ef", "exact"})"""
+        options = options or {}
+        return search_params(self.index_profile(collection_name), options.get("hnsw_ef"), options.get("exact"))
+    
+    @staticmethod
+    def _declared_payload_indexes() -> Dict[str, PayloadSchemaType]:
+        """
+        Extra payload indexes declared in QDRANT_PAYLOAD_INDEXES,
+        e.g. "metadata.year:integer,metadata.language:keyword"
+        """
+        declared = {}
+        for item in os.getenv("QDRANT_PAYLOAD_INDEXES", "").split(","):
+            if not item.strip():
+                continue
+            field, _, schema = item.strip().partition(":")
+            declared[field] = PayloadSchemaType(schema or "keyword")
+        return declared
+    
+    def _ensure_payload_indexes(
+        self,
+        physical_name: str,
+        extra: Optional[Dict[str, PayloadSchemaType]] = None
+    ):
+        """Create the configured payload indexes that a collection is missing"""
+        existing = self.client.get_collection(physical_name).payload_schema or {}
+        for field, schema in {**self.payload_indexes, **(extra or {})}.items():
+            if field not in existing:
+                self.client.create_payload_index(
+                    collection_name=physical_name,
+                    field_name=field,
+                    field_schema=schema
+                )
+                logger.info(f"Payload index created: {physical_name}.{field} ({schema.value})")
+    
+    def create_payload_index(self, collection_name: str, field: str, schema: str = "keyword"):
+        """Index an additional payload field of a collection (admin-declared)"""
+        if field.split(".")[0] not in TOP_LEVEL_PAYLOAD_FIELDS:
+            field = f"metadata.{field}"
+        self._ensure_payload_indexes(
+            self.resolve_collection(collection_name), extra={field: PayloadSchemaType(schema)}
+        )
+        return field
+    
+    def list_payload_indexes(self, collection_name: str) -> Dict[str, Any]:
+        """Indexed payload fields of a collection with their types and point counts"""
+        schema = self.client.get_collection(self.resolve_collection(collection_name)).payload_schema or {}
+        return {
+            field: {"type": info.data_type.value, "points": info.points}
+            for field, info in schema.items()
+        }
+    
+    def create_version(self, collection_name: str, vector_size: int) -> str:
+        """Create a new, empty physical version of a logical collection (not served until swapped in)"""
+        physical_name = self._versioned_name(collection_name)
+        self._create_physical_collection(physical_name, vector_size, self.index_profile(collection_name))
+        self._ensure_payload_indexes(physical_name)
+        return physical_name
+    
+    def vector_size_of(self, collection_name: str) -> int:
+        """Vector dimension of an existing collection"""
+        return self.client.get_collection(self.resolve_collection(collection_name)).config.params.vectors.size
+    
+    def _versioned_name(self, collection_name: str) -> str:
+        """
+        Physical collection name for a new version of a logical collection: a microsecond
+        timestamp, strictly increasing within the process so that two versions never collide
+        """
+        with self._version_lock:
+            stamp = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+            if stamp <= self._last_version:
+                stamp = str(int(self._last_version) + 1)
+            self._last_version = stamp
+        return f"{collection_name}{VERSION_SEPARATOR}{stamp}"
+    
     async def search(
         self,
         query: str,
         collection_name: str,
         limit: int = 5,
         score_threshold: float = 0.7,
-        metadata_filter: Optional[Dict[str, Any]] = None
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        query_vector: Optional[List[float]] = None,
+        with_vectors: bool = False,
+        search_options: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """
         Recherche vectorielle dans Qdrant
+        Pass query_vector to reuse an embedding already computed for the query.
+        with_vectors adds each hit's "vector" (for diversification).
+        search_options overrides the collection's search ef or asks for an exact search.
         """
         try:
             # Generate query embedding
-            query_vector = await self._generate_query_embedding(query)
-            
-            # Build filter if provided
-            query_filter = None
-            if metadata_filter:
-                conditions = []
-                for key, value in metadata_filter.items():
-                    conditions.append(
-                        FieldCondition(
-                            key=key,
-                            match=MatchValue(value=value)
-                        )
-                    )
-                query_filter = Filter(must=conditions)
+            if query_vector is None:
+                query_vector = await self._generate_query_embedding(query)
+            
+            # Build filter if provided (payload indexes keep filtered search on the HNSW path)
+            query_filter = build_filter(metadata_filter)
             
             # Search
-            search_results = self.client.search(
+            search_results = await asyncio.to_thread(
+                self.client.search,
                 collection_name=collection_name,
                 query_vector=query_vector,
                 limit=limit,
                 score_threshold=score_threshold,
-                query_filter=query_filter
+                query_filter=query_filter,
+                with_vectors=with_vectors,
+                search_params=self._search_params(collection_name, search_options)
             )
             
-            # Format results
-            results = []
-            for hit in search_results:
-                results.append({
-                    "id": str(hit.id),
-                    "score": hit.score,
-                    "payload": hit.payload
-                })
-            
+            results = self._format_hits(search_results)
             logger.info(f"Found {len(results)} results for query")
             return results
             
@@ -96,6 +496,110 @@ class VectorStoreService:
             logger.error(f"Error searching in vector store: {e}")
             raise
     
+    async def search_groups(
+        self,
+        collection_name: str,
+        query_vector: List[float],
+        limit: int = 5,
+        group_size: int = 1,
+        group_by: str = "document_id",
+        score_threshold: float = 0.0,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        search_options: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Best hits with at most group_size per value of group_by (a keyword payload index),
+        in one Qdrant group search. Returns up to limit hits, best first.
+        """
+        try:
+            groups = await asyncio.to_thread(
+                self.client.search_groups,
+                collection_name=collection_name,
+                query_vector=query_vector,
+                group_by=group_by,
+                limit=limit,  # groups; enough for limit hits even with one hit per group
+                group_size=group_size,
+                score_threshold=score_threshold,
+                query_filter=build_filter(metadata_filter),
+                search_params=self._search_params(collection_name, search_options),
+                with_payload=True
+            )
+            hits = sorted(
+                (hit for group in groups.groups for hit in group.hits),
+                key=lambda hit: hit.score,
+                reverse=True
+            )
+            return self._format_hits(hits[:limit])
+            
+        except Exception as e:
+            logger.error(f"Error in grouped search: {e}")
+            raise
+    
+    async def search_batch(
+        self,
+        collection_name: str,
+        query_vectors: List[List[float]],
+        limit: int = 5,
+        score_threshold: float = 0.0,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        batch_size: int = 256,
+        metadata_filters: Optional[List[Optional[Dict[str, Any]]]] = None,
+        with_vectors: bool = False,
+        search_options: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search many query vectors with the same parameters in one Qdrant request per
+        batch_size queries. Returns one result list per vector, in order.
+        metadata_filters gives each query its own filter instead of metadata_filter.
+        """
+        if metadata_filters is not None:
+            query_filters = [build_filter(f) for f in metadata_filters]
+        else:
+            query_filters = [build_filter(metadata_filter)] * len(query_vectors)
+        params = self._search_params(collection_name, search_options)
+        results: List[List[Dict[str, Any]]] = []
+        try:
+            for start in range(0, len(query_vectors), batch_size):
+                requests = [
+                    SearchRequest(
+                        vector=vector,
+                        filter=query_filter,
+                        limit=limit,
+                        score_threshold=score_threshold,
+                        with_payload=True,
+                        with_vector=with_vectors,
+                        params=params
+                    )
+                    for vector, query_filter in zip(
+                        query_vectors[start:start + batch_size], query_filters[start:start + batch_size]
+                    )
+                ]
+                responses = await asyncio.to_thread(
+                    self.client.search_batch,
+                    collection_name=collection_name,
+                    requests=requests
+                )
+                results.extend(self._format_hits(hits) for hits in responses)
+            
+            logger.info(f"Batch search of {len(query_vectors)} queries in {collection_name}")
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error in batch search: {e}")
+            raise
+    
+    @staticmethod
+    def _format_hits(hits) -> List[Dict[str, Any]]:
+        return [
+            {
+                "id": str(hit.id),
+                "score": hit.score,
+                "payload": hit.payload,
+                **({"vector": hit.vector} if hit.vector is not None else {})
+            }
+            for hit in hits
+        ]
+    
     async def add_vector(
         self,
         collection_name: str,
@@ -106,11 +610,12 @@ class VectorStoreService:
         """Ajoute un vecteur dans la collection"""
         try:
             self._ensure_collection(collection_name)
+            self._check_dimension(collection_name, [vector])
             
             point = PointStruct(
                 id=vector_id,
                 vector=vector,
-                payload=payload
+                payload={**payload, UPDATED_AT_FIELD: time.time()}
             )
             
             self.client.upsert(
@@ -122,6 +627,73 @@ class VectorStoreService:
             
         except Exception as e:
             logger.error(f"Error adding vector: {e}")
+            self.forget_collection(collection_name)
+            raise
+    
+    async def add_vectors(
+        self,
+        collection_name: str,
+        points: List[Dict[str, Any]],
+        batch_size: int = 256
+    ):
+        """
+        Upsert many vectors at once.
+        Each point is a dict with "id", "vector" and "payload" keys; payloads are stored
+        stamped with their write time (UPDATED_AT_FIELD).
+        Collections in bulk-load mode get larger batches, sent in parallel without waiting
+        for Qdrant to apply them.
+        """
+        try:
+            self._ensure_collection(collection_name)
+            self._check_dimension(collection_name, [p["vector"] for p in points])
+            bulk = collection_name in self.bulk_loads
+            if bulk:
+                batch_size = self.bulk_batch_size
+            semaphore = asyncio.Semaphore(self.bulk_parallelism if bulk else 1)
+            
+            async def upsert(batch_points: List[Dict[str, Any]]):
+                updated_at = time.time()
+                batch = [
+                    PointStruct(id=p["id"], vector=p["vector"], payload={**p["payload"], UPDATED_AT_FIELD: updated_at})
+                    for p in batch_points
+                ]
+                async with semaphore:
+                    # The Qdrant client is synchronous; keep the event loop free for other documents
+                    await asyncio.to_thread(
+                        self.client.upsert,
+                        collection_name=collection_name,
+                        points=batch,
+                        wait=not bulk
+                    )
+            
+            await asyncio.gather(*(
+                upsert(points[start:start + batch_size]) for start in range(0, len(points), batch_size)
+            ))
+            
+            logger.debug(f"{len(points)} vectors upserted into {collection_name}")
+            
+        except Exception as e:
+            logger.error(f"Error adding vectors: {e}")
+            self.forget_collection(collection_name)
+            raise
+    
+    async def delete_document_vectors(self, collection_name: str, document_ids: List[str]):
+        """Delete every vector of the given documents with one filter-based delete"""
+        if not document_ids:
+            return
+        try:
+            await asyncio.to_thread(
+                self.client.delete,
+                collection_name=collection_name,
+                points_selector=FilterSelector(
+                    filter=Filter(must=[
+                        FieldCondition(key="document_id", match=MatchAny(any=[str(d) for d in document_ids]))
+                    ])
+                )
+            )
+            logger.debug(f"Vectors of {len(document_ids)} documents deleted from {collection_name}")
+        except Exception as e:
+            logger.error(f"Error deleting document vectors: {e}")
             raise
     
     async def delete_vector(self, collection_name: str, vector_id: str):
@@ -136,6 +708,33 @@ class VectorStoreService:
             logger.error(f"Error deleting vector: {e}")
             raise
     
+    async def embed_query(self, query: str) -> List[float]:
+        """Embedding of a query, for callers that reuse it across several lookups"""
+        return await self._generate_query_embedding(query)
+    
+    async def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embeddings of many queries in one call to the embedding service batch endpoint"""
+        try:
+            async with httpx.AsyncClient(timeout=120.0) as client:
+                response = await client.post(
+                    f"{self.embedding_service_url}/embed/batch",
+                    json={"texts": queries}
+                )
+                
+                if response.status_code != 200:
+                    raise Exception(f"Embedding service error: {response.text}")
+                
+                result = response.json()
+                if result["count"] != len(queries):
+                    raise Exception(
+                        f"Embedding service returned {result['count']} embeddings for {len(queries)} queries"
+                    )
+                return result["embeddings"]
+                
+        except Exception as e:
+            logger.error(f"Error generating query embeddings: {e}")
+            raise
+    
     async def _generate_query_embedding(self, query: str) -> List[float]:
         """Generate a query embedding via the embedding service"""
         try:
@@ -163,3 +762,406 @@ class VectorStoreService:
         except Exception as e:
             logger.error(f"Qdrant health check failed: {e}")
             raise
+    
+    # ============================================
+    # Zero-downtime migrations (shadow collection + alias swap)
+    # ============================================
+    
+    def list_document_collections(self) -> List[str]:
+        """
+        Logical document collections: aliases plus unversioned legacy collections,
+        minus internal ones and per-document companion collections
+        """
+        return sorted(
+            name for name in self.collections.names() - self.internal_collections
+            if VERSION_SEPARATOR not in name and not name.endswith(DOCUMENT_INDEX_SUFFIX)
+        )
+    
+    def resolve_collection(self, collection_name: str) -> str:
+        """Return the physical collection an alias points to (or the name itself)"""
+        return self.collections.resolve(collection_name)
+    
+    def list_versions(self, collection_name: str) -> List[str]:
+        """Physical versions of a logical collection, oldest first"""
+        prefix = f"{collection_name}{VERSION_SEPARATOR}"
+        return sorted(name for name in self.collections.names() if name.startswith(prefix))
+    
+    def prepare_migration(
+        self,
+        collection_name: str,
+        vector_size: Optional[int] = None,
+        embedding_service_url: Optional[str] = None,
+        auto_swap: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Validate and register a migration of a collection into a shadow collection, to be run
+        by run_migration. Blocking (Qdrant and /model/info calls): run it in a worker thread.
+        The shadow takes the dimension of the model behind embedding_service_url (/model/info);
+        a vector_size that disagrees with it is refused. Raises ValueError if the collection
+        does not exist or a migration of it is already running.
+        """
+        current = self.migrations.get(collection_name)
+        if current and current["status"] in ("pending", "building", "validating"):
+            raise ValueError(f"A migration is already running for {collection_name}")
+        
+        self.collections.invalidate()
+        live_name = self.resolve_collection(collection_name)
+        if live_name not in self.collections:
+            raise ValueError(f"Collection not found: {collection_name}")
+        model_dimension = self.embedding_dimension(embedding_service_url)
+        if vector_size and vector_size != model_dimension:
+            raise ValueError(
+                f"vector_size is {vector_size} but the embedding model of "
+                f"{embedding_service_url or self.embedding_service_url} produces {model_dimension}-d vectors"
+            )
+        
+        state = {
+            "collection": collection_name,
+            "source": live_name,
+            "shadow": self._versioned_name(collection_name),
+            "status": "pending",
+            "vector_size": model_dimension,
+            "embedding_service_url": embedding_service_url or self.embedding_service_url,
+            "total": self.client.count(collection_name=live_name, exact=True).count,
+            "copied": 0,
+            "skipped": 0,
+            "auto_swap": auto_swap,
+            "started_at": datetime.utcnow().isoformat(),
+            "finished_at": None,
+            "error": None
+        }
+        self.migrations[collection_name] = state
+        return state
+    
+    def migration_status(self, collection_name: str) -> Optional[Dict[str, Any]]:
+        """Progress of the latest migration of a collection"""
+        state = self.migrations.get(collection_name)
+        if state is None:
+            return None
+        status = dict(state)
+        status["progress"] = (
+            round(100 * (state["copied"] + state["skipped"]) / state["total"], 1)
+            if state["total"] else 100.0
+        )
+        return status
+    
+    async def run_migration(
+        self,
+        state: Dict[str, Any],
+        batch_size: int = 256,
+        on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        on_swap: Optional[Callable[[], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Run a prepared migration: every point of the live collection is re-embedded from its
+        stored payload content and upserted into the shadow collection with the same point IDs,
+        then the points written, updated or deleted during the copy are copied again.
+        Once the point counts match, the alias is switched atomically (unless auto_swap is False)
+        and on_swap is awaited. The old collection is kept for rollback. A legacy collection
+        (created before aliases were used) is first moved behind an alias, see adopt_legacy.
+        on_progress gets the status after every batch and phase change. Returns the final
+        status (never raises).
+        """
+        shadow = state["shadow"]
+        embedding_url = state["embedding_service_url"]
+        
+        async def report():
+            if on_progress:
+                await on_progress(self.migration_status(state["collection"]))
+        
+        try:
+            state["status"] = "building"
+            await report()
+            if state["source"] == state["collection"]:
+                state["source"] = await asyncio.to_thread(self.adopt_legacy, state["collection"], batch_size)
+                await report()
+            source = state["source"]
+            logger.info(f"Migration started: {source} -> {shadow} ({state['total']} points)")
+            await asyncio.to_thread(
+                self._create_physical_collection, shadow, state["vector_size"], self.index_profile(state["collection"])
+            )
+            live_schema = (await asyncio.to_thread(self.client.get_collection, source)).payload_schema or {}
+            await asyncio.to_thread(
+                self._ensure_payload_indexes,
+                shadow,
+                {field: PayloadSchemaType(info.data_type.value) for field, info in live_schema.items()}
+            )
+            
+            copied_ids = set()
+            skipped_ids = set()
+            since = time.time() - CATCH_UP_MARGIN_SECONDS
+            offset = None
+            while True:
+                points, offset = await asyncio.to_thread(
+                    self.client.scroll,
+                    collection_name=source,
+                    limit=batch_size,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=False
+                )
+                await self._copy_points(points, shadow, embedding_url, copied_ids, skipped_ids)
+                state["copied"], state["skipped"] = len(copied_ids), len(skipped_ids)
+                await report()
+                if offset is None:
+                    break
+            
+            # Catch up with the writes, updates and deletes that hit the live collection during the copy
+            state["status"] = "validating"
+            await report()
+            for _ in range(MAX_CATCH_UP_PASSES):
+                pass_started = time.time() - CATCH_UP_MARGIN_SECONDS
+                changed = await asyncio.to_thread(self._changed_since, source, since, batch_size)
+                live_ids = await self._scroll_ids(source, batch_size)
+                # Points written without an update stamp (e.g. by a process not stamping them yet)
+                unseen = list(live_ids - copied_ids - skipped_ids - {str(p.id) for p in changed})
+                for start in range(0, len(unseen), batch_size):
+                    changed += await asyncio.to_thread(
+                        self.client.retrieve,
+                        collection_name=source,
+                        ids=unseen[start:start + batch_size],
+                        with_payload=True
+                    )
+                for start in range(0, len(changed), batch_size):
+                    await self._copy_points(changed[start:start + batch_size], shadow, embedding_url, copied_ids, skipped_ids)
+                extra = list(copied_ids - live_ids)
+                if extra:
+                    await asyncio.to_thread(self.client.delete, collection_name=shadow, points_selector=extra)
+                    copied_ids -= set(extra)
+                skipped_ids &= live_ids
+                since = pass_started
+                if not changed and not extra:
+                    break
+            state["total"] = len(live_ids)
+            state["copied"], state["skipped"] = len(copied_ids), len(skipped_ids)
+            
+            shadow_count = (await asyncio.to_thread(self.client.count, collection_name=shadow, exact=True)).count
+            expected = len(live_ids) - state["skipped"]
+            if shadow_count != expected:
+                raise RuntimeError(
+                    f"Point count mismatch: shadow has {shadow_count}, expected {expected}"
+                )
+            
+            if state["auto_swap"]:
+                await asyncio.to_thread(self.swap_alias, state["collection"], shadow)
+                state["status"] = "completed"
+                if on_swap:
+                    await on_swap()
+            else:
+                state["status"] = "ready"
+            logger.info(f"Migration {source} -> {shadow} {state['status']}")
+            
+        except Exception as e:
+            state["status"] = "failed"
+            state["error"] = str(e)
+            logger.error(f"Migration {state['source']} -> {shadow} failed: {e}")
+        finally:
+            state["finished_at"] = datetime.utcnow().isoformat()
+        return self.migration_status(state["collection"])
+    
+    async def _copy_points(self, points, shadow: str, embedding_url: str, copied_ids: set, skipped_ids: set):
+        """Re-embed a batch of points from their payload content and upsert them into the shadow"""
+        to_embed = []
+        emptied = []
+        for point in points:
+            if (point.payload or {}).get("content", "").strip():
+                to_embed.append(point)
+                skipped_ids.discard(str(point.id))
+            else:
+                skipped_ids.add(str(point.id))
+                if str(point.id) in copied_ids:
+                    emptied.append(point.id)
+        if emptied:
+            await asyncio.to_thread(self.client.delete, collection_name=shadow, points_selector=emptied)
+            copied_ids.difference_update(str(i) for i in emptied)
+        if not to_embed:
+            return
+        
+        vectors = await self._embed_batch([p.payload["content"] for p in to_embed], embedding_url)
+        await asyncio.to_thread(
+            self.client.upsert,
+            collection_name=shadow,
+            points=[
+                PointStruct(id=p.id, vector=vector, payload=p.payload)
+                for p, vector in zip(to_embed, vectors)
+            ]
+        )
+        copied_ids.update(str(p.id) for p in to_embed)
+    
+    async def _scroll_ids(self, collection_name: str, batch_size: int) -> set:
+        """All point IDs of a collection"""
+        ids = set()
+        offset = None
+        while True:
+            points, offset = await asyncio.to_thread(
+                self.client.scroll,
+                collection_name=collection_name,
+                limit=batch_size * 4,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False
+            )
+            ids.update(str(p.id) for p in points)
+            if offset is None:
+                return ids
+    
+    def _changed_since(self, collection_name: str, since: float, batch_size: int, with_vectors: bool = False) -> list:
+        """Points of a collection written or updated since a time (UPDATED_AT_FIELD)"""
+        changed = []
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection_name,
+                scroll_filter=Filter(must=[FieldCondition(key=UPDATED_AT_FIELD, range=Range(gte=since))]),
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=with_vectors
+            )
+            changed.extend(points)
+            if offset is None:
+                return changed
+    
+    async def _embed_batch(self, texts: List[str], embedding_url: str) -> List[List[float]]:
+        """Embed a batch of texts with the given embedding service"""
+        async with httpx.AsyncClient(timeout=120.0) as client:
+            response = await client.post(f"{embedding_url}/embed/batch", json={"texts": texts})
+            if response.status_code != 200:
+                raise Exception(f"Embedding service error: {response.text}")
+            return response.json()["embeddings"]
+    
+    def swap_alias(self, collection_name: str, target: str):
+        """
+        Atomically point the alias collection_name at the physical collection target, in one
+        update_collection_aliases call. Raises ValueError if collection_name is still a legacy
+        physical collection (see adopt_legacy).
+        """
+        self.collections.invalidate()
+        if collection_name in self.collections and self.collections.resolve(collection_name) == collection_name:
+            raise ValueError(f"{collection_name} is a legacy collection; migrate it to serve it through an alias")
+        operations = []
+        if collection_name in self.collections:
+            operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=collection_name)))
+        operations.append(
+            CreateAliasOperation(create_alias=CreateAlias(collection_name=target, alias_name=collection_name))
+        )
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        self.collections.add(collection_name, target)
+        # The new version may hold vectors of another dimension
+        self.dimensions.pop(collection_name, None)
+        self._indexed_collections.discard(collection_name)
+        logger.info(f"Alias {collection_name} -> {target}")
+    
+    def adopt_legacy(self, collection_name: str, batch_size: int = 256) -> str:
+        """
+        Move a legacy physical collection (created before aliases were used) behind an alias:
+        copy it, vectors and payload indexes included, into the version "<name>__v00000000000000",
+        copy again the points written, updated or deleted meanwhile, then replace it by an alias
+        to that version. Qdrant cannot hold an alias and a collection of the same name, so the
+        collection is dropped and the alias created right after: requests arriving between the
+        two calls (a few milliseconds) fail, once. Run when a migration starts, so that its swap
+        is a plain alias switch. Returns the version name.
+        """
+        version = f"{collection_name}{VERSION_SEPARATOR}{LEGACY_VERSION}"
+        info = self.client.get_collection(collection_name)
+        if version in self.collections:
+            self.client.delete_collection(version)  # left over by an interrupted adoption
+        self._create_physical_collection(version, info.config.params.vectors.size, self.index_profile(collection_name))
+        self._ensure_payload_indexes(
+            version,
+            {field: PayloadSchemaType(schema.data_type.value) for field, schema in (info.payload_schema or {}).items()}
+        )
+        
+        def copy(points):
+            if points:
+                self.client.upsert(
+                    collection_name=version,
+                    points=[PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in points]
+                )
+        
+        def scroll_ids(limit):
+            ids = set()
+            offset = None
+            while True:
+                points, offset = self.client.scroll(
+                    collection_name=collection_name, limit=limit, offset=offset,
+                    with_payload=False, with_vectors=False
+                )
+                ids.update(p.id for p in points)
+                if offset is None:
+                    return ids
+        
+        copied = set()
+        since = time.time() - CATCH_UP_MARGIN_SECONDS
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection_name, limit=batch_size, offset=offset,
+                with_payload=True, with_vectors=True
+            )
+            copy(points)
+            copied.update(p.id for p in points)
+            if offset is None:
+                break
+        
+        # Catch up with the writes, updates and deletes made during the copy
+        for _ in range(MAX_CATCH_UP_PASSES):
+            pass_started = time.time() - CATCH_UP_MARGIN_SECONDS
+            changed = self._changed_since(collection_name, since, batch_size, with_vectors=True)
+            live = scroll_ids(batch_size * 4)
+            missing = list(live - copied - {p.id for p in changed})
+            for start in range(0, len(missing), batch_size):
+                changed += self.client.retrieve(
+                    collection_name=collection_name, ids=missing[start:start + batch_size],
+                    with_payload=True, with_vectors=True
+                )
+            for start in range(0, len(changed), batch_size):
+                copy(changed[start:start + batch_size])
+            copied.update(p.id for p in changed)
+            extra = list(copied - live)
+            if extra:
+                self.client.delete(collection_name=version, points_selector=extra)
+                copied -= set(extra)
+            since = pass_started
+            if not changed and not extra:
+                break
+        
+        self.client.delete_collection(collection_name)
+        self.client.update_collection_aliases(change_aliases_operations=[
+            CreateAliasOperation(create_alias=CreateAlias(collection_name=version, alias_name=collection_name))
+        ])
+        self.collections.discard(collection_name)
+        self.collections.add(collection_name, version)
+        self._indexed_collections.discard(collection_name)
+        logger.warning(f"Legacy collection {collection_name} moved behind an alias to {version} ({len(live)} points)")
+        return version
+    
+    def promote_migration(self, collection_name: str) -> str:
+        """Swap the alias to a migration built with auto_swap=False"""
+        state = self.migrations.get(collection_name)
+        if not state or state["status"] != "ready":
+            raise ValueError(f"No migration ready to promote for {collection_name}")
+        self.swap_alias(collection_name, state["shadow"])
+        state["status"] = "completed"
+        return state["shadow"]
+    
+    def rollback(self, collection_name: str) -> str:
+        """Point the alias back at the previous physical version"""
+        self.collections.invalidate()
+        current = self.resolve_collection(collection_name)
+        previous = [v for v in self.list_versions(collection_name) if v < current]
+        if current == collection_name or not previous:
+            raise ValueError(f"No previous version to roll back to for {collection_name}")
+        self.swap_alias(collection_name, previous[-1])
+        return previous[-1]
+    
+    def drop_version(self, collection_name: str, physical_name: str):
+        """Delete an old physical version that is no longer served"""
+        self.collections.invalidate()
+        if physical_name not in self.list_versions(collection_name):
+            raise ValueError(f"{physical_name} is not a version of {collection_name}")
+        if physical_name == self.resolve_collection(collection_name):
+            raise ValueError(f"{physical_name} is currently live")
+        self.client.delete_collection(physical_name)
+        self.collections.discard(physical_name)
+        logger.info(f"Dropped collection version {physical_name}")
@@ -0,0 +1,10 @@
+"""
+Unit tests of the orchestrator's pure retrieval and scheduling logic.
+Run from backend/services/orchestrator: python -m pytest tests
+"""
+
+import os
+import sys
+
+# Modules are imported as in the service image, relative to the orchestrator directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
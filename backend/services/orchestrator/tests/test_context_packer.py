@@ -0,0 +1,107 @@
+from services.context_packer import (
+    CONTEXT_OVERHEAD_TOKENS, ContextPacker, covered_sources, estimate_tokens, merge_overlapping
+)
+
+
+def context(document_id, chunk_index, content, score, **metadata):
+    return {
+        "document_id": document_id,
+        "chunk_index": chunk_index,
+        "content": content,
+        "score": score,
+        "metadata": metadata
+    }
+
+
+def source(document_id, chunk_index):
+    return {"document_id": document_id, "chunk_index": chunk_index}
+
+
+def packer(monkeypatch, **env):
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return ContextPacker()
+
+
+def test_merge_overlapping_removes_the_repeated_text():
+    assert merge_overlapping("The quick brown fox", "brown fox jumps", probe=5) == "The quick brown fox jumps"
+    assert merge_overlapping("The quick brown fox", "lazy dog", probe=5) is None
+
+
+def test_hits_after_a_score_cliff_are_cut(monkeypatch):
+    contexts = [
+        context("a", 0, "alpha beta gamma delta", 0.90),
+        context("b", 0, "epsilon zeta eta theta", 0.85),
+        context("c", 0, "iota kappa lambda mu", 0.40),
+    ]
+
+    packed, _, stats = packer(monkeypatch, CONTEXT_SCORE_GAP="0.2").pack(contexts, [], token_budget=1000)
+
+    assert [c["document_id"] for c in packed] == ["a", "b"]
+    assert stats["after_cutoff"] == 2
+
+
+def test_fused_rankings_are_not_cut(monkeypatch):
+    contexts = [
+        {**context("a", 0, "alpha beta gamma delta", 0.90), "fusion_score": 0.03},
+        {**context("b", 0, "iota kappa lambda mu", 0.10), "fusion_score": 0.02},
+    ]
+
+    packed, _, _ = packer(monkeypatch, CONTEXT_SCORE_GAP="0.2").pack(contexts, [], token_budget=1000)
+
+    assert len(packed) == 2
+
+
+def test_consecutive_chunks_are_merged_and_cover_their_sources(monkeypatch):
+    contexts = [
+        context("a", 1, "second part of the text", 0.80),
+        context("a", 0, "first part of the text, second part", 0.90),
+        context("b", 4, "another document entirely", 0.85),
+    ]
+    sources = [source("a", 0), source("a", 1), source("b", 4), source("c", 0)]
+
+    packed, covered, stats = packer(monkeypatch).pack(contexts, sources, token_budget=1000)
+
+    assert stats["after_merge"] == 2
+    merged = next(c for c in packed if c["document_id"] == "a")
+    assert merged["chunk_indexes"] == [0, 1]
+    assert merged["score"] == 0.90
+    assert covered == sources[:3]
+
+
+def test_near_duplicates_are_dropped(monkeypatch):
+    text = "retrieval augmented generation answers questions from documents"
+    contexts = [
+        context("a", 0, text, 0.90),
+        context("copy", 0, text + " again", 0.89),
+    ]
+
+    packed, _, stats = packer(monkeypatch).pack(contexts, [], token_budget=1000)
+
+    assert [c["document_id"] for c in packed] == ["a"]
+    assert stats["after_dedup"] == 1
+
+
+def test_contexts_are_packed_into_the_token_budget(monkeypatch):
+    contexts = [context(str(idx), 0, f"document {idx} " + "word " * 40, 0.9 - idx * 0.01) for idx in range(5)]
+    cost = estimate_tokens(contexts[0]["content"]) + CONTEXT_OVERHEAD_TOKENS
+
+    packed, _, stats = packer(monkeypatch).pack(contexts, [], token_budget=cost * 2 + 1)
+
+    assert [c["document_id"] for c in packed] == ["0", "1"]
+    assert stats["tokens"] <= cost * 2 + 1
+
+
+def test_the_best_context_is_trimmed_when_nothing_fits(monkeypatch):
+    contexts = [context("a", 0, "word " * 400, 0.9)]
+
+    packed, _, _ = packer(monkeypatch).pack(contexts, [], token_budget=50)
+
+    assert len(packed) == 1
+    assert estimate_tokens(packed[0]["content"]) + CONTEXT_OVERHEAD_TOKENS <= 51
+
+
+def test_covered_sources_without_merge():
+    contexts = [context("a", 2, "text", 0.5)]
+
+    assert covered_sources(contexts, [source("a", 2), source("a", 3)]) == [source("a", 2)]
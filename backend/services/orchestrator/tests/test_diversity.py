@@ -0,0 +1,48 @@
+from services.diversity import mmr, cap_per_document
+
+
+def hit(hit_id, score, vector=None, document_id=None):
+    return {"id": hit_id, "score": score, "vector": vector, "payload": {"document_id": document_id}}
+
+
+def test_mmr_skips_near_duplicates():
+    hits = [
+        hit("a", 0.95, [1.0, 0.0]),
+        hit("a-copy", 0.94, [1.0, 0.01]),
+        hit("b", 0.80, [0.0, 1.0]),
+    ]
+
+    picked = mmr(hits, limit=2, lambda_=0.5)
+
+    assert [h["id"] for h in picked] == ["a", "b"]
+    assert all("vector" not in h for h in picked)
+
+
+def test_mmr_with_lambda_one_keeps_similarity_order():
+    hits = [
+        hit("b", 0.8, [0.0, 1.0]),
+        hit("a", 0.9, [1.0, 0.0]),
+        hit("a-copy", 0.85, [1.0, 0.0]),
+    ]
+
+    assert [h["id"] for h in mmr(hits, limit=3, lambda_=1.0)] == ["a", "a-copy", "b"]
+
+
+def test_mmr_limit_and_empty_input():
+    hits = [hit("a", 0.9, [1.0, 0.0]), hit("b", 0.8, [0.0, 1.0])]
+
+    assert len(mmr(hits, limit=5, lambda_=0.7)) == 2
+    assert mmr([], limit=3, lambda_=0.7) == []
+
+
+def test_cap_per_document_keeps_rank_order():
+    hits = [
+        hit("a1", 0.9, document_id="a"),
+        hit("a2", 0.8, document_id="a"),
+        hit("a3", 0.7, document_id="a"),
+        hit("b1", 0.6, document_id="b"),
+        hit("c1", 0.5, document_id="c"),
+    ]
+
+    assert [h["id"] for h in cap_per_document(hits, cap=2, limit=10)] == ["a1", "a2", "b1", "c1"]
+    assert [h["id"] for h in cap_per_document(hits, cap=1, limit=2)] == ["a1", "b1"]
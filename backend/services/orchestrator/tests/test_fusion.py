@@ -0,0 +1,49 @@
+import pytest
+
+from services.fusion import fuse
+
+
+def hits(*ids_and_scores):
+    return [{"id": hit_id, "score": score} for hit_id, score in ids_and_scores]
+
+
+def test_rrf_rewards_hits_found_by_several_searches():
+    first = hits(("a", 0.9), ("b", 0.8), ("c", 0.7))
+    second = hits(("c", 12.0), ("d", 11.0))
+
+    fused = fuse([first, second], "rrf", k=60)
+
+    assert [hit["id"] for hit in fused] == ["c", "a", "b", "d"]
+    assert fused[0]["fusion_score"] == pytest.approx(1 / 63 + 1 / 61)
+    # The original score of the first list the hit was found in is kept
+    assert fused[0]["score"] == 0.7
+
+
+def test_rrf_weights_scale_each_list():
+    first = hits(("a", 0.9))
+    second = hits(("b", 0.9))
+
+    fused = fuse([first, second], "rrf", weights=[1.0, 3.0], k=60)
+
+    assert [hit["id"] for hit in fused] == ["b", "a"]
+    assert fused[0]["fusion_score"] == pytest.approx(3 / 61)
+
+
+def test_score_fusion_keeps_the_best_score_of_a_hit():
+    first = hits(("a", 0.5), ("b", 0.4))
+    second = hits(("b", 0.9), ("c", 0.6))
+
+    fused = fuse([first, second], "score")
+
+    assert [(hit["id"], hit["fusion_score"]) for hit in fused] == [("b", 0.9), ("c", 0.6), ("a", 0.5)]
+
+
+def test_limit_and_empty_lists():
+    assert fuse([hits(("a", 1.0), ("b", 0.5))], "rrf", limit=1)[0]["id"] == "a"
+    assert fuse([], "rrf") == []
+    assert fuse([[], []], "score") == []
+
+
+def test_unknown_method_is_refused():
+    with pytest.raises(ValueError):
+        fuse([hits(("a", 1.0))], "borda")
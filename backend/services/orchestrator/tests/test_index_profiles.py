@@ -0,0 +1,42 @@
+import pytest
+
+from services.index_profiles import DEFAULT_INDEX_PROFILE, normalize_profile
+
+
+def test_partial_profile_is_completed_with_defaults():
+    profile = normalize_profile({"quantization": "scalar", "quantile": 0.99, "hnsw_m": 32, "rescore": None})
+
+    assert profile == {**DEFAULT_INDEX_PROFILE, "quantization": "scalar", "quantile": 0.99, "hnsw_m": 32}
+    assert normalize_profile(None) == DEFAULT_INDEX_PROFILE
+
+
+def test_integers_are_accepted_for_float_settings():
+    assert normalize_profile({"oversampling": 3})["oversampling"] == 3
+
+
+@pytest.mark.parametrize("profile", [
+    {"quantisation": "scalar"},
+    {"quantization": "int4"},
+    {"compression": "x3"},
+    {"quantile": 0.2},
+    {"oversampling": 0.5},
+    {"hnsw_ef": 2},
+    {"hnsw_m": -1},
+])
+def test_invalid_values_are_refused(profile):
+    with pytest.raises(ValueError):
+        normalize_profile(profile)
+
+
+@pytest.mark.parametrize("profile", [
+    {"oversampling": "high"},
+    {"hnsw_m": "16"},
+    {"hnsw_ef_construct": 128.5},
+    {"hnsw_ef": True},
+    {"on_disk": "yes"},
+    {"always_ram": 1},
+    {"compression": ["x16"]},
+])
+def test_values_of_the_wrong_type_raise_value_error(profile):
+    with pytest.raises(ValueError):
+        normalize_profile(profile)
@@ -0,0 +1,199 @@
+import asyncio
+
+import pytest
+
+from services.llm_scheduler import LLMScheduler, PrioritySlots, SchedulerOverloaded, PRIORITIES
+
+
+class FakeLLM:
+    """Stands in for LLMService: records the prompts it answers, each taking delay seconds"""
+
+    provider = "fake"
+    model = "fake-model"
+
+    def __init__(self, capacity=1, delay=0.05):
+        self.capacity = capacity
+        self.delay = delay
+        self.calls = []
+
+    async def generate_answer(self, query, contexts, system_prompt=None):
+        self.calls.append(query)
+        await asyncio.sleep(self.delay)
+        return f"answer to {query}"
+
+    async def stream_answer(self, query, contexts, system_prompt=None):
+        self.calls.append(query)
+        for token in ("a", "b"):
+            await asyncio.sleep(self.delay / 2)
+            yield token
+
+
+def scheduler(monkeypatch, llm, **env):
+    for name, value in {"LLM_MAX_QUEUE_SECONDS": "5", **env}.items():
+        monkeypatch.setenv(name, value)
+    return LLMScheduler(llm)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_priority_slots_serve_by_priority_then_arrival():
+    async def scenario():
+        slots = PrioritySlots(1)
+        holder = slots.enqueue(PRIORITIES["batch"])
+        assert holder.done()
+        batch = slots.enqueue(PRIORITIES["batch"])
+        interactive = slots.enqueue(PRIORITIES["interactive"])
+        later_batch = slots.enqueue(PRIORITIES["batch"])
+        assert slots.waiting == 3
+
+        order = []
+        for _ in range(3):
+            slots.release()
+            order.append(next(name for name, future in
+                              (("batch", batch), ("interactive", interactive), ("later_batch", later_batch))
+                              if future.done() and name not in order))
+        assert order == ["interactive", "batch", "later_batch"]
+        slots.release()
+        assert slots.active == 0 and slots.waiting == 0
+
+    run(scenario())
+
+
+def test_promoted_waiter_overtakes_and_leaving_passes_the_slot_on():
+    async def scenario():
+        slots = PrioritySlots(1)
+        slots.enqueue(PRIORITIES["interactive"])
+        first = slots.enqueue(PRIORITIES["batch"])
+        second = slots.enqueue(PRIORITIES["batch"])
+        slots.promote(second, PRIORITIES["interactive"])
+        assert slots.waiting == 2
+
+        slots.release()
+        assert second.done() and not first.done()
+        # second gives up although it was handed the slot: first gets it
+        slots.leave(second)
+        assert first.done()
+        assert slots.waiting == 0 and slots.active == 1
+
+    run(scenario())
+
+
+def test_identical_prompts_share_one_generation(monkeypatch):
+    llm = FakeLLM(capacity=2)
+    llm_scheduler = scheduler(monkeypatch, llm)
+
+    async def scenario():
+        return await asyncio.gather(*(llm_scheduler.generate_answer("q", ["c"]) for _ in range(3)))
+
+    assert run(scenario()) == ["answer to q"] * 3
+    assert llm.calls == ["q"]
+    assert llm_scheduler.stats()["inflight_prompts"] == 0
+
+
+def test_interactive_requests_are_served_before_batch_ones(monkeypatch):
+    llm = FakeLLM(capacity=1)
+    llm_scheduler = scheduler(monkeypatch, llm)
+
+    async def scenario():
+        first = asyncio.create_task(llm_scheduler.generate_answer("first", [], priority="batch"))
+        await asyncio.sleep(0.01)
+        batch = asyncio.create_task(llm_scheduler.generate_answer("batch", [], priority="batch"))
+        await asyncio.sleep(0.01)
+        interactive = asyncio.create_task(llm_scheduler.generate_answer("interactive", []))
+        await asyncio.gather(first, batch, interactive)
+
+    run(scenario())
+    assert llm.calls == ["first", "interactive", "batch"]
+
+
+def test_coalesced_caller_raises_priority_and_deadline(monkeypatch):
+    llm = FakeLLM(capacity=1, delay=0.1)
+    llm_scheduler = scheduler(monkeypatch, llm)
+
+    async def scenario():
+        blocker = asyncio.create_task(llm_scheduler.generate_answer("blocker", [], priority="batch"))
+        await asyncio.sleep(0.01)
+        other = asyncio.create_task(llm_scheduler.generate_answer("other", [], priority="batch"))
+        hurried = asyncio.create_task(
+            llm_scheduler.generate_answer("shared", [], priority="batch", deadline_seconds=0.05)
+        )
+        await asyncio.sleep(0.01)
+        patient = asyncio.create_task(
+            llm_scheduler.generate_answer("shared", [], priority="interactive", deadline_seconds=5)
+        )
+        results = await asyncio.gather(blocker, other, hurried, patient, return_exceptions=True)
+        return results
+
+    blocker, other, hurried, patient = run(scenario())
+    # The shared generation jumped ahead of "other" and outlived the first caller's deadline
+    assert llm.calls == ["blocker", "shared", "other"]
+    assert patient == "answer to shared"
+    assert isinstance(hurried, SchedulerOverloaded) and hurried.reason == "deadline"
+
+
+def test_cancelled_generation_is_never_joined(monkeypatch):
+    llm = FakeLLM(capacity=1, delay=0.1)
+    llm_scheduler = scheduler(monkeypatch, llm)
+
+    async def scenario():
+        abandoned = asyncio.create_task(llm_scheduler.generate_answer("q", []))
+        await asyncio.sleep(0.01)
+        abandoned.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await abandoned
+        # The entry is gone although the cancelled task may not have finished yet
+        assert llm_scheduler.stats()["inflight_prompts"] == 0
+        return await llm_scheduler.generate_answer("q", [])
+
+    assert run(scenario()) == "answer to q"
+    assert llm.calls == ["q", "q"]
+
+
+def test_full_queue_sheds_requests(monkeypatch):
+    llm = FakeLLM(capacity=1, delay=0.1)
+    llm_scheduler = scheduler(monkeypatch, llm, LLM_MAX_QUEUE_SIZE="1")
+
+    async def scenario():
+        return await asyncio.gather(
+            *(llm_scheduler.generate_answer(f"q{idx}", []) for idx in range(3)), return_exceptions=True
+        )
+
+    results = run(scenario())
+    assert results[:2] == ["answer to q0", "answer to q1"]
+    assert isinstance(results[2], SchedulerOverloaded) and results[2].reason == "queue_full"
+
+
+def test_queue_timeout_sheds_requests(monkeypatch):
+    llm = FakeLLM(capacity=1, delay=0.2)
+    llm_scheduler = scheduler(monkeypatch, llm, LLM_MAX_QUEUE_SECONDS="0.05")
+
+    async def scenario():
+        return await asyncio.gather(
+            llm_scheduler.generate_answer("slow", []),
+            llm_scheduler.generate_answer("waiting", []),
+            return_exceptions=True
+        )
+
+    slow, waiting = run(scenario())
+    assert slow == "answer to slow"
+    assert isinstance(waiting, SchedulerOverloaded) and waiting.reason == "queue_timeout"
+
+
+def test_streams_take_a_slot(monkeypatch):
+    llm = FakeLLM(capacity=1)
+    llm_scheduler = scheduler(monkeypatch, llm)
+
+    async def scenario():
+        return [token async for token in llm_scheduler.stream_answer("q", [])]
+
+    assert run(scenario()) == ["a", "b"]
+    assert llm_scheduler.stats()["providers"]["fake"]["active"] == 0
+
+
+def test_unknown_priority_is_refused(monkeypatch):
+    llm_scheduler = scheduler(monkeypatch, FakeLLM())
+
+    with pytest.raises(ValueError):
+        run(llm_scheduler.generate_answer("q", [], priority="urgent"))
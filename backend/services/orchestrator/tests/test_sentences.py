@@ -0,0 +1,34 @@
+from services.context_compressor import sentence_spans, split_sentences
+
+
+def test_sentences_are_split_on_punctuation_and_line_breaks():
+    text = "First sentence is here. Second one asks why? Third line\nFourth line of the text"
+
+    assert split_sentences(text, min_chars=5) == [
+        "First sentence is here.",
+        "Second one asks why?",
+        "Third line",
+        "Fourth line of the text",
+    ]
+
+
+def test_short_fragments_are_glued_to_the_next_sentence():
+    assert split_sentences("Ok. This sentence is long enough.", min_chars=10) == ["Ok. This sentence is long enough."]
+    # A short tail is glued to the previous sentence
+    assert split_sentences("This sentence is long enough. Ok.", min_chars=10) == ["This sentence is long enough. Ok."]
+
+
+def test_spans_are_offsets_into_the_text():
+    text = "  Leading spaces are skipped.   And trailing ones too.  "
+
+    for start, end in sentence_spans(text, min_chars=5):
+        assert text[start:end] == text[start:end].strip()
+    assert [text[start:end] for start, end in sentence_spans(text, min_chars=5)] == [
+        "Leading spaces are skipped.",
+        "And trailing ones too.",
+    ]
+
+
+def test_empty_text_has_no_sentences():
+    assert sentence_spans("") == []
+    assert sentence_spans("   \n  ") == []
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Stand-in for Ollama's /api/generate, to exercise the LLM backend pool locally
+
+Usage:
+    python scripts/fake_ollama.py --port 11501                          # healthy backend
+    python scripts/fake_ollama.py --port 11502 --first-token-delay 3     # slow to start (triggers hedging)
+    python scripts/fake_ollama.py --port 11503 --tokens-per-second 5     # slow generator
+    python scripts/fake_ollama.py --port 11504 --failure-rate 1          # always fails (gets ejected)
+
+Then point the orchestrator at them:
+    LLM_BACKENDS='[{"name": "a", "provider": "ollama", "base_url": "http://localhost:11501"},
+                   {"name": "b", "provider": "ollama", "base_url": "http://localhost:11502"}]'
+
+Only the standard library is used, so it runs outside the containers.
+"""
+
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(args):
+    words = args.answer.split()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._json(200, {"models": [{"name": args.model}]})
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/api/generate":
+                self._json(404, {"error": "not found"})
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+            if random.random() < args.failure_rate:
+                self._json(500, {"error": "simulated failure"})
+                return
+
+            time.sleep(args.first_token_delay)
+            model = body.get("model", args.model)
+            if not body.get("stream", True):
+                time.sleep(len(words) / args.tokens_per_second)
+                self._json(200, {"model": model, "response": args.answer, "done": True, "eval_count": len(words)})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            for idx, word in enumerate(words):
+                self._line({"model": model, "response": word + " ", "done": False})
+                if idx < len(words) - 1:
+                    time.sleep(1 / args.tokens_per_second)
+            self._line({"model": model, "response": "", "done": True, "eval_count": len(words)})
+
+        def _line(self, payload):
+            self.wfile.write(json.dumps(payload).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+        def _json(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *log_args):
+            print(f"[fake-ollama:{args.port}] {format % log_args}")
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Ollama server for load-balancing tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--model", default="llama3.1:8b")
+    parser.add_argument("--answer", default="This is a simulated answer from a stand-in Ollama backend.")
+    parser.add_argument("--first-token-delay", type=float, default=0.1, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests answered with HTTP 500")
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args))
+    print(f"Fake Ollama listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()